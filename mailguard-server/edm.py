@@ -0,0 +1,133 @@
+"""Build and maintain the exact data match (EDM) index of known sensitive values."""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from mailguard.config import Config
+from mailguard.engines.detection.detectors import EDMIndex
+from mailguard.engines.detection.detectors.edm import generate_key, load_key
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_source(value: str) -> Tuple[str, str]:
+    """TYPE=FILE argument."""
+    pattern_type, sep, path = value.partition('=')
+    if not sep or not pattern_type or not path:
+        raise argparse.ArgumentTypeError(f"expected TYPE=FILE, got '{value}'")
+    return pattern_type, path
+
+
+def _iter_values(sources: List[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+    """(type, value) for every non-empty line of every source file ('-' = stdin)."""
+    for pattern_type, path in sources:
+        f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for line in f:
+                value = line.strip()
+                if value:
+                    yield pattern_type, value
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def main():
+    """Build, update, compact or query an EDM index."""
+    parser = argparse.ArgumentParser(
+        description='Maintain the index of known sensitive values (EDM_INDEX_FILE)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Value files have one value per line; TYPE is the detection type the values
+are found as (sin, ssn, credit_card, email, or a new type given --pattern).
+
+The hash key is read from --key-file (default: EDM_KEY_FILE). Keep it where
+only MailGuard can read it, apart from the index: anyone holding both could
+recover values like SINs by hashing every possible one.
+
+Examples:
+  # Create the key, then index our customers' SINs and account numbers
+  python edm.py keygen /etc/mailguard/edm.key
+  python edm.py build known.edm sin=customer_sins.txt account_number=accounts.txt \\
+      --pattern 'account_number=\\bACC-?\\d{8}\\b'
+
+  # New customers today, one closed account, then fold the changes in
+  python edm.py add known.edm sin=new_sins.txt
+  python edm.py remove known.edm account_number=closed.txt
+  python edm.py compact known.edm
+        """
+    )
+    parser.add_argument('--key-file', default=Config.EDM_KEY_FILE,
+                        help='Hash key file (default: EDM_KEY_FILE)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    keygen = commands.add_parser('keygen', help='Create a new hash key file')
+    keygen.add_argument('key', help='Key file to create')
+
+    build = commands.add_parser('build', help='Build a new index from value files')
+    build.add_argument('index', help='Index file to write')
+    build.add_argument('sources', nargs='+', type=_parse_source, metavar='TYPE=FILE')
+    build.add_argument('--pattern', action='append', default=[], type=_parse_source, metavar='TYPE=REGEX',
+                       help='Regex finding candidates of a type the regex detector has no pattern for')
+
+    for name, help_text in (('add', 'Add values (to the delta file)'),
+                            ('remove', 'Remove values (to the delta file)')):
+        update = commands.add_parser(name, help=help_text)
+        update.add_argument('index', help='Index file')
+        update.add_argument('sources', nargs='+', type=_parse_source, metavar='TYPE=FILE')
+
+    compact = commands.add_parser('compact', help='Fold the delta file into the index')
+    compact.add_argument('index', help='Index file')
+
+    check = commands.add_parser('check', help='Look values up in the index')
+    check.add_argument('index', help='Index file')
+    check.add_argument('type', help='Value type')
+    check.add_argument('values', nargs='+')
+
+    info = commands.add_parser('info', help='Show what the index holds')
+    info.add_argument('index', help='Index file')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    start = time.monotonic()
+    try:
+        if args.command == 'keygen':
+            generate_key(Path(args.key))
+            print(f"Created {args.key}; set EDM_KEY_FILE to it")
+            return
+        if not args.key_file:
+            parser.error('no key file: pass --key-file or set EDM_KEY_FILE')
+        key = load_key(Path(args.key_file))
+        if args.command == 'build':
+            count = EDMIndex.build(Path(args.index), _iter_values(args.sources), key, patterns=dict(args.pattern))
+            print(f"Indexed {count} distinct value(s) in {time.monotonic() - start:.1f}s")
+        elif args.command in ('add', 'remove'):
+            count = EDMIndex.update(Path(args.index), _iter_values(args.sources), key, remove=args.command == 'remove')
+            print(f"{'Removed' if args.command == 'remove' else 'Added'} {count} value(s); "
+                  f"run 'compact' once the delta file grows large")
+        elif args.command == 'compact':
+            count = EDMIndex.compact(Path(args.index), key)
+            print(f"Compacted to {count} value(s) in {time.monotonic() - start:.1f}s")
+        else:
+            index = EDMIndex(Path(args.index), key)
+            if args.command == 'check':
+                for value in args.values:
+                    print(f"{value}: {'known' if index.contains(args.type, value) else 'not found'}")
+            else:
+                print(json.dumps({
+                    'values': len(index),
+                    'types': sorted(index.types),
+                    'patterns': index.patterns,
+                    'open_ms': round((time.monotonic() - start) * 1000, 2)
+                }, indent=2))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Manage the registry of confidential documents that attachments are compared with."""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from mailguard.config import Config
+from mailguard.engines.detection.detectors import FingerprintRegistry
+from mailguard.models.parsed_message import REDACTABLE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _iter_documents(paths: List[str], extract: bool) -> Iterator[Tuple[str, str]]:
+    """(name, text) of every file given (directories are walked)."""
+    extractor = None
+    for path in paths:
+        path = Path(path)
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for file_path in files:
+            if file_path.suffix[1:].lower() in REDACTABLE_EXTENSIONS:
+                text = file_path.read_text(encoding='utf-8', errors='replace')
+            elif extract:
+                if extractor is None:
+                    from mailguard.engines import ContentExtractor
+                    extractor = ContentExtractor(Config.TIKA_SERVER_URL)
+                text = extractor.extract_file(str(file_path), max_size_mb=Config.MAX_ATTACHMENT_SIZE_MB,
+                                              max_depth=Config.MAX_ARCHIVE_DEPTH)
+            else:
+                logger.warning(f"Skipping {file_path}: not a text file (extraction is off)")
+                continue
+            yield file_path.name, text
+
+
+def main():
+    """Add, remove, list or check registered confidential documents."""
+    parser = argparse.ArgumentParser(
+        description='Manage the confidential document registry (FINGERPRINT_REGISTRY_DIR)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Documents are registered by file name; only a fingerprint of their text is
+kept. Text files are read directly and other files (PDF, Word, Excel...)
+are sent to Tika.
+
+Examples:
+  python fingerprint.py add contracts/ pricing-2026.xlsx
+  python fingerprint.py check draft.docx
+  python fingerprint.py remove pricing-2025.xlsx
+        """
+    )
+    parser.add_argument('--registry', default=Config.FINGERPRINT_REGISTRY_DIR or None,
+                        help='Registry directory (default: FINGERPRINT_REGISTRY_DIR)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Register documents')
+    add.add_argument('paths', nargs='+', help='Files or directories')
+    add.add_argument('--no-extract', action='store_true', help='Only register text files, without Tika')
+
+    remove = commands.add_parser('remove', help='Unregister documents by name')
+    remove.add_argument('names', nargs='+')
+
+    check = commands.add_parser('check', help='Show which registered documents files resemble')
+    check.add_argument('paths', nargs='+', help='Files or directories')
+    check.add_argument('--threshold', type=float, default=Config.FINGERPRINT_THRESHOLD,
+                       help='Minimum similarity (default: FINGERPRINT_THRESHOLD)')
+
+    commands.add_parser('list', help='List registered documents')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.registry:
+        parser.error('no registry: set FINGERPRINT_REGISTRY_DIR or give --registry')
+
+    registry = FingerprintRegistry(Path(args.registry))
+    if args.command == 'add':
+        start = time.monotonic()
+        count = registry.add(_iter_documents(args.paths, extract=not args.no_extract))
+        print(f"Registered {count} document(s) in {time.monotonic() - start:.1f}s")
+    elif args.command == 'remove':
+        print(f"Removed {registry.remove(args.names)} document(s)")
+    elif args.command == 'check':
+        for name, text in _iter_documents(args.paths, extract=True):
+            start = time.perf_counter()
+            matches = registry.match(text, args.threshold)
+            print(json.dumps({
+                'file': name,
+                'matches': [{'document': doc, 'similarity': round(similarity, 3)} for doc, similarity in matches],
+                'ms': round((time.perf_counter() - start) * 1000, 2)
+            }))
+    else:
+        for name in registry.names():
+            print(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 """Flask API application factory."""
 from flask import Flask
 from flask_cors import CORS
+from sqlalchemy import inspect, text
 
 from mailguard.config import Config
 from mailguard.models import db
@@ -13,15 +14,18 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = Config.DATABASE_URL
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    # Admin endpoints change process state, so web pages on other origins may not call them
+    CORS(app, resources={r"/api/(?!admin/).*": {"origins": "*"}})
     
     db.init_app(app)
     
-    from .routes import emails, stats, attachments, events
+    from .routes import emails, stats, attachments, events, admin, metrics
     app.register_blueprint(emails.bp)
     app.register_blueprint(stats.bp)
     app.register_blueprint(attachments.bp)
     app.register_blueprint(events.bp)
+    app.register_blueprint(admin.bp)
+    app.register_blueprint(metrics.bp)
     
     return app
 
@@ -31,7 +35,22 @@ def init_db():
     app = create_app()
     with app.app_context():
         db.create_all()
+        _add_missing_columns()
         import logging
         logger = logging.getLogger(__name__)
         logger.info("Database initialized")
 
+
+def _add_missing_columns():
+    """Add model columns missing from existing tables (create_all never alters tables)."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
@@ -0,0 +1,173 @@
+"""Admin API routes for proxy runtime state and diagnostics."""
+from flask import Blueprint, Response, current_app, jsonify, request
+import hmac
+import logging
+
+from ...config import Config
+from ...monitoring import memory_snapshot, profiler, stop_memory_tracing, tracer
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+LOOPBACK_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+@bp.before_request
+def require_admin_access():
+    """
+    Only let operators in: these endpoints change process state and expose message IDs.
+    
+    With ADMIN_API_TOKEN set, requests must carry it as a bearer token, which
+    a web page on another origin can't add. Without it, only requests from
+    this host are served, and none a browser sends on behalf of another site.
+    """
+    if Config.ADMIN_API_TOKEN:
+        supplied = request.headers.get('Authorization', '').encode()
+        if not hmac.compare_digest(supplied, f"Bearer {Config.ADMIN_API_TOKEN}".encode()):
+            return jsonify({'error': 'Admin API token required'}), 401
+        return None
+    
+    if request.remote_addr not in LOOPBACK_ADDRESSES:
+        return jsonify({'error': 'Admin API only answers this host unless ADMIN_API_TOKEN is set'}), 403
+    if 'Origin' in request.headers or request.headers.get('Sec-Fetch-Site', 'none') not in ('none', 'same-origin'):
+        logger.warning(f"Refused browser request to {request.path} from another site")
+        return jsonify({'error': 'Admin API requests from web pages need ADMIN_API_TOKEN'}), 403
+    return None
+
+
+@bp.route('/admission', methods=['GET'])
+def get_admission():
+    """Get the SMTP proxy's current admission control state."""
+    admission = current_app.extensions.get('mailguard_admission')
+    if admission is None:
+        return jsonify({'error': 'SMTP proxy is not running in this process'}), 503
+    return jsonify(admission.snapshot())
+
+
+@bp.route('/policy/shadow', methods=['GET'])
+def get_shadow_policies():
+    """Compare what each shadow policy would have done with the active policy."""
+    policy_engine = current_app.extensions.get('mailguard_policy')
+    if policy_engine is None:
+        return jsonify({'error': 'SMTP proxy is not running in this process'}), 503
+    return jsonify({'shadows': policy_engine.shadows.comparison()})
+
+
+@bp.route('/policy/shadow/reset', methods=['POST'])
+def reset_shadow_policies():
+    """Start the shadow policy counters over (e.g. after editing a candidate rules file)."""
+    policy_engine = current_app.extensions.get('mailguard_policy')
+    if policy_engine is None:
+        return jsonify({'error': 'SMTP proxy is not running in this process'}), 503
+    policy_engine.shadows.reset()
+    return jsonify({'shadows': policy_engine.shadows.comparison()})
+
+
+@bp.route('/traces/slow', methods=['GET'])
+def get_slow_traces():
+    """List recent slow message traces, newest first."""
+    return jsonify({
+        'threshold_ms': tracer.slow_threshold_ms,
+        'traces': [trace.summary() for trace in tracer.slow_traces()]
+    })
+
+
+@bp.route('/traces/slow/<trace_id>', methods=['GET'])
+def get_slow_trace(trace_id):
+    """Get a slow trace's spans (?format=otlp for OTLP/JSON)."""
+    trace = tracer.get_slow_trace(trace_id)
+    if trace is None:
+        return jsonify({'error': 'Trace not found'}), 404
+    if request.args.get('format') == 'otlp':
+        return jsonify(trace.to_otlp())
+    return jsonify(trace.to_dict())
+
+
+@bp.route('/profile', methods=['GET'])
+def get_profile_status():
+    """Get the running (or last) profiling session's status."""
+    return jsonify(profiler.status())
+
+
+@bp.route('/profile/start', methods=['POST'])
+def start_profile():
+    """
+    Start a profiling session.
+
+    Query params: mode (sample or cprofile), seconds, interval (sample
+    period in seconds) and threads (thread name prefix to sample, default
+    the processing workers; empty for all threads).
+    """
+    try:
+        status = profiler.start(
+            mode=request.args.get('mode', 'sample'),
+            seconds=request.args.get('seconds', 30, type=float),
+            interval=request.args.get('interval', 0.005, type=float),
+            thread_prefix=request.args.get('threads', 'mailguard-worker')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(status)
+
+
+@bp.route('/profile/stop', methods=['POST'])
+def stop_profile():
+    """Stop the running profiling session early."""
+    return jsonify(profiler.stop())
+
+
+@bp.route('/profile/collapsed', methods=['GET'])
+def get_profile_collapsed():
+    """Last sample session as collapsed stacks (input for flamegraph.pl / speedscope)."""
+    collapsed = profiler.collapsed()
+    if collapsed is None:
+        return jsonify({'error': 'No finished sample profile'}), 404
+    return Response(collapsed, mimetype='text/plain')
+
+
+@bp.route('/profile/pstats', methods=['GET'])
+def get_profile_pstats():
+    """Last cProfile session as a pstats dump (?format=text for a printed table)."""
+    if request.args.get('format') == 'text':
+        text = profiler.pstats_text(
+            sort=request.args.get('sort', 'cumulative'),
+            limit=request.args.get('limit', 50, type=int)
+        )
+        if text is None:
+            return jsonify({'error': 'No finished cProfile profile'}), 404
+        return Response(text, mimetype='text/plain')
+
+    dump = profiler.pstats_dump()
+    if dump is None:
+        return jsonify({'error': 'No finished cProfile profile'}), 404
+    return Response(dump, mimetype='application/octet-stream',
+                    headers={'Content-Disposition': 'attachment; filename=mailguard.pstats'})
+
+
+@bp.route('/memory/snapshot', methods=['GET'])
+def get_memory_snapshot():
+    """
+    Take a tracemalloc snapshot: top allocations and growth since the last snapshot.
+
+    The first call starts tracing (query param frames sets the traceback
+    depth); later calls report. Query params: limit, group_by (lineno,
+    filename or traceback).
+    """
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'error': f"Unknown group_by '{group_by}'"}), 400
+    return jsonify(memory_snapshot(
+        limit=request.args.get('limit', 25, type=int),
+        group_by=group_by,
+        frames=request.args.get('frames', 1, type=int)
+    ))
+
+
+@bp.route('/memory/stop', methods=['POST'])
+def stop_memory():
+    """Stop tracemalloc tracing."""
+    stop_memory_tracing()
+    return jsonify({'tracing': False})
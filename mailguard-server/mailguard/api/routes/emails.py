@@ -18,6 +18,7 @@ def get_emails():
         per_page = request.args.get('per_page', 50, type=int)
         flagged_only = request.args.get('flagged', 'false').lower() == 'true'
         status_filter = request.args.get('status', None)
+        ids_filter = request.args.get('ids', None)
         
         query = EmailLog.query.options(
             joinedload(EmailLog.recipients),
@@ -35,6 +36,11 @@ def get_emails():
         if status_filter:
             query = query.filter(EmailLog.status == status_filter)
         
+        # Lazy detail fetch for batched SSE notifications (comma-separated IDs)
+        if ids_filter:
+            ids = [int(i) for i in ids_filter.split(',') if i.strip().isdigit()]
+            query = query.filter(EmailLog.id.in_(ids))
+        
         query = query.order_by(EmailLog.timestamp.desc())
         
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -6,6 +6,8 @@ import threading
 import uuid
 from flask import Blueprint, Response, stream_with_context
 
+from mailguard.monitoring import registry
+
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('events', __name__, url_prefix='/api/events')
@@ -13,6 +15,8 @@ bp = Blueprint('events', __name__, url_prefix='/api/events')
 _client_queues = {}
 _clients_lock = threading.Lock()
 
+registry.gauge('mailguard_sse_clients', 'Connected SSE clients', lambda: len(_client_queues))
+
 
 def add_event(event_data):
     """Add an event to be sent to all connected SSE clients."""
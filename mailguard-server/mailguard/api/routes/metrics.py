@@ -0,0 +1,12 @@
+"""Prometheus metrics route."""
+from flask import Blueprint, Response
+
+from mailguard.monitoring import registry
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose pipeline metrics in the Prometheus text format."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -27,18 +27,80 @@ class Config:
     FLASK_PORT = int(os.getenv('FLASK_PORT', 5001))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    # Token required by /api/admin/* (Authorization: Bearer <token>); without one they only
+    # answer requests from this host that don't come from a web page
+    ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')
     
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///mailguard.db')
     
     # Policy
     DEFAULT_POLICY = os.getenv('DEFAULT_POLICY', 'tag')
+    POLICY_RULES_FILE = os.getenv('POLICY_RULES_FILE', '')  # JSON rules, hot reloaded on change
+    POLICY_RELOAD_INTERVAL = float(os.getenv('POLICY_RELOAD_INTERVAL', 5))
+    # Candidate rules files decided for every message but never enforced (see /api/admin/policy/shadow)
+    SHADOW_POLICY_FILES = [f.strip() for f in os.getenv('SHADOW_POLICY_FILES', '').split(',') if f.strip()]
     MAX_ATTACHMENT_SIZE_MB = int(os.getenv('MAX_ATTACHMENT_SIZE_MB', 50))
     MAX_ARCHIVE_DEPTH = int(os.getenv('MAX_ARCHIVE_DEPTH', 5))
     
+    # Envelope policy (applied at MAIL FROM / RCPT TO, before DATA)
+    BLOCKED_SENDER_DOMAINS = [d for d in os.getenv('BLOCKED_SENDER_DOMAINS', '').split(',') if d.strip()]
+    BLOCKED_RECIPIENT_DOMAINS = [d for d in os.getenv('BLOCKED_RECIPIENT_DOMAINS', '').split(',') if d.strip()]
+    SENDER_QUOTA_PER_HOUR = int(os.getenv('SENDER_QUOTA_PER_HOUR', 0))  # 0 = unlimited
+    MAX_MESSAGE_SIZE_MB = int(os.getenv('MAX_MESSAGE_SIZE_MB', 32))
+    
+    # Token bucket rate limits at MAIL FROM, in messages per minute (0 = unlimited)
+    RATE_LIMIT_SENDER_PER_MINUTE = float(os.getenv('RATE_LIMIT_SENDER_PER_MINUTE', 0))
+    RATE_LIMIT_DOMAIN_PER_MINUTE = float(os.getenv('RATE_LIMIT_DOMAIN_PER_MINUTE', 0))
+    RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', 0))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))  # Idle buckets beyond this are evicted
+    
+    # Message data larger than this is spooled to disk while it is received
+    SPOOL_THRESHOLD_KB = int(os.getenv('SPOOL_THRESHOLD_KB', 1024))
+    SPOOL_DIR = os.getenv('SPOOL_DIR') or None  # Defaults to the system temp dir
+    
+    # Processing time budget per message; once spent, Tika extraction is skipped and
+    # detection drops to regex-only. DEGRADED_ACTION is the minimum action for such
+    # messages: allow (fail open) or quarantine/block (fail closed)
+    PROCESSING_BUDGET_SECONDS = float(os.getenv('PROCESSING_BUDGET_SECONDS', 60))  # 0 = unlimited
+    DEGRADED_ACTION = os.getenv('DEGRADED_ACTION', 'allow').lower()
+    
+    # Admission control: concurrent work and load-shedding thresholds
+    PROCESSING_WORKERS = int(os.getenv('PROCESSING_WORKERS', 4))  # 0 = process on the SMTP event loop
+    FAIR_QUEUE_KEY = os.getenv('FAIR_QUEUE_KEY', 'domain').lower()  # Workers are shared fairly by domain, sender or ip
+    MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 100))
+    MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 50))  # Messages queued or processing
+    MAX_QUEUE_WAIT_SECONDS = float(os.getenv('MAX_QUEUE_WAIT_SECONDS', 5))
+    TARGET_LATENCY_SECONDS = float(os.getenv('TARGET_LATENCY_SECONDS', 10))  # Above this, detection goes regex-only
+    
     # Detection
     MIN_CONFIDENCE = float(os.getenv('MIN_CONFIDENCE', 0.7))
     USE_PRESIDIO = os.getenv('USE_PRESIDIO', 'true').lower() == 'true'  # Use ML-based Presidio detection
+    # Presidio analyzes texts of concurrently processed messages together: up to
+    # NLP_BATCH_SIZE texts, each waiting at most NLP_BATCH_MAX_WAIT_MS for others (1 = no batching)
+    NLP_BATCH_SIZE = int(os.getenv('NLP_BATCH_SIZE', 16))
+    NLP_BATCH_MAX_WAIT_MS = float(os.getenv('NLP_BATCH_MAX_WAIT_MS', 5))
+    # Presidio analyzer: entity types to detect (empty = all), spaCy model (en_core_web_sm/md/lg)
+    # and spaCy components to leave out; fewer of each means faster startup and less memory
+    PRESIDIO_ENTITIES = [e.strip().upper() for e in os.getenv('PRESIDIO_ENTITIES', '').split(',') if e.strip()] or None
+    SPACY_MODEL = os.getenv('SPACY_MODEL', 'en_core_web_lg')
+    SPACY_DISABLED_COMPONENTS = [c.strip() for c in os.getenv('SPACY_DISABLED_COMPONENTS', 'parser').split(',') if c.strip()]
+    # Exact data match index of known sensitive values (built with edm.py); matches are
+    # reported as known_<type>, e.g. known_sin. Reloaded when it or its delta file changes
+    EDM_INDEX_FILE = os.getenv('EDM_INDEX_FILE', '')
+    # Hash key of the EDM index (edm.py keygen); kept apart from the index, since anyone
+    # with both could recover short values such as SINs by hashing every possible one
+    EDM_KEY_FILE = os.getenv('EDM_KEY_FILE', '')
+    # Dictionary of confidential terms (codenames, markings, customer names) under [type]
+    # sections, matched case-insensitively on whole words; reloaded on change
+    KEYWORD_DICTIONARY_FILE = os.getenv('KEYWORD_DICTIONARY_FILE', '')
+    # API keys, tokens and private keys in known formats (AWS, GitHub, Slack, PEM, JWT...);
+    # other random-looking strings score below MIN_CONFIDENCE=0.7 (lower it to see them)
+    SECRETS_DETECTION = os.getenv('SECRETS_DETECTION', 'true').lower() == 'true'
+    # Registry of confidential documents (managed with fingerprint.py); attachments this
+    # similar to one (0.0-1.0, shared word sequences) are detected as confidential_document
+    FINGERPRINT_REGISTRY_DIR = os.getenv('FINGERPRINT_REGISTRY_DIR', '')
+    FINGERPRINT_THRESHOLD = float(os.getenv('FINGERPRINT_THRESHOLD', 0.5))
     
     # Quarantine
     QUARANTINE_DIR = Path(os.getenv('QUARANTINE_DIR', './quarantine'))
@@ -47,4 +109,20 @@ class Config:
     # Attachments
     ATTACHMENTS_DIR = Path(os.getenv('ATTACHMENTS_DIR', './attachments'))
     ATTACHMENTS_DIR.mkdir(exist_ok=True)
+    # Text extracted from attachments, cached by content for repeat attachments and rescans
+    # ('' disables). It holds attachment content in plain text, so entries are removed after
+    # TEXT_CACHE_MAX_AGE_DAYS, and the oldest first beyond TEXT_CACHE_MAX_MB (0 = no limit)
+    TEXT_CACHE_DIR = os.getenv('TEXT_CACHE_DIR', '')
+    TEXT_CACHE_MAX_AGE_DAYS = float(os.getenv('TEXT_CACHE_MAX_AGE_DAYS', 30))
+    TEXT_CACHE_MAX_MB = int(os.getenv('TEXT_CACHE_MAX_MB', 1024))
+    
+    # Tracing: messages slower than the threshold are kept for /api/admin/traces/slow
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+    SLOW_TRACE_THRESHOLD_MS = float(os.getenv('SLOW_TRACE_THRESHOLD_MS', 5000))
+    SLOW_TRACE_RING_SIZE = int(os.getenv('SLOW_TRACE_RING_SIZE', 100))
+    TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', '')  # Slow traces appended as OTLP/JSON lines
+    
+    # Notifications
+    NOTIFICATION_MODE = os.getenv('NOTIFICATION_MODE', 'full').lower()  # full (one event per email) or summary (batched)
+    NOTIFICATION_BATCH_INTERVAL_MS = int(os.getenv('NOTIFICATION_BATCH_INTERVAL_MS', 250))
 
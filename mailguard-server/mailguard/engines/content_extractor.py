@@ -1,6 +1,7 @@
 """Content extraction from email attachments using Apache Tika."""
 import logging
 import requests
+import shutil
 import tempfile
 import os
 from pathlib import Path
@@ -8,28 +9,94 @@ from typing import Optional, Dict, List
 import zipfile
 import tarfile
 
+from ..models import TimeBudget
+from ..monitoring import current_span, traced
+from ..monitoring.metrics import EXTRACTION_SECONDS
+
 logger = logging.getLogger(__name__)
 
+TIKA_TIMEOUT = 30  # Seconds per Tika request, shortened to the remaining time budget
+
 class ContentExtractor:
     """Extract text content from various file types using Apache Tika."""
     
-    def __init__(self, tika_server_url: str = "http://localhost:9998"):
-        """Initialize content extractor."""
+    def __init__(self, tika_server_url: str = "http://localhost:9998", text_cache=None):
+        """
+        Initialize content extractor.
+        
+        Args:
+            tika_server_url: Tika server URL
+            text_cache: Optional ExtractedTextCache consulted by extract_file()
+        """
         self.tika_server_url = tika_server_url.rstrip('/')
         self.tika_text_endpoint = f"{self.tika_server_url}/tika"
         self.tika_meta_endpoint = f"{self.tika_server_url}/meta"
+        self.text_cache = text_cache
+    
+    def extract_file(self, file_path: str, max_size_mb: int = 50, max_depth: int = 2,
+                     budget: Optional[TimeBudget] = None,
+                     failures: Optional[List[str]] = None) -> str:
+        """
+        Extract the text of a stored attachment, unpacking archives.
+        
+        With a text cache, text already extracted from an identical file is
+        reused; complete extractions are added to the cache.
+        
+        Args:
+            file_path: Path to the file
+            max_size_mb: Maximum file size in MB
+            max_depth: Maximum archive nesting depth
+            budget: Optional processing budget
+            failures: Optional list the file (or archive members) that could not
+                be extracted are appended to, to tell a failure from a file without text
+            
+        Returns:
+            Extracted text ('' if there is none or extraction failed)
+        """
+        key = None
+        if self.text_cache:
+            key = self.text_cache.key(file_path)
+            cached = self.text_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        degradations = len(budget.degradations) if budget else 0
+        failed = []
+        if zipfile.is_zipfile(file_path) or tarfile.is_tarfile(file_path):
+            extracted = self.extract_from_archive(file_path, max_depth=max_depth, budget=budget, failures=failed)
+            text = "\n\n".join(extracted.values())
+        else:
+            text = self.extract_text(file_path, max_size_mb=max_size_mb, budget=budget)
+            if text is None:
+                failed.append(file_path)
+                text = ""
+        if failures is not None:
+            failures.extend(failed)
+        
+        # Failed, partly failed and budget-truncated extractions are retried next time
+        complete = not failed and (not budget or len(budget.degradations) == degradations)
+        if key and text and complete:
+            self.text_cache.put(key, text)
+        return text
     
-    def extract_text(self, file_path: str, max_size_mb: int = 50) -> Optional[str]:
+    @traced('extract_text')
+    def extract_text(self, file_path: str, max_size_mb: int = 50,
+                     budget: Optional[TimeBudget] = None) -> Optional[str]:
         """
         Extract text from a file using Tika.
         
         Args:
             file_path: Path to the file
             max_size_mb: Maximum file size in MB
+            budget: Optional processing budget; extraction is skipped once it is spent
             
         Returns:
             Extracted text or None if extraction fails
         """
+        current_span().set('file', os.path.basename(file_path))
+        if budget and budget.expired:
+            return _skip_extraction(file_path, budget)
+        
         try:
             # Check file size
             file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
@@ -37,12 +104,17 @@ class ContentExtractor:
                 logger.warning(f"File {file_path} exceeds size limit ({file_size:.2f}MB > {max_size_mb}MB)")
                 return None
             
-            with open(file_path, 'rb') as f:
+            # The budget may have run out since the check above (requests rejects a zero timeout)
+            timeout = budget.timeout(TIKA_TIMEOUT) if budget else TIKA_TIMEOUT
+            if timeout <= 0:
+                return _skip_extraction(file_path, budget)
+            
+            with open(file_path, 'rb') as f, EXTRACTION_SECONDS.time(extractor='tika'):
                 response = requests.put(
                     self.tika_text_endpoint,
                     data=f,
                     headers={'Accept': 'text/plain'},
-                    timeout=30
+                    timeout=timeout
                 )
                 
                 if response.status_code == 200:
@@ -51,12 +123,20 @@ class ContentExtractor:
                     logger.error(f"Tika extraction failed: {response.status_code} - {response.text}")
                     return None
                     
+        except requests.Timeout:
+            logger.error(f"Tika extraction timed out for {file_path}")
+            if budget and budget.expired:
+                budget.degrade(f"attachment_timeout:{os.path.basename(file_path)}")
+            return None
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {e}")
             return None
     
+    @traced('extract_from_archive')
     def extract_from_archive(self, archive_path: str, max_depth: int = 2, 
-                            current_depth: int = 0) -> Dict[str, str]:
+                            current_depth: int = 0,
+                            budget: Optional[TimeBudget] = None,
+                            failures: Optional[List[str]] = None) -> Dict[str, str]:
         """
         Extract text from all files in an archive (simplified - no nested archives).
         
@@ -64,6 +144,8 @@ class ContentExtractor:
             archive_path: Path to archive file
             max_depth: Maximum recursion depth (simplified to 2)
             current_depth: Current recursion depth
+            budget: Optional processing budget; remaining members are skipped once it is spent
+            failures: Optional list members (or the archive) that could not be extracted are appended to
             
         Returns:
             Dictionary mapping file paths to extracted text
@@ -77,26 +159,36 @@ class ContentExtractor:
         try:
             # Only handle ZIP files (simplified)
             if zipfile.is_zipfile(archive_path):
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+                with zipfile.ZipFile(archive_path, 'r') as zip_ref, \
+                        EXTRACTION_SECONDS.time(extractor='archive'):
                     for member in zip_ref.namelist():
                         if member.endswith('/'):
                             continue
+                        if budget and budget.expired:
+                            logger.warning(f"Time budget exhausted, skipping rest of archive {archive_path}")
+                            budget.degrade(f"archive_truncated:{os.path.basename(archive_path)}")
+                            break
                         
-                        # Extract to temp file
-                        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                            tmp.write(zip_ref.read(member))
+                        # Extract to temp file (streamed, the member is never fully in memory)
+                        with tempfile.NamedTemporaryFile(delete=False) as tmp, \
+                                zip_ref.open(member) as member_file:
+                            shutil.copyfileobj(member_file, tmp, 1024 * 1024)
                             tmp_path = tmp.name
                         
                         try:
-                            text = self.extract_text(tmp_path)
+                            text = self.extract_text(tmp_path, budget=budget)
                             if text:
                                 extracted[member] = text
+                            elif text is None and failures is not None:
+                                failures.append(f"{archive_path}:{member}")
                         finally:
                             if os.path.exists(tmp_path):
                                 os.unlink(tmp_path)
         
         except Exception as e:
             logger.error(f"Error extracting from archive {archive_path}: {e}")
+            if failures is not None:
+                failures.append(archive_path)
         
         return extracted
     
@@ -127,3 +219,9 @@ class ContentExtractor:
         except Exception:
             return False
 
+
+def _skip_extraction(file_path: str, budget: TimeBudget) -> None:
+    """Record an extraction skipped because the time budget is spent."""
+    logger.warning(f"Time budget exhausted, skipping extraction of {file_path}")
+    budget.degrade(f"attachment_skipped:{os.path.basename(file_path)}")
+    return None
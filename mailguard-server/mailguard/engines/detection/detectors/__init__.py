@@ -1,9 +1,21 @@
 """Detection detectors."""
+from .batching import PresidioBatcher
+from .edm import EDMDetector, EDMIndex
+from .fingerprint import FingerprintDetector, FingerprintRegistry
+from .keywords import KeywordDetector
 from .presidio_detector import PresidioDetector
 from .regex_detector import RegexDetector
+from .secrets import SecretsDetector
 
 __all__ = [
+    'EDMDetector',
+    'EDMIndex',
+    'FingerprintDetector',
+    'FingerprintRegistry',
+    'KeywordDetector',
+    'PresidioBatcher',
     'PresidioDetector',
-    'RegexDetector'
+    'RegexDetector',
+    'SecretsDetector'
 ]
 
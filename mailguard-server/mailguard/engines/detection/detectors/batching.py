@@ -0,0 +1,117 @@
+"""Micro-batching of Presidio analysis across concurrently processed messages."""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, List
+
+from ....models import DetectionResult
+from ....monitoring.metrics import NLP_BATCH_SIZE
+from .presidio_detector import PresidioDetector
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ('text', 'min_confidence', 'future')
+
+    def __init__(self, text: str, min_confidence: float):
+        self.text = text
+        self.min_confidence = min_confidence
+        self.future = Future()
+
+
+class PresidioBatcher:
+    """
+    Collects texts from concurrently processed messages and analyzes them together.
+
+    Running spaCy once per text is dominated by per-call overhead for short
+    texts. Callers of detect() block while a dispatcher thread gathers
+    requests for up to max_wait_ms (or until max_batch_size are waiting),
+    runs them through the NLP pipeline as one batch and hands each caller
+    its own results. max_wait_ms bounds the latency added to a message;
+    while a batch is being analyzed, the next one fills up without waiting.
+    """
+
+    def __init__(self, detector: PresidioDetector, max_batch_size: int = 16,
+                 max_wait_ms: float = 5.0):
+        """
+        Initialize the batcher and start its dispatcher thread.
+
+        Args:
+            detector: Presidio detector that analyzes the batches
+            max_batch_size: Most texts analyzed together
+            max_wait_ms: Longest a text waits for others to join its batch
+        """
+        self.detector = detector
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending: Deque[_Request] = deque()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._dispatch, name='mailguard-nlp-batcher', daemon=True)
+        self._thread.start()
+
+    @property
+    def analyzer(self):
+        return self.detector.analyzer
+
+    def available(self) -> bool:
+        return self.detector.available()
+
+    def load(self):
+        return self.detector.load()
+
+    def detect(self, text: str, min_confidence: float = 0.7) -> List[DetectionResult]:
+        """Detect patterns using Presidio, batched with other callers' texts."""
+        if not self.detector.analyzer or not text:
+            return []
+        request = _Request(text, min_confidence)
+        with self._condition:
+            if self._shutdown:
+                # Dispatcher is gone; analyze on the caller's thread
+                return self.detector.detect(text, min_confidence)
+            self._pending.append(request)
+            self._condition.notify()
+        return request.future.result()
+
+    def shutdown(self) -> None:
+        """Analyze the texts still waiting, then stop the dispatcher."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _next_batch(self) -> List[_Request]:
+        """Wait for a batch to fill up or its oldest text's wait to run out."""
+        with self._condition:
+            while not self._pending and not self._shutdown:
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._shutdown:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            count = min(len(self._pending), self.max_batch_size)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            NLP_BATCH_SIZE.observe(len(batch))
+            # One threshold for the batch; each caller's own is applied afterwards
+            threshold = min(request.min_confidence for request in batch)
+            try:
+                results = self.detector.detect_batch([request.text for request in batch], threshold)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, detections in zip(batch, results):
+                request.future.set_result(
+                    [d for d in detections if d.confidence >= request.min_confidence]
+                )
@@ -0,0 +1,422 @@
+"""Exact data match (EDM): detection of known sensitive values from a hashed index."""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ....models import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MGEDM001'
+# Bloom filter bits per value and hash functions (about 1% false positives)
+BLOOM_BITS_PER_VALUE = 10
+BLOOM_HASHES = 7
+# Hash table slots per value (load factor 0.5 keeps linear probes short)
+SLOTS_PER_VALUE = 2
+# Bytes of a generated hash key
+KEY_SIZE = 32
+
+_SEPARATORS = re.compile(r'[\s-]')
+
+
+def normalize_value(value: str) -> str:
+    """
+    Canonical form of a value, so formatting differences still match.
+
+    Spaces and dashes are dropped and letters case-folded: "046 454 286" and
+    "046-454-286" are the same SIN, "ACC-1234" and "acc1234" the same account.
+    """
+    return _SEPARATORS.sub('', value).casefold()
+
+
+def _fingerprint(key: bytes, pattern_type: str, value: str) -> int:
+    """64-bit keyed hash of a type and normalized value (0 is reserved for empty slots)."""
+    digest = hashlib.blake2b(f"{pattern_type}\0{normalize_value(value)}".encode('utf-8'),
+                             digest_size=8, key=key).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+def _key_check(key: bytes) -> str:
+    """Value stored in the index to recognize its key, from which the key can't be recovered."""
+    return hashlib.blake2b(b'mailguard-edm-key-check', digest_size=8, key=key).hexdigest()
+
+
+def generate_key(path: Path) -> None:
+    """
+    Write a new random hash key to a file readable only by its owner.
+
+    Raises:
+        FileExistsError: If the file exists (a key is never overwritten)
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(os.urandom(KEY_SIZE).hex() + '\n')
+
+
+def load_key(path: Path) -> bytes:
+    """Read a hash key written by generate_key."""
+    with open(path, encoding='ascii') as f:
+        try:
+            key = bytes.fromhex(f.read().strip())
+        except ValueError:
+            key = b''
+    if not 16 <= len(key) <= 64:
+        raise ValueError(f"{path} is not an EDM key file")
+    return key
+
+
+def _bloom_bits(fingerprint: int, bloom_bits: int) -> Iterator[int]:
+    # Double hashing: k bit positions from the two halves of the fingerprint
+    h1 = fingerprint & 0xFFFFFFFF
+    h2 = (fingerprint >> 32) | 1
+    for i in range(BLOOM_HASHES):
+        yield (h1 + i * h2) % bloom_bits
+
+
+class _IndexState:
+    """One loaded version of an index: the mapped base file plus its delta."""
+
+    def __init__(self, path: Path, key: bytes):
+        with open(path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime_ns
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:8] != MAGIC:
+            raise ValueError(f"{path} is not an EDM index")
+        header_size, = struct.unpack_from('<I', self.map, 8)
+        self.meta = json.loads(self.map[12:12 + header_size])
+        if self.meta.get('key_check') != _key_check(key):
+            raise ValueError(f"{path} was built with a different key")
+        self.key = key
+        self.bloom_bits = self.meta['bloom_bits']
+        self.slots = self.meta['slots']
+        self.bloom_offset = self.meta['bloom_offset']
+        self.table_offset = self.meta['table_offset']
+        self.types: Set[str] = set(self.meta['types'])
+        self.patterns: Dict[str, str] = self.meta.get('patterns', {})
+
+        self.delta_mtime = None
+        self.added: Set[int] = set()
+        self.removed: Set[int] = set()
+        delta_path = _delta_path(path)
+        try:
+            self.delta_mtime = os.stat(delta_path).st_mtime_ns
+            with open(delta_path, encoding='utf-8') as f:
+                for line in f:
+                    self._apply_delta(line)
+        except FileNotFoundError:
+            pass
+        # Only changes to the base count: re-added values are already in it, removed ones never were
+        self.added = {fp for fp in self.added if not self.in_base(fp)}
+        self.removed = {fp for fp in self.removed if self.in_base(fp)}
+
+    def _apply_delta(self, line: str) -> None:
+        parts = line.split()
+        if len(parts) != 3 or parts[0] not in '+-':
+            return
+        op, pattern_type, fingerprint = parts[0], parts[1], int(parts[2], 16)
+        if op == '+':
+            self.types.add(pattern_type)
+            self.added.add(fingerprint)
+            self.removed.discard(fingerprint)
+        else:
+            self.removed.add(fingerprint)
+            self.added.discard(fingerprint)
+
+    def in_base(self, fingerprint: int) -> bool:
+        bloom = self.map
+        offset = self.bloom_offset
+        for bit in _bloom_bits(fingerprint, self.bloom_bits):
+            if not bloom[offset + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        mask = self.slots - 1
+        slot = fingerprint & mask
+        while True:
+            stored, = struct.unpack_from('<Q', self.map, self.table_offset + slot * 8)
+            if stored == fingerprint:
+                return True
+            if stored == 0:
+                return False
+            slot = (slot + 1) & mask
+
+    def contains(self, fingerprint: int) -> bool:
+        if fingerprint in self.removed:
+            return False
+        return fingerprint in self.added or self.in_base(fingerprint)
+
+    def base_fingerprints(self) -> Iterator[int]:
+        table = array('Q')
+        table.frombytes(self.map[self.table_offset:self.table_offset + self.slots * 8])
+        return (fingerprint for fingerprint in table if fingerprint)
+
+
+def _delta_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.delta")
+
+
+class EDMIndex:
+    """
+    Memory-mapped index of known sensitive values (customer SINs, account numbers...).
+
+    The index file holds 64-bit keyed hashes of (type, normalized value) in
+    an open-addressing hash table, behind a Bloom filter that rejects almost
+    every value not in the index without touching the table. Values
+    themselves are never stored. The hash key is kept in a separate key
+    file (see generate_key): values like SINs have few enough possibilities
+    that anyone holding both files could find them by trying every one.
+    The index file is mapped read-only, so opening it takes milliseconds
+    whatever its size, and processes that map the same file share one copy
+    in the page cache.
+
+    Incremental changes go to a small delta file next to the index
+    (add/remove), which is loaded into memory; compact() folds it into a
+    new base file. Both files are checked for changes at most once per
+    reload_interval and swapped in atomically.
+    """
+
+    def __init__(self, path: Path, key: bytes, reload_interval: float = 5.0):
+        """
+        Open an index.
+
+        Args:
+            path: Index file (built with EDMIndex.build)
+            key: Hash key the index was built with (see load_key)
+            reload_interval: Minimum seconds between index file change checks
+        """
+        self.path = Path(path)
+        self.key = key
+        self.reload_interval = reload_interval
+        self._state = _IndexState(self.path, key)
+        self._reload_lock = threading.Lock()
+        self._next_reload_check = time.monotonic() + reload_interval
+        logger.info(f"Loaded EDM index {self.path} ({len(self)} value(s), types: {', '.join(sorted(self.types))})")
+
+    def __len__(self) -> int:
+        state = self._state
+        return state.meta['count'] + len(state.added) - len(state.removed)
+
+    @property
+    def types(self) -> Set[str]:
+        """Value types in the index."""
+        return self._state.types
+
+    @property
+    def patterns(self) -> Dict[str, str]:
+        """Candidate regexes stored with the index, by type."""
+        return self._state.patterns
+
+    def contains(self, pattern_type: str, value: str) -> bool:
+        """Whether a value of a type is in the index (O(1), no false negatives)."""
+        state = self._state
+        return state.contains(_fingerprint(state.key, pattern_type, value))
+
+    def maybe_reload(self) -> None:
+        """Reload the index if its files changed, checking at most once per interval."""
+        now = time.monotonic()
+        if now < self._next_reload_check or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_reload_check = now + self.reload_interval
+            state = self._state
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return
+            try:
+                delta_mtime = os.stat(_delta_path(self.path)).st_mtime_ns
+            except OSError:
+                delta_mtime = None
+            if mtime == state.mtime and delta_mtime == state.delta_mtime:
+                return
+            try:
+                self._state = _IndexState(self.path, self.key)
+            except Exception as e:
+                logger.error(f"Error reloading EDM index {self.path}, keeping the loaded one: {e}")
+                return
+            logger.info(f"Reloaded EDM index {self.path} ({len(self)} value(s))")
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def build(path: Path, values: Iterable[Tuple[str, str]], key: bytes,
+              patterns: Optional[Dict[str, str]] = None, fingerprints: Iterable[int] = (),
+              types: Iterable[str] = ()) -> int:
+        """
+        Write a new index file (atomically, replacing any existing one and its delta).
+
+        Args:
+            path: Index file to write
+            values: (type, value) pairs
+            key: Hash key (see generate_key); only a check value of it is stored
+            patterns: Regex finding candidates, for types RegexDetector has no pattern for
+            fingerprints: Already hashed entries to include (compaction)
+            types: Types of those entries
+
+        Returns:
+            Number of distinct entries written
+        """
+        path = Path(path)
+        types = set(types)
+        entries = array('Q', fingerprints)
+        for pattern_type, value in values:
+            types.add(pattern_type)
+            entries.append(_fingerprint(key, pattern_type, value))
+
+        slots = 8
+        while slots < len(entries) * SLOTS_PER_VALUE:
+            slots *= 2
+        bloom_bits = max(64, -(-len(entries) * BLOOM_BITS_PER_VALUE // 64) * 64)
+        table = array('Q', bytes(slots * 8))
+        bloom = bytearray(bloom_bits // 8)
+        mask = slots - 1
+        count = 0
+        for fingerprint in entries:
+            slot = fingerprint & mask
+            while table[slot] and table[slot] != fingerprint:
+                slot = (slot + 1) & mask
+            if table[slot]:
+                continue  # Duplicate
+            table[slot] = fingerprint
+            count += 1
+            for bit in _bloom_bits(fingerprint, bloom_bits):
+                bloom[bit >> 3] |= 1 << (bit & 7)
+
+        meta = {
+            'key_check': _key_check(key),
+            'count': count,
+            'types': sorted(types),
+            'patterns': patterns or {},
+            'bloom_bits': bloom_bits,
+            'slots': slots,
+            'created': time.time()
+        }
+        # Offsets depend on the header's length, which depends on the offsets' digits
+        meta['bloom_offset'] = meta['table_offset'] = 0
+        while True:
+            header = json.dumps(meta).encode('utf-8')
+            bloom_offset = -(-(12 + len(header)) // 8) * 8
+            table_offset = bloom_offset + len(bloom)
+            if (meta['bloom_offset'], meta['table_offset']) == (bloom_offset, table_offset):
+                break
+            meta['bloom_offset'], meta['table_offset'] = bloom_offset, table_offset
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<I', len(header)) + header)
+            f.write(b'\0' * (bloom_offset - 12 - len(header)))
+            f.write(bloom)
+            table.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        delta_path = _delta_path(path)
+        if delta_path.exists():
+            os.unlink(delta_path)
+        return count
+
+    @staticmethod
+    def update(path: Path, values: Iterable[Tuple[str, str]], key: bytes, remove: bool = False) -> int:
+        """
+        Add or remove values through the index's delta file.
+
+        Args:
+            path: Index file
+            values: (type, value) pairs
+            key: Hash key the index was built with
+            remove: Remove the values instead of adding them
+
+        Returns:
+            Number of values written to the delta
+        """
+        path = Path(path)
+        _IndexState(path, key)  # Checks the key before anything is written
+        op = '-' if remove else '+'
+        count = 0
+        with open(_delta_path(path), 'a', encoding='utf-8') as f:
+            for pattern_type, value in values:
+                f.write(f"{op} {pattern_type} {_fingerprint(key, pattern_type, value):016x}\n")
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        return count
+
+    @staticmethod
+    def compact(path: Path, key: bytes) -> int:
+        """
+        Fold the delta file into a new base index file.
+
+        Args:
+            path: Index file
+            key: Hash key the index was built with
+
+        Returns:
+            Number of entries in the new index
+        """
+        path = Path(path)
+        state = _IndexState(path, key)
+        fingerprints = (fp for fp in state.base_fingerprints() if fp not in state.removed)
+        return EDMIndex.build(path, (), key, state.patterns,
+                              fingerprints=list(fingerprints) + sorted(state.added), types=state.types)
+
+
+class EDMDetector:
+    """
+    Reports known values: candidates found by the regex patterns, looked up in an EDM index.
+
+    A candidate in the index is reported as "known_<type>" (e.g. known_sin)
+    with full confidence, so policy rules can treat our own customers' data
+    apart from anything that merely looks like it.
+    """
+
+    def __init__(self, index: EDMIndex, base_patterns: Dict[str, re.Pattern]):
+        """
+        Initialize detector.
+
+        Args:
+            index: EDM index to look candidates up in
+            base_patterns: Regex patterns by type (RegexDetector.patterns); the
+                index's own patterns take precedence
+        """
+        self.index = index
+        self.base_patterns = base_patterns
+        self._compiled: Tuple[Dict[str, str], Set[str], Dict[str, re.Pattern]] = ({}, set(), {})
+
+    def _patterns(self) -> Dict[str, re.Pattern]:
+        """Candidate patterns for the index's current types."""
+        index_patterns, types = self.index.patterns, self.index.types
+        cached_patterns, cached_types, compiled = self._compiled
+        if index_patterns is cached_patterns and types == cached_types:
+            return compiled
+        compiled = {}
+        for pattern_type in sorted(types):
+            if pattern_type in index_patterns:
+                compiled[pattern_type] = re.compile(index_patterns[pattern_type])
+            elif pattern_type in self.base_patterns:
+                compiled[pattern_type] = self.base_patterns[pattern_type]
+            else:
+                logger.warning(f"No pattern finds candidates for EDM type '{pattern_type}'; it is never matched")
+        self._compiled = (index_patterns, set(types), compiled)
+        return compiled
+
+    def detect(self, text: str, min_confidence: float = 0.7) -> List[DetectionResult]:
+        """Detect known values in text."""
+        self.index.maybe_reload()
+        results = []
+        for pattern_type, pattern in self._patterns().items():
+            for match in pattern.finditer(text):
+                if self.index.contains(pattern_type, match.group()):
+                    results.append(DetectionResult(
+                        pattern_type=f"known_{pattern_type}",
+                        matched_text=match.group(),
+                        confidence=1.0,
+                        position=(match.start(), match.end())
+                    ))
+        return results
@@ -0,0 +1,350 @@
+"""Document fingerprinting: near-duplicates of registered confidential documents (MinHash/LSH)."""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from ....models import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+# Words per shingle: long enough that shared boilerplate phrases don't add up to a match
+SHINGLE_WORDS = 5
+# MinHash permutations, split into LSH bands of BAND_ROWS rows. Documents with
+# Jaccard similarity s share at least one band with probability 1 - (1 - s^4)^32:
+# 0.5 -> 0.88, 0.6 -> 0.98, 0.3 -> 0.23
+NUM_PERM = 128
+BAND_ROWS = 4
+BANDS = NUM_PERM // BAND_ROWS
+# Longest text fingerprinted; near-duplicates of a document are found from its start
+MAX_TEXT_CHARS = 2_000_000
+# Shingles hashed per numpy block (bounds the temporary matrix to ~8 MB)
+BLOCK_SHINGLES = 8192
+
+MERSENNE_PRIME = (1 << 61) - 1
+MASK32 = (1 << 32) - 1
+MASK64 = (1 << 64) - 1
+FNV_PRIME = 0x100000001B3
+
+_WORDS = re.compile(r'\w+')
+
+
+def _permutations() -> Tuple[List[int], List[int]]:
+    """Fixed (a, b) of each hash permutation, so signatures are stable across runs and hosts."""
+    state = 0x9E3779B97F4A7C15
+    values = []
+    for _ in range(2 * NUM_PERM):
+        # splitmix64
+        state = (state + 0x9E3779B97F4A7C15) & MASK64
+        z = state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        values.append((z ^ (z >> 31)) % MERSENNE_PRIME)
+    return [v | 1 for v in values[:NUM_PERM]], values[NUM_PERM:]
+
+
+_PERM_A, _PERM_B = _permutations()
+
+
+def shingles(text: str) -> List[int]:
+    """Distinct 32-bit hashes of the text's word shingles (case-folded)."""
+    words = _WORDS.findall(text[:MAX_TEXT_CHARS].casefold())
+    if len(words) < SHINGLE_WORDS:
+        return [zlib.crc32(' '.join(words).encode('utf-8'))] if words else []
+    return list({
+        zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    })
+
+
+def minhash(hashes: List[int]) -> array:
+    """
+    MinHash signature (NUM_PERM unsigned 32-bit values) of a set of shingle hashes.
+
+    Each permutation is ((a * x + b) mod 2^64) mod (2^61 - 1), truncated to
+    32 bits; numpy computes the same values as the pure Python fallback.
+    """
+    if HAVE_NUMPY:
+        a = np.array(_PERM_A, dtype=np.uint64)
+        b = np.array(_PERM_B, dtype=np.uint64)
+        signature = np.full(NUM_PERM, MASK32, dtype=np.uint64)
+        values = np.array(hashes, dtype=np.uint64)
+        for start in range(0, len(values), BLOCK_SHINGLES):
+            block = values[start:start + BLOCK_SHINGLES, None]
+            permuted = ((block * a + b) % np.uint64(MERSENNE_PRIME)) & np.uint64(MASK32)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return array('I', signature.astype(np.uint32).tobytes())
+
+    signature = array('I', [MASK32] * NUM_PERM)
+    for i, (a, b) in enumerate(zip(_PERM_A, _PERM_B)):
+        signature[i] = min((((a * x + b) & MASK64) % MERSENNE_PRIME) & MASK32 for x in hashes)
+    return signature
+
+
+def band_keys(signature: array) -> List[int]:
+    """One 64-bit LSH key per band of a signature."""
+    keys = []
+    for band in range(BANDS):
+        key = band
+        for value in signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]:
+            key = ((key ^ value) * FNV_PRIME) & MASK64
+        keys.append(key)
+    return keys
+
+
+class _RegistryState:
+    """One loaded version of a registry: signatures plus per-band sorted LSH keys."""
+
+    def __init__(self, names: List[str], signatures: array):
+        self.names = names
+        self.signatures = signatures
+        self.bands: List[Tuple[array, array]] = []
+        count = len(names)
+        if HAVE_NUMPY and count:
+            matrix = np.frombuffer(signatures.tobytes(), dtype=np.uint32).reshape(count, NUM_PERM).astype(np.uint64)
+            for band in range(BANDS):
+                # Same keys as band_keys(), with uint64 wraparound as the 64-bit mask
+                keys = np.full(count, band, dtype=np.uint64)
+                for row in range(BAND_ROWS):
+                    keys = (keys ^ matrix[:, band * BAND_ROWS + row]) * np.uint64(FNV_PRIME)
+                order = np.argsort(keys, kind='stable')
+                self.bands.append((array('Q', keys[order].tobytes()), array('I', order.astype(np.uint32).tobytes())))
+        else:
+            per_band: List[List[Tuple[int, int]]] = [[] for _ in range(BANDS)]
+            for doc in range(count):
+                for band, key in enumerate(band_keys(signatures[doc * NUM_PERM:(doc + 1) * NUM_PERM])):
+                    per_band[band].append((key, doc))
+            for entries in per_band:
+                entries.sort()
+                self.bands.append((array('Q', [k for k, _ in entries]), array('I', [d for _, d in entries])))
+
+    def candidates(self, signature: array) -> set:
+        found = set()
+        for (keys, docs), key in zip(self.bands, band_keys(signature)):
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                found.add(docs[i])
+                i += 1
+        return found
+
+    def similarity(self, signature: array, doc: int) -> float:
+        stored = self.signatures[doc * NUM_PERM:(doc + 1) * NUM_PERM]
+        return sum(1 for x, y in zip(signature, stored) if x == y) / NUM_PERM
+
+
+class FingerprintRegistry:
+    """
+    Registry of reference documents' MinHash signatures, searched through LSH.
+
+    A registry is a directory holding documents.jsonl (one name per
+    document) and signatures.bin (NUM_PERM 32-bit values per document, in
+    the same order); documents' text is never stored. At load, each of the
+    BANDS bands of every signature is hashed to a key and the keys are kept
+    sorted, so a query is BANDS binary searches plus a comparison with the
+    few documents sharing a band, whatever the registry's size. Changes
+    made by add() or remove() (from another process) are picked up at most
+    once per reload_interval and swapped in atomically.
+    """
+
+    def __init__(self, registry_dir: Path, reload_interval: float = 5.0):
+        """
+        Open a registry (created empty if it doesn't exist).
+
+        Args:
+            registry_dir: Registry directory
+            reload_interval: Minimum seconds between registry change checks
+        """
+        self.registry_dir = Path(registry_dir)
+        self.registry_dir.mkdir(parents=True, exist_ok=True)
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._state = _RegistryState([], array('I'))
+        self._reload_lock = threading.Lock()
+        self._next_reload_check = 0.0
+        self.reload()
+
+    @property
+    def _names_path(self) -> Path:
+        return self.registry_dir / 'documents.jsonl'
+
+    @property
+    def _signatures_path(self) -> Path:
+        return self.registry_dir / 'signatures.bin'
+
+    def __len__(self) -> int:
+        return len(self._state.names)
+
+    def _current_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._signatures_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """Load the registry files, keeping the loaded registry if they can't be read."""
+        start = time.perf_counter()
+        mtime = self._current_mtime()
+        try:
+            names, signatures = self._read()
+        except Exception as e:
+            logger.error(f"Error loading fingerprint registry {self.registry_dir}: {e}")
+            return False
+        self._state = _RegistryState(names, signatures)
+        self._mtime = mtime
+        logger.info(f"Loaded fingerprint registry {self.registry_dir} ({len(names)} document(s) "
+                    f"in {time.perf_counter() - start:.2f}s)")
+        return True
+
+    def maybe_reload(self) -> None:
+        """Reload the registry if it changed, checking at most once per interval."""
+        now = time.monotonic()
+        if now < self._next_reload_check or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_reload_check = now + self.reload_interval
+            if self._current_mtime() != self._mtime:
+                self.reload()
+        finally:
+            self._reload_lock.release()
+
+    def _read(self) -> Tuple[List[str], array]:
+        signatures = array('I')
+        if not self._signatures_path.exists():
+            return [], signatures
+        with open(self._names_path, encoding='utf-8') as f:
+            names = [json.loads(line)['name'] for line in f if line.strip()]
+        with open(self._signatures_path, 'rb') as f:
+            signatures.frombytes(f.read())
+        # A writer may have appended one file but not yet the other
+        count = min(len(names), len(signatures) // NUM_PERM)
+        return names[:count], signatures[:count * NUM_PERM]
+
+    def match(self, text: str, threshold: float = 0.5) -> List[Tuple[str, float]]:
+        """
+        Registered documents the text is a near-duplicate of.
+
+        Args:
+            text: Text to check
+            threshold: Minimum estimated Jaccard similarity of the word shingles
+
+        Returns:
+            (document name, similarity) pairs, most similar first
+        """
+        self.maybe_reload()
+        state = self._state
+        if not state.names:
+            return []
+        hashes = shingles(text)
+        if not hashes:
+            return []
+        signature = minhash(hashes)
+        matches = []
+        for doc in state.candidates(signature):
+            similarity = state.similarity(signature, doc)
+            if similarity >= threshold:
+                matches.append((state.names[doc], similarity))
+        return sorted(matches, key=lambda m: -m[1])
+
+    def add(self, documents: Iterable[Tuple[str, str]]) -> int:
+        """
+        Register documents (appended to the registry files).
+
+        Args:
+            documents: (name, text) pairs
+
+        Returns:
+            Number of documents added (documents without words are skipped)
+        """
+        count = 0
+        with open(self._names_path, 'a', encoding='utf-8') as names_file, \
+                open(self._signatures_path, 'ab') as signatures_file:
+            for name, text in documents:
+                hashes = shingles(text)
+                if not hashes:
+                    logger.warning(f"Skipping {name}: no text to fingerprint")
+                    continue
+                names_file.write(json.dumps({'name': name, 'shingles': len(hashes), 'added': time.time()}) + '\n')
+                signatures_file.write(minhash(hashes).tobytes())
+                count += 1
+        return count
+
+    def remove(self, names: Iterable[str]) -> int:
+        """
+        Unregister documents by name (the registry files are rewritten).
+
+        Returns:
+            Number of documents removed
+        """
+        removing = set(names)
+        with open(self._names_path, encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        keep_names, signatures = [], array('I')
+        current = self._read()[1]
+        for doc, line in enumerate(lines[:len(current) // NUM_PERM]):
+            if json.loads(line)['name'] not in removing:
+                keep_names.append(line)
+                signatures.extend(current[doc * NUM_PERM:(doc + 1) * NUM_PERM])
+
+        removed = len(lines) - len(keep_names)
+        for path, write in ((self._names_path, lambda f: f.write(''.join(keep_names).encode('utf-8'))),
+                            (self._signatures_path, lambda f: f.write(signatures.tobytes()))):
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        return removed
+
+    def names(self) -> List[str]:
+        """Registered document names."""
+        return list(self._state.names)
+
+
+class FingerprintDetector:
+    """
+    Reports attachments that are near-duplicates of a registered confidential document.
+
+    The whole attachment text is the detection's span, its matched_text is
+    the registered document's name and its confidence the estimated
+    similarity.
+    """
+
+    pattern_type = 'confidential_document'
+
+    def __init__(self, registry: FingerprintRegistry, threshold: float = 0.5):
+        """
+        Initialize detector.
+
+        Args:
+            registry: Fingerprint registry
+            threshold: Minimum estimated similarity reported
+        """
+        self.registry = registry
+        self.threshold = threshold
+
+    def detect(self, text: str, min_confidence: float = 0.7) -> List[DetectionResult]:
+        """Detect registered documents in an attachment's text (min_confidence is not used)."""
+        if not text:
+            return []
+        matches = self.registry.match(text, self.threshold)
+        if not matches:
+            return []
+        name, similarity = matches[0]
+        return [DetectionResult(
+            pattern_type=self.pattern_type,
+            matched_text=name,
+            confidence=round(similarity, 3),
+            position=(0, len(text))
+        )]
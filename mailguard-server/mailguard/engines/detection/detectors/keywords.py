@@ -0,0 +1,283 @@
+"""Dictionary detector for confidential terms (codenames, markings, customer names)."""
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ....models import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ahocorasick
+    HAVE_PYAHOCORASICK = True
+except ImportError:
+    HAVE_PYAHOCORASICK = False
+
+# Type of terms listed before any [section] of a dictionary file
+DEFAULT_KEYWORD_TYPE = 'keyword'
+
+# Whitespace other than a single space: runs of it, line breaks, tabs
+_WHITESPACE_RUN = re.compile(r'\s{2,}|[^\S ]')
+
+
+def fold_case(text: str) -> str:
+    """Lower-case text without changing its length, so positions still line up."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # A few characters (e.g. 'İ') lower-case to two; leave those as they are
+    return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def fold_whitespace(text: str) -> Tuple[str, List[int], List[int]]:
+    """
+    Replace each whitespace run in text with one space.
+
+    Returns:
+        The folded text, and the folded positions from which original
+        positions lie further on, with how much further (for _original_position)
+    """
+    pieces = []
+    breaks: List[int] = []
+    shifts: List[int] = []
+    removed = 0
+    last = 0
+    for match in _WHITESPACE_RUN.finditer(text):
+        pieces.append(text[last:match.start()])
+        pieces.append(' ')
+        removed += match.end() - match.start() - 1
+        last = match.end()
+        breaks.append(last - removed)
+        shifts.append(removed)
+    if not pieces:
+        return text, breaks, shifts
+    pieces.append(text[last:])
+    return ''.join(pieces), breaks, shifts
+
+
+def _original_position(position: int, breaks: List[int], shifts: List[int]) -> int:
+    """Position in the original text of a position in text folded by fold_whitespace."""
+    i = bisect_right(breaks, position)
+    return position + shifts[i - 1] if i else position
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+
+class _PythonAutomaton:
+    """Aho-Corasick automaton in pure Python (used when pyahocorasick is not installed)."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, str]]] = [[]]
+
+    def add_word(self, term: str, value: Tuple[int, str]) -> None:
+        state = 0
+        for c in term:
+            next_state = self._goto[state].get(c)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][c] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(value)
+
+    def make_automaton(self) -> None:
+        # Breadth-first, so a state's failure target is always done before it
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for c, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(c, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter(self, text: str) -> Iterator[Tuple[int, Tuple[int, str]]]:
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for end, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for value in output[state]:
+                yield end, value
+
+
+class KeywordDictionary:
+    """
+    Compiled dictionary: one Aho-Corasick automaton over every term.
+
+    Text is scanned once, in time linear in its length whatever the number
+    of terms; pyahocorasick (C) is used when installed. Whitespace runs in
+    terms and text are folded to one space, so a term still matches when
+    its words are wrapped onto two lines or separated by several spaces.
+    """
+
+    def __init__(self, terms: Dict[str, str]):
+        """
+        Compile a dictionary.
+
+        Args:
+            terms: Detection type by term
+        """
+        folded_terms = {}
+        for term, pattern_type in terms.items():
+            folded = fold_case(' '.join(term.split()))
+            if folded:
+                folded_terms[folded] = pattern_type
+
+        automaton = ahocorasick.Automaton() if HAVE_PYAHOCORASICK else _PythonAutomaton()
+        for term, pattern_type in folded_terms.items():
+            automaton.add_word(term, (len(term), pattern_type))
+        if folded_terms:
+            automaton.make_automaton()
+        self._automaton = automaton if folded_terms else None
+        self.size = len(folded_terms)
+
+    @classmethod
+    def load(cls, path: Path) -> 'KeywordDictionary':
+        """
+        Load a dictionary file: one term per line, grouped under [type] sections.
+
+        Terms before the first section are of type "keyword"; blank lines and
+        lines starting with '#' are skipped.
+        """
+        terms = {}
+        pattern_type = DEFAULT_KEYWORD_TYPE
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('[') and line.endswith(']'):
+                    pattern_type = line[1:-1].strip().lower().replace(' ', '_') or DEFAULT_KEYWORD_TYPE
+                else:
+                    terms[line] = pattern_type
+        return cls(terms)
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Whole-word, case-insensitive matches in text, whatever whitespace separates a term's words.
+
+        Returns:
+            (start, end, type) of each match in the original text, leftmost-longest, not overlapping
+        """
+        if self._automaton is None or not text:
+            return []
+        folded, breaks, shifts = fold_whitespace(fold_case(text))
+        matches = []
+        for end, (length, pattern_type) in self._automaton.iter(folded):
+            start = end - length + 1
+            end += 1
+            # Word boundaries are only required where the term itself starts/ends with a word character
+            if start > 0 and _is_word_char(folded[start]) and _is_word_char(folded[start - 1]):
+                continue
+            if end < len(folded) and _is_word_char(folded[end - 1]) and _is_word_char(folded[end]):
+                continue
+            matches.append((start, end, pattern_type))
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        result = []
+        cursor = 0
+        for start, end, pattern_type in matches:
+            if start >= cursor:
+                # Terms start and end with a non-space character, so both ends map back exactly
+                result.append((_original_position(start, breaks, shifts),
+                               _original_position(end - 1, breaks, shifts) + 1, pattern_type))
+                cursor = end
+        return result
+
+
+class KeywordDetector:
+    """
+    Detects terms from a dictionary file, reported with the type of their section.
+
+    The file is checked for changes at most once per reload_interval; a new
+    dictionary is compiled completely before it replaces the old one, so
+    detection never sees a half-built automaton.
+    """
+
+    def __init__(self, dictionary_file: Path, reload_interval: float = 5.0,
+                 confidence: float = 1.0):
+        """
+        Initialize detector.
+
+        Args:
+            dictionary_file: Dictionary file (see KeywordDictionary.load)
+            reload_interval: Minimum seconds between dictionary file change checks
+            confidence: Confidence given to every match
+        """
+        self.dictionary_file = Path(dictionary_file)
+        self.reload_interval = reload_interval
+        self.confidence = confidence
+        self.dictionary = KeywordDictionary({})
+        self._mtime: Optional[int] = None
+        self._next_reload_check = 0.0
+        self._reload_lock = threading.Lock()
+        if not self.reload():
+            raise ValueError(f"Could not load keyword dictionary {self.dictionary_file}")
+
+    def reload(self) -> bool:
+        """
+        Load and compile the dictionary file, swapping it in atomically.
+
+        The previous dictionary stays active if the file cannot be loaded.
+
+        Returns:
+            True if the new dictionary was loaded, False otherwise
+        """
+        try:
+            mtime = os.stat(self.dictionary_file).st_mtime_ns
+            start = time.perf_counter()
+            dictionary = KeywordDictionary.load(self.dictionary_file)
+        except Exception as e:
+            logger.error(f"Error loading keyword dictionary {self.dictionary_file}: {e}")
+            return False
+        self.dictionary = dictionary
+        self._mtime = mtime
+        logger.info(f"Loaded keyword dictionary {self.dictionary_file} ({dictionary.size} term(s) "
+                    f"in {time.perf_counter() - start:.2f}s, "
+                    f"{'pyahocorasick' if HAVE_PYAHOCORASICK else 'pure Python'} automaton)")
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_reload_check or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_reload_check = now + self.reload_interval
+            try:
+                mtime = os.stat(self.dictionary_file).st_mtime_ns
+            except OSError:
+                return
+            if mtime != self._mtime:
+                self.reload()
+        finally:
+            self._reload_lock.release()
+
+    def detect(self, text: str, min_confidence: float = 0.7) -> List[DetectionResult]:
+        """Detect dictionary terms in text."""
+        if self.confidence < min_confidence:
+            return []
+        self._maybe_reload()
+        return [
+            DetectionResult(
+                pattern_type=pattern_type,
+                matched_text=text[start:end],
+                confidence=self.confidence,
+                position=(start, end)
+            )
+            for start, end, pattern_type in self.dictionary.find(text)
+        ]
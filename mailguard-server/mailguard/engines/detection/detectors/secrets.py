@@ -0,0 +1,190 @@
+"""Secret and credential detector: known token formats plus high-entropy strings."""
+import base64
+import binascii
+import logging
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from ....models import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+# Known credential formats, anchored on their fixed prefix: (type, regex, confidence)
+PREFIX_PATTERNS = [
+    ('aws_access_key', r'(?:AKIA|ASIA|AGPA|AIDA|AROA|ANPA|ANVA)[0-9A-Z]{16}(?![0-9A-Z])', 0.95),
+    ('aws_secret_key', r'(?i:aws_?secret_?(?:access_?)?key)["\']?\s*[:=]\s*["\']?[A-Za-z0-9/+=]{40}(?![A-Za-z0-9/+=])',
+     0.95),
+    ('github_token', r'(?:gh[pousr]_[A-Za-z0-9]{36,255}|github_pat_[A-Za-z0-9_]{60,255})', 0.99),
+    ('slack_token', r'xox[baprs]-[A-Za-z0-9-]{10,250}', 0.95),
+    ('slack_webhook', r'https://hooks\.slack\.com/services/T[A-Za-z0-9_]+/B[A-Za-z0-9_]+/[A-Za-z0-9_]+', 0.95),
+    ('stripe_key', r'(?:sk|rk)_live_[A-Za-z0-9]{20,247}', 0.95),
+    ('google_api_key', r'AIza[0-9A-Za-z_-]{35}(?![0-9A-Za-z_-])', 0.9),
+    ('jwt', r'eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}', 0.85),
+]
+# Header of a PEM/PGP private key; the detection runs to its END line
+PRIVATE_KEY_HEADER = r'-----BEGIN (?:[A-Z0-9]+ )*PRIVATE KEY(?: BLOCK)?-----'
+PRIVATE_KEY_MAX_CHARS = 64 * 1024
+
+# Base64 inline images (data URIs) and blocks of wrapped base64 lines
+DATA_URI = r'data:(?P<mime>[\w.+-]+/[\w.+-]+);base64,[A-Za-z0-9+/=\s]*'
+BASE64_BLOCK = r'(?:[A-Za-z0-9+/]{40,}={0,2}[ \t]*\r?\n){2,}(?:[A-Za-z0-9+/]+={0,2})?'
+# Leading bytes of image formats, checked on the decoded start of a base64 block
+IMAGE_MAGIC = (b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'II*\x00', b'MM\x00*', b'BM', b'\x00\x00\x01\x00')
+
+# Generic candidates: long runs of key-like characters; longer runs are blobs, not keys.
+# '=' is only allowed as base64 padding, so in NAME=value the name and value are separate
+# candidates and a known format in the value is still found by its prefix
+CANDIDATE = r'[A-Za-z0-9+/_-]{20,}={0,2}'
+CANDIDATE_MAX_CHARS = 256
+# Entropy a candidate needs, as a share of the most its length and alphabet allow
+ENTROPY_RATIO = 0.85
+# Confidence of high-entropy strings, all below the default MIN_CONFIDENCE: ordinary mail
+# is full of random-looking ids (Message-IDs, meeting links, order codes), so they are
+# only reported when it is lowered. Hex ones (hashes, commit ids) and base64 blocks that
+# aren't images rank lowest
+ENTROPY_CONFIDENCE = (0.6, 0.68)
+HEX_CONFIDENCE = 0.55
+BLOB_CONFIDENCE = 0.5
+# Candidates above this count have their entropy computed in one numpy pass
+VECTORIZE_MIN_TOKENS = 64
+
+_HEX = re.compile(r'[0-9a-fA-F]+')
+
+
+def _combined_pattern() -> re.Pattern:
+    """One alternation of every pattern, so text is scanned in a single pass."""
+    # One lookbehind shared by the prefixed formats lets the scan skip them quickly inside words
+    prefixed = '|'.join(f"(?P<{name}>{regex})" for name, regex, _ in PREFIX_PATTERNS)
+    alternatives = [
+        f"(?<![A-Za-z0-9_])(?:{prefixed})",
+        f"(?P<private_key>{PRIVATE_KEY_HEADER})",
+        f"(?P<data_uri>{DATA_URI})",
+        f"(?P<base64_block>{BASE64_BLOCK})",
+        f"(?P<candidate>{CANDIDATE})",
+    ]
+    return re.compile('|'.join(alternatives))
+
+
+def shannon_entropy(tokens: List[str]) -> List[float]:
+    """Shannon entropy (bits per character) of each token."""
+    if not tokens:
+        return []
+    if not HAVE_NUMPY or len(tokens) < VECTORIZE_MIN_TOKENS:
+        entropies = []
+        for token in tokens:
+            length = len(token)
+            entropies.append(-sum(c / length * math.log2(c / length) for c in Counter(token).values()))
+        return entropies
+
+    # Count every (token, character) pair at once and sum -p*log2(p) per token
+    lengths = np.array([len(t) for t in tokens], dtype=np.int64)
+    codes = np.frombuffer(''.join(tokens).encode('ascii'), dtype=np.uint8).astype(np.int64)
+    token_ids = np.repeat(np.arange(len(tokens)), lengths)
+    pairs, counts = np.unique(token_ids * 256 + codes, return_counts=True)
+    owners = pairs // 256
+    p = counts / lengths[owners]
+    return (-np.bincount(owners, weights=p * np.log2(p), minlength=len(tokens))).tolist()
+
+
+def _is_image(encoded: str) -> bool:
+    """Whether base64 text decodes to the start of an image."""
+    head = re.sub(r'\s', '', encoded[:64])[:16]
+    try:
+        decoded = base64.b64decode(head + '=' * (-len(head) % 4))
+    except (binascii.Error, ValueError):
+        return False
+    return decoded.startswith(IMAGE_MAGIC) or (decoded[:4] == b'RIFF' and decoded[8:12] == b'WEBP')
+
+
+class SecretsDetector:
+    """
+    Detects API keys, tokens and private keys.
+
+    Known formats (AWS, GitHub, Slack, Stripe, Google, JWT, PEM private
+    keys) are found by their fixed prefixes; any other long run of key-like
+    characters is reported if its Shannon entropy is close to the most its
+    length allows, i.e. it looks random, with a confidence below the default
+    threshold (see ENTROPY_CONFIDENCE). All patterns are alternatives of a
+    single regex, so the text is scanned once and time grows linearly with
+    its size. Base64 images (data URIs or wrapped blocks whose decoded
+    start is an image header) are skipped.
+    """
+
+    def __init__(self):
+        """Compile the combined pattern."""
+        self.pattern = _combined_pattern()
+        self.confidences = {name: confidence for name, _, confidence in PREFIX_PATTERNS}
+
+    def detect(self, text: str, min_confidence: float = 0.7) -> List[DetectionResult]:
+        """Detect secrets in text."""
+        results = []
+        candidates: List[Tuple[str, int, int]] = []
+        skip_until = 0
+        for match in self.pattern.finditer(text):
+            start, end = match.span()
+            if start < skip_until:
+                continue  # Inside a private key already reported
+            kind = match.lastgroup
+
+            if kind == 'private_key':
+                end_marker = text.find('-----END ', end, end + PRIVATE_KEY_MAX_CHARS)
+                if end_marker != -1:
+                    line_end = text.find('-----', end_marker + 9, end_marker + 100)
+                    end = line_end + 5 if line_end != -1 else end_marker
+                skip_until = end
+                results.append(self._result('private_key', text, start, end, 1.0))
+            elif kind == 'data_uri':
+                if not match.group('mime').startswith('image/'):
+                    candidates.append(('blob', start, end))
+            elif kind == 'base64_block':
+                if not _is_image(match.group()):
+                    candidates.append(('blob', start, end))
+            elif kind == 'candidate':
+                if end - start <= CANDIDATE_MAX_CHARS:
+                    candidates.append(('token', start, end))
+            else:
+                results.append(self._result(kind, text, start, end, self.confidences[kind]))
+
+        results.extend(self._score_candidates(text, candidates))
+        return [r for r in results if r.confidence >= min_confidence]
+
+    def _score_candidates(self, text: str, candidates: List[Tuple[str, int, int]]) -> List[DetectionResult]:
+        """High-entropy candidates as detections."""
+        # Entropy of a blob is measured on its first line's worth of characters
+        tokens = [text[start:end] if kind == 'token' else re.sub(r'\s', '', text[start:end][:CANDIDATE_MAX_CHARS])
+                  for kind, start, end in candidates]
+        results = []
+        for (kind, start, end), token, entropy in zip(candidates, tokens, shannon_entropy(tokens)):
+            if kind == 'token' and not (any(c.isdigit() for c in token) and any(c.isalpha() for c in token)):
+                continue  # Plain words, numbers and separators
+            hex_only = _HEX.fullmatch(token) is not None
+            max_entropy = math.log2(min(len(token), 16 if hex_only else 64))
+            ratio = entropy / max_entropy if max_entropy else 0.0
+            if ratio < ENTROPY_RATIO:
+                continue
+            if kind == 'blob':
+                confidence = BLOB_CONFIDENCE
+            elif hex_only:
+                confidence = HEX_CONFIDENCE
+            else:
+                low, high = ENTROPY_CONFIDENCE
+                confidence = round(min(high, low + (ratio - ENTROPY_RATIO) / (1 - ENTROPY_RATIO) * (high - low)), 3)
+            results.append(self._result('high_entropy_string', text, start, end, confidence))
+        return results
+
+    @staticmethod
+    def _result(pattern_type: str, text: str, start: int, end: int, confidence: float) -> DetectionResult:
+        return DetectionResult(
+            pattern_type=pattern_type,
+            matched_text=text[start:end],
+            confidence=confidence,
+            position=(start, end)
+        )
@@ -1,9 +1,17 @@
 """Detection engine for sensitive data patterns using Presidio."""
 import logging
-from typing import List, Dict
+import threading
+from pathlib import Path
+from typing import Iterable, List, Dict, Optional
 
-from ...models import DetectionResult
-from .detectors import PresidioDetector, RegexDetector
+from ...models import DetectionResult, MessagePart, TimeBudget
+from ...models.parsed_message import ATTACHMENT
+from ...monitoring import current_span, traced
+from ...monitoring.metrics import DETECTION_SECONDS
+from .detectors import (EDMDetector, EDMIndex, FingerprintDetector, FingerprintRegistry, KeywordDetector,
+                        PresidioBatcher, PresidioDetector, RegexDetector, SecretsDetector)
+from .detectors.edm import load_key
+from .detectors.presidio_detector import DEFAULT_DISABLED_COMPONENTS, DEFAULT_SPACY_MODEL
 
 logger = logging.getLogger(__name__)
 
@@ -11,12 +19,33 @@ logger = logging.getLogger(__name__)
 class DetectionEngine:
     """Engine for detecting sensitive data patterns using Presidio."""
     
-    def __init__(self, use_presidio: bool = True):
+    def __init__(self, use_presidio: bool = True, batch_size: int = 1,
+                 batch_max_wait_ms: float = 5.0, entities: Optional[Iterable[str]] = None,
+                 spacy_model: str = DEFAULT_SPACY_MODEL,
+                 disabled_components: Iterable[str] = DEFAULT_DISABLED_COMPONENTS,
+                 lazy: bool = False, edm_index_file: Optional[Path] = None,
+                 edm_key_file: Optional[Path] = None, keyword_file: Optional[Path] = None, detect_secrets: bool = False,
+                 fingerprint_registry_dir: Optional[Path] = None,
+                 fingerprint_threshold: float = 0.5):
         """
         Initialize detection engine.
         
         Args:
             use_presidio: Use Presidio for detection (recommended)
+            batch_size: Most texts from concurrent callers analyzed by Presidio
+                together (1 = no batching)
+            batch_max_wait_ms: Longest a text waits for others to join its batch
+            entities: Presidio entity types to detect (None = all)
+            spacy_model: spaCy model Presidio loads
+            disabled_components: spaCy pipeline components to remove
+            lazy: Load the Presidio analyzer on first use or load_models(), not now
+            edm_index_file: Optional exact data match index of known sensitive values
+            edm_key_file: Hash key the EDM index was built with
+            keyword_file: Optional dictionary of confidential terms
+            detect_secrets: Detect API keys, tokens and private keys
+            fingerprint_registry_dir: Optional registry of confidential documents
+                that attachments are compared with
+            fingerprint_threshold: Minimum similarity to a registered document
         """
         self.use_presidio = use_presidio
         
@@ -25,21 +54,74 @@ class DetectionEngine:
         self.regex_detector = None
         
         if use_presidio:
-            self.presidio_detector = PresidioDetector()
-            if not self.presidio_detector.analyzer:
+            self.presidio_detector = PresidioDetector(
+                entities=entities,
+                spacy_model=spacy_model,
+                disabled_components=disabled_components,
+                lazy=lazy
+            )
+            if not self.presidio_detector.available():
                 logger.warning("Falling back to regex-based detection")
                 self.presidio_detector = None
                 self.regex_detector = RegexDetector()
+            elif batch_size > 1:
+                # Same detect() interface, shared by all processing threads
+                self.presidio_detector = PresidioBatcher(self.presidio_detector, batch_size, batch_max_wait_ms)
         else:
             self.regex_detector = RegexDetector()
+        
+        # Detectors that run on every text whichever of the above is used
+        self.supplementary_detectors = {}
+        if edm_index_file:
+            try:
+                if not edm_key_file:
+                    raise ValueError("no key file (EDM_KEY_FILE) given")
+                self.supplementary_detectors['edm'] = EDMDetector(EDMIndex(edm_index_file, load_key(edm_key_file)),
+                                                                  RegexDetector().patterns)
+            except Exception as e:
+                logger.error(f"Error loading EDM index {edm_index_file}: {e}")
+        if keyword_file:
+            try:
+                self.supplementary_detectors['keywords'] = KeywordDetector(keyword_file)
+            except Exception as e:
+                logger.error(f"Error loading keyword dictionary {keyword_file}: {e}")
+        if detect_secrets:
+            self.supplementary_detectors['secrets'] = SecretsDetector()
+        
+        # Whole attachments are compared with registered documents
+        self.fingerprint_detector = None
+        if fingerprint_registry_dir:
+            self.fingerprint_detector = FingerprintDetector(FingerprintRegistry(fingerprint_registry_dir),
+                                                            fingerprint_threshold)
+    
+    def load_models(self, background: bool = False) -> None:
+        """
+        Load the Presidio analyzer now if loading was deferred (lazy=True).
+        
+        Args:
+            background: Load on a separate thread; messages detected meanwhile
+                wait for it
+        """
+        if not self.presidio_detector:
+            return
+        if background:
+            threading.Thread(target=self.presidio_detector.load, name='mailguard-nlp-loader',
+                             daemon=True).start()
+        else:
+            self.presidio_detector.load()
     
-    def detect_patterns(self, text: str, min_confidence: float = 0.7) -> List[DetectionResult]:
+    @traced('detect_patterns')
+    def detect_patterns(self, text: str, min_confidence: float = 0.7,
+                        budget: Optional[TimeBudget] = None,
+                        regex_only: bool = False) -> List[DetectionResult]:
         """
         Detect sensitive patterns in text using Presidio ML models.
         
         Args:
             text: Text to analyze
             min_confidence: Minimum confidence threshold (0.0-1.0)
+            budget: Optional processing budget; detection drops to regex-only once it is spent
+            regex_only: Skip Presidio and use the cheap regex tier (e.g. under load)
             
         Returns:
             List of DetectionResult objects
@@ -48,21 +130,76 @@ class DetectionEngine:
             return []
         
         results = []
+        span = current_span()
+        span.set('chars', len(text))
         
+        budget_spent = budget is not None and budget.expired
+        if self.presidio_detector and (regex_only or budget_spent):
+            if budget_spent:
+                budget.degrade('regex_only')
+            if self.regex_detector is None:
+                self.regex_detector = RegexDetector()
         # Use Presidio for ML-based detection
-        if self.presidio_detector:
-            results = self.presidio_detector.detect(text, min_confidence)
+        elif self.presidio_detector:
+            span.set('detector', 'presidio')
+            with DETECTION_SECONDS.time(detector='presidio'):
+                results = self.presidio_detector.detect(text, min_confidence)
             # Fallback to regex if Presidio fails or returns nothing
             if not results and self.regex_detector is None:
                 self.regex_detector = RegexDetector()
         
         # Fallback to regex-based detection
         if not results and self.regex_detector:
-            results = self.regex_detector.detect(text, min_confidence)
+            span.set('detector', 'regex')
+            with DETECTION_SECONDS.time(detector='regex'):
+                results = self.regex_detector.detect(text, min_confidence)
+        
+        if self.supplementary_detectors:
+            results = self._add_supplementary(text, results, min_confidence)
         
         # Remove duplicates
         return self._deduplicate_results(results)
     
+    def _add_supplementary(self, text: str, results: List[DetectionResult],
+                           min_confidence: float) -> List[DetectionResult]:
+        """Add the supplementary detectors' results, which replace results with the same span."""
+        extra = []
+        for name, detector in self.supplementary_detectors.items():
+            with DETECTION_SECONDS.time(detector=name):
+                extra.extend(detector.detect(text, min_confidence))
+        if not extra:
+            return results
+        spans = {d.position for d in extra}
+        return [d for d in results if d.position not in spans] + extra
+    
+    def detect_in_parts(self, parts: Iterable[MessagePart],
+                        min_confidence: float = 0.7,
+                        budget: Optional[TimeBudget] = None,
+                        regex_only: bool = False) -> List[DetectionResult]:
+        """
+        Detect sensitive patterns in each message part's scan text separately.
+        
+        Args:
+            parts: Parsed message parts
+            min_confidence: Minimum confidence threshold (0.0-1.0)
+            budget: Optional processing budget (see detect_patterns)
+            regex_only: Skip Presidio and use the cheap regex tier
+            
+        Returns:
+            List of DetectionResult objects with part_index set and positions
+            relative to their part's scan text, in part order
+        """
+        results = []
+        for part in parts:
+            part_results = self.detect_patterns(part.scan_text, min_confidence, budget, regex_only)
+            if self.fingerprint_detector and part.kind == ATTACHMENT:
+                with DETECTION_SECONDS.time(detector='fingerprint'):
+                    part_results.extend(self.fingerprint_detector.detect(part.scan_text))
+            for result in part_results:
+                result.part_index = part.index
+                results.append(result)
+        return results
+    
     def _deduplicate_results(self, results: List[DetectionResult]) -> List[DetectionResult]:
         """Remove duplicate detection results."""
         seen = set()
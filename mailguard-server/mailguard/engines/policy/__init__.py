@@ -1,6 +1,22 @@
 """Policy enforcement engine for email handling."""
 from ...models import PolicyDecision
 from .engine import PolicyEngine
+from .rules import CompiledPolicy, PolicyContext, PolicyRule, load_policy
+from .sanitizer import MessageSanitizer
+from .shadow import ShadowPolicies
+from .envelope import EnvelopePolicy
+from .rate_limit import RateLimiter
 
-__all__ = ['PolicyDecision', 'PolicyEngine']
+__all__ = [
+    'PolicyDecision',
+    'PolicyEngine',
+    'CompiledPolicy',
+    'PolicyContext',
+    'PolicyRule',
+    'load_policy',
+    'MessageSanitizer',
+    'ShadowPolicies',
+    'EnvelopePolicy',
+    'RateLimiter'
+]
 
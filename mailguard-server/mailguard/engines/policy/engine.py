@@ -1,70 +1,216 @@
 """Policy enforcement engine for email handling."""
 import logging
-import copy
+import os
+import time
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from email.message import EmailMessage
 from dataclasses import asdict
 
-from ...models import DetectionResult, PolicyDecision
+from ...models import DetectionResult, PolicyDecision, MessageOverlay, ParsedMessage, TimeBudget
+from ...monitoring import traced
+from .rules import ACTION_SEVERITY, CompiledPolicy, PolicyContext, PolicyRule, load_policy
+from .sanitizer import MessageSanitizer
+from .shadow import ShadowPolicies
 
 logger = logging.getLogger(__name__)
 
 class PolicyEngine:
     """Engine for enforcing data leakage prevention policies."""
     
-    def __init__(self, default_policy: str = "tag", quarantine_dir: Path = None):
+    def __init__(self, default_policy: str = "tag", quarantine_dir: Path = None,
+                 rules_file: Path = None, reload_interval: float = 5.0,
+                 degraded_action: str = "allow", shadow_rules_files: List[Path] = None):
         """
         Initialize policy engine.
         
         Args:
             default_policy: Default action (block, sanitize, quarantine, tag)
             quarantine_dir: Directory for quarantined emails
+            rules_file: Optional JSON policy rules file (hot reloaded on change)
+            reload_interval: Minimum seconds between rules file change checks
+            degraded_action: Minimum action for messages whose time budget ran out
+                ("allow" fails open, "quarantine" or "block" fail closed)
+            shadow_rules_files: Rules files of shadow policies, decided for every
+                message alongside the active rules but never enforced
         """
+        if degraded_action not in ACTION_SEVERITY:
+            raise ValueError(f"Invalid degraded action '{degraded_action}'")
+        
         self.default_policy = default_policy
+        self.degraded_action = degraded_action
         self.quarantine_dir = quarantine_dir or Path("./quarantine")
         self.quarantine_dir.mkdir(parents=True, exist_ok=True)
         
-        self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        self.sanitizer = MessageSanitizer()
+        
+        self.rules_file = Path(rules_file) if rules_file else None
+        self.reload_interval = reload_interval
+        self.policy = CompiledPolicy([], default_policy)
+        self._rules_mtime = None
+        self._next_reload_check = 0.0
+        
+        if self.rules_file:
+            self.reload_rules()
+        
+        self.shadows = ShadowPolicies(shadow_rules_files or [], default_policy, reload_interval)
+    
+    def reload_rules(self) -> bool:
+        """
+        Load and compile the rules file, swapping it in atomically.
+        
+        The previous rules stay active if the file cannot be loaded.
+        
+        Returns:
+            True if the new rules were loaded, False otherwise
+        """
+        if not self.rules_file:
+            return False
+        
+        try:
+            mtime = os.stat(self.rules_file).st_mtime_ns
+            policy = load_policy(self.rules_file, self.default_policy)
+        except Exception as e:
+            logger.error(f"Error loading policy rules from {self.rules_file}: {e}")
+            return False
+        
+        self.policy = policy
+        self._rules_mtime = mtime
+        logger.info(f"Loaded {len(policy)} policy rule(s) from {self.rules_file}")
+        return True
+    
+    def _maybe_reload_rules(self):
+        """Reload the rules file if it changed, checking at most once per interval."""
+        if not self.rules_file:
+            return
+        
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self.reload_interval
+        
+        try:
+            mtime = os.stat(self.rules_file).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._rules_mtime:
+            self.reload_rules()
     
+    def decide(self, detections: List[DetectionResult], message: EmailMessage,
+               parsed: Optional[ParsedMessage] = None) -> Tuple[str, Optional[PolicyRule]]:
+        """
+        Determine the action for a message without applying it.
+        
+        Unlike evaluate(), nothing is quarantined or rewritten, so this is
+        safe for offline scans.
+        
+        Args:
+            detections: List of detection results
+            message: Original email message
+            parsed: Parsed parts of message, if the caller already has them
+            
+        Returns:
+            Tuple of (action, matching rule or None)
+        """
+        self._maybe_reload_rules()
+        if len(self.policy):
+            context = PolicyContext.from_message(detections, message, parsed)
+        else:
+            # Without rules only the detections matter
+            context = PolicyContext(detections)
+        return self.decide_context(context)
+    
+    def decide_context(self, context: PolicyContext) -> Tuple[str, Optional[PolicyRule]]:
+        """
+        Determine the action for already gathered message facts (see decide()).
+        
+        Args:
+            context: Message facts, e.g. from PolicyContext.from_addresses
+            
+        Returns:
+            Tuple of (action, matching rule or None)
+        """
+        self._maybe_reload_rules()
+        return self.policy.action_for(context)
+    
+    @traced('evaluate')
     def evaluate(self, detections: List[DetectionResult], 
-                 message: EmailMessage) -> PolicyDecision:
+                 message: EmailMessage,
+                 parsed: Optional[ParsedMessage] = None,
+                 budget: Optional[TimeBudget] = None,
+                 envelope_recipients: Optional[List[str]] = None) -> PolicyDecision:
         """
         Evaluate detections and determine policy action.
         
         Args:
             detections: List of detection results
             message: Original email message
+            parsed: Parsed parts of message, if the caller already has them
+            budget: Processing budget; if it recorded degradations, the action is
+                raised to at least the configured degraded action
+            envelope_recipients: RCPT TO addresses the message is delivered to, which
+                recipient_domains rules match (default: its To/Cc/Bcc headers)
             
         Returns:
             PolicyDecision object
         """
-        if not detections:
-            return PolicyDecision(
+        self._maybe_reload_rules()
+        if len(self.policy) or self.shadows:
+            parsed = parsed or ParsedMessage.parse(message)
+            context = PolicyContext.from_message(detections, message, parsed, envelope_recipients)
+        else:
+            context = PolicyContext(detections)
+        action, rule = self.policy.action_for(context)
+        
+        degraded = budget is not None and budget.degraded
+        fail_closed = degraded and ACTION_SEVERITY[self.degraded_action] > ACTION_SEVERITY.get(action, 0)
+        if fail_closed:
+            action = self.degraded_action
+        
+        if self.shadows:
+            self._record_shadows(context, action, message, self.degraded_action if degraded else None)
+        
+        if action == 'allow' and rule is None and not detections:
+            decision = PolicyDecision(
                 action='allow',
                 reason='No sensitive data detected',
                 detections=[]
             )
-        
-        # Always use default policy since we have no specific rules
-        action = self.default_policy
+            if degraded:
+                decision.reason += f" [degraded: {', '.join(budget.degradations)}]"
+            return decision
         
         detection_dicts = [asdict(d) for d in detections]
         
         if action == 'block':
-            return self._block_message(message, detections, detection_dicts)
+            decision = self._block_message(message, detections, detection_dicts)
         elif action == 'quarantine':
-            return self._quarantine_message(message, detections, detection_dicts)
+            decision = self._quarantine_message(message, detections, detection_dicts)
         elif action == 'sanitize':
-            return self._sanitize_message(message, detections, detection_dicts)
+            decision = self._sanitize_message(message, detections, detection_dicts, parsed)
         elif action == 'tag':
-            return self._tag_message(message, detections, detection_dicts)
+            decision = self._tag_message(message, detections, detection_dicts)
         else:
-            return PolicyDecision(
+            decision = PolicyDecision(
                 action='allow',
                 reason='No policy match',
                 detections=detection_dicts
             )
+        
+        if rule and not fail_closed:
+            decision.rule = rule.name
+            decision.reason += f" [rule: {rule.name}]"
+        if degraded:
+            decision.reason += f" [degraded: {', '.join(budget.degradations)}]"
+        return decision
+    
+    def _record_shadows(self, context: PolicyContext, action: str, message: EmailMessage,
+                        floor: Optional[str]) -> None:
+        """Count the shadow policies' decisions; never affects the active decision."""
+        try:
+            self.shadows.record(context, action, str(message.get('Message-ID', '')), floor)
+        except Exception as e:
+            logger.error(f"Error evaluating shadow policies: {e}")
     
     def _block_message(self, message: EmailMessage, detections: List[DetectionResult],
                       detection_dicts: List[Dict]) -> PolicyDecision:
@@ -106,39 +252,23 @@ class PolicyEngine:
         )
     
     def _sanitize_message(self, message: EmailMessage, detections: List[DetectionResult],
-                         detection_dicts: List[Dict]) -> PolicyDecision:
-        """Sanitize sensitive data from message."""
-        sanitized = copy.deepcopy(message)
-        
-        body = ""
-        if sanitized.is_multipart():
-            for part in sanitized.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    break
-        else:
-            body = sanitized.get_payload(decode=True).decode('utf-8', errors='ignore')
-        
-        # Replace detected patterns with [REDACTED]
-        sanitized_body = body
-        for detection in sorted(detections, key=lambda x: x.position[1], reverse=True):
-            start, end = detection.position
-            sanitized_body = sanitized_body[:start] + f"[REDACTED {detection.pattern_type.upper()}]" + sanitized_body[end:]
-        
-        if sanitized.is_multipart():
-            for part in sanitized.walk():
-                if part.get_content_type() == "text/plain":
-                    part.set_payload(sanitized_body)
-                    break
-        else:
-            sanitized.set_payload(sanitized_body)
+                         detection_dicts: List[Dict],
+                         parsed: Optional[ParsedMessage] = None) -> PolicyDecision:
+        """Sanitize sensitive data from every message part it was found in."""
+        sanitized = MessageOverlay(message)
+        summary = self.sanitizer.sanitize(parsed or ParsedMessage.parse(message), detections, sanitized)
+        
+        if summary.unlocated:
+            logger.warning(f"{summary.unlocated} detection(s) have no source part and were not redacted")
         
         sanitized['X-Content-Sanitized'] = 'true'
         sanitized['X-Sanitization-Reason'] = f"{len(detections)} sensitive pattern(s) detected"
         
-        reason = f"Sanitized: {len(detections)} sensitive data pattern(s) removed"
+        reason = f"Sanitized: {summary.redacted} sensitive data pattern(s) removed"
+        if summary.removed_attachments:
+            reason += f", {summary.removed_attachments} attachment(s) removed"
         if detections:
-            reason += f" (e.g., {detection.pattern_type})"
+            reason += f" (e.g., {detections[0].pattern_type})"
         
         return PolicyDecision(
             action='sanitize',
@@ -151,14 +281,14 @@ class PolicyEngine:
     def _tag_message(self, message: EmailMessage, detections: List[DetectionResult],
                     detection_dicts: List[Dict]) -> PolicyDecision:
         """Tag message with warning headers."""
-        tagged = copy.deepcopy(message)
+        tagged = MessageOverlay(message)
         
         detection_types = list(set(d.pattern_type for d in detections))
         tagged['X-Sensitive-Data-Detected'] = 'true'
         tagged['X-Detection-Types'] = ', '.join(detection_types)
         tagged['X-Detection-Count'] = str(len(detections))
         
-        original_subject = tagged.get('Subject', '')
+        original_subject = message.get('Subject', '')
         tagged['Subject'] = f"[SENSITIVE] {original_subject}"
         
         reason = f"Tagged: {len(detections)} sensitive data pattern(s) detected"
@@ -172,4 +302,3 @@ class PolicyEngine:
             original_message=message,
             modified_message=tagged
         )
-
@@ -0,0 +1,140 @@
+"""Envelope-stage policy checks applied during the SMTP transaction."""
+import logging
+import time
+from typing import Iterable, List, Optional
+
+from .rate_limit import RateLimiter
+from .rules import DomainTrie
+
+logger = logging.getLogger(__name__)
+
+# Most senders whose quota counts are kept per window; the oldest are dropped beyond it
+MAX_QUOTA_SENDERS = 100000
+
+
+class EnvelopePolicy:
+    """
+    Cheap checks on MAIL FROM / RCPT TO, before any message data is received.
+
+    Each check returns an SMTP status string to reject with, or None to accept.
+    """
+
+    def __init__(self, blocked_sender_domains: Iterable[str] = (),
+                 blocked_recipient_domains: Iterable[str] = (),
+                 sender_quota: int = 0, quota_window: float = 3600.0,
+                 max_message_size: int = 0,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        Initialize envelope policy.
+
+        Args:
+            blocked_sender_domains: Sender domains (and subdomains) to reject
+            blocked_recipient_domains: Recipient domains (and subdomains) to reject
+            sender_quota: Max messages per sender address per window (0 = unlimited)
+            quota_window: Quota window in seconds
+            max_message_size: Max declared SIZE= in bytes (0 = unlimited)
+            rate_limiter: Optional token bucket limits per sender, domain and client IP
+        """
+        self._blocked_senders = self._build_trie(blocked_sender_domains)
+        self._blocked_recipients = self._build_trie(blocked_recipient_domains)
+        self.sender_quota = sender_quota
+        self.quota_window = quota_window
+        self.max_message_size = max_message_size
+        self.rate_limiter = rate_limiter
+
+        # Fixed-window counters, dropped wholesale when the window rolls over
+        self._quota_counts = {}
+        self._window_start = time.monotonic()
+
+    @staticmethod
+    def _build_trie(domains: Iterable[str]) -> DomainTrie:
+        trie = DomainTrie()
+        for domain in domains:
+            domain = domain.strip().lower().lstrip('*').strip('.')
+            if domain:
+                trie.add(domain, True)
+        return trie
+
+    def check_sender(self, address: str, mail_options: List[str] = (),
+                     client_ip: Optional[str] = None) -> Optional[str]:
+        """
+        Check MAIL FROM.
+
+        Args:
+            address: Envelope sender address
+            mail_options: MAIL FROM parameters (e.g. "SIZE=12345")
+            client_ip: Connecting client's IP address
+
+        Returns:
+            SMTP rejection status, or None to accept
+        """
+        if self._blocked_senders.match(_domain(address)):
+            return '550 5.7.1 Sender domain not allowed'
+
+        declared_size = _declared_size(mail_options)
+        if self.max_message_size and declared_size and declared_size > self.max_message_size:
+            return '552 5.3.4 Message size exceeds fixed maximum message size'
+
+        if self.sender_quota and self._quota_used(address.lower()) >= self.sender_quota:
+            return '451 4.7.1 Sender quota exceeded, try again later'
+
+        if self.rate_limiter:
+            exhausted = self.rate_limiter.check(address, client_ip)
+            if exhausted:
+                return f'451 4.7.1 Rate limit exceeded ({exhausted}), try again later'
+
+        return None
+
+    def check_recipient(self, address: str) -> Optional[str]:
+        """
+        Check RCPT TO.
+
+        Args:
+            address: Envelope recipient address
+
+        Returns:
+            SMTP rejection status, or None to accept
+        """
+        if self._blocked_recipients.match(_domain(address)):
+            return '550 5.7.1 Recipient domain not allowed'
+        return None
+
+    def record_message(self, address: str) -> None:
+        """
+        Count an accepted message against its sender's quota.
+
+        Called once DATA has been accepted, so rejected or abandoned
+        transactions don't use up quota.
+
+        Args:
+            address: Envelope sender address
+        """
+        if not self.sender_quota:
+            return
+        sender = address.lower()
+        count = self._quota_used(sender)
+        if sender not in self._quota_counts and len(self._quota_counts) >= MAX_QUOTA_SENDERS:
+            del self._quota_counts[next(iter(self._quota_counts))]
+        self._quota_counts[sender] = count + 1
+
+    def _quota_used(self, sender: str) -> int:
+        """Messages counted against the sender in the current window."""
+        now = time.monotonic()
+        if now - self._window_start >= self.quota_window:
+            self._quota_counts.clear()
+            self._window_start = now
+        return self._quota_counts.get(sender, 0)
+
+
+def _domain(address: str) -> str:
+    """Extract the lowercase domain of an envelope address."""
+    return address.rsplit('@', 1)[1].lower().rstrip('>') if '@' in address else ''
+
+
+def _declared_size(mail_options: Iterable[str]) -> Optional[int]:
+    """Extract the SIZE= value declared in MAIL FROM parameters."""
+    for option in mail_options:
+        key, _, value = option.partition('=')
+        if key.upper() == 'SIZE' and value.isdigit():
+            return int(value)
+    return None
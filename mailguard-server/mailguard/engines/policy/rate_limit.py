@@ -0,0 +1,112 @@
+"""In-memory token bucket rate limits for envelope senders and clients."""
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBuckets:
+    """
+    Token buckets for many keys, bounded by LRU eviction.
+
+    Each key's bucket holds up to `burst` tokens and refills at `rate`
+    tokens per second. Buckets are stored as (tokens, updated) tuples in an
+    OrderedDict; once there are more than max_keys, the least recently used
+    buckets are dropped. Those belong to the idlest keys, whose buckets have
+    most likely refilled anyway; a dropped bucket comes back full.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        """
+        Initialize token buckets.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+            max_keys: Maximum buckets kept in memory
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def available(self, key: str, now: float) -> float:
+        """Tokens currently in the key's bucket."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        tokens, updated = bucket
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def consume(self, key: str, now: float, tokens: float = 1.0) -> None:
+        """Take tokens from the key's bucket (callers check available() first)."""
+        self._buckets[key] = (self.available(key, now) - tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class RateLimiter:
+    """Rate limits per sender address, sender domain and client IP."""
+
+    def __init__(self, sender_per_minute: float = 0, domain_per_minute: float = 0,
+                 ip_per_minute: float = 0, max_keys: int = 100000):
+        """
+        Initialize rate limiter.
+
+        Each limit allows a burst of one minute's worth of messages and then
+        refills continuously. A limit of 0 disables it.
+
+        Args:
+            sender_per_minute: Messages per minute per sender address
+            domain_per_minute: Messages per minute per sender domain
+            ip_per_minute: Messages per minute per client IP
+            max_keys: Maximum tracked keys per limit
+        """
+        self._limits = []
+        for scope, per_minute in (('sender', sender_per_minute),
+                                  ('domain', domain_per_minute),
+                                  ('ip', ip_per_minute)):
+            if per_minute > 0:
+                self._limits.append((scope, TokenBuckets(per_minute / 60.0, per_minute, max_keys)))
+
+    def __bool__(self) -> bool:
+        return bool(self._limits)
+
+    def check(self, sender: str, client_ip: Optional[str] = None) -> Optional[str]:
+        """
+        Count one message against every applicable limit.
+
+        Tokens are only taken if all limits allow the message.
+
+        Args:
+            sender: Envelope sender address
+            client_ip: Client IP address
+
+        Returns:
+            Scope of the exhausted limit ('sender', 'domain' or 'ip'), or None if allowed
+        """
+        sender = sender.lower()
+        keys = {
+            'sender': sender,
+            'domain': sender.rsplit('@', 1)[1] if '@' in sender else sender,
+            'ip': client_ip
+        }
+
+        now = time.monotonic()
+        applicable = [(scope, buckets, keys[scope]) for scope, buckets in self._limits if keys[scope]]
+        for scope, buckets, key in applicable:
+            if buckets.available(key, now) < 1:
+                return scope
+        for _, buckets, key in applicable:
+            buckets.consume(key, now)
+        return None
+
+    def tracked_keys(self) -> dict:
+        """Number of buckets held per scope."""
+        return {scope: len(buckets) for scope, buckets in self._limits}
@@ -0,0 +1,339 @@
+"""Compiled, indexed policy rules.
+
+Rules are loaded from a JSON file and compiled into dispatch tables keyed by
+pattern type, attachment type and sender/recipient domain tries, so deciding
+a message only touches the rules that can possibly apply to it.
+
+A rule with recipient_domains applies when any recipient is in one of them,
+except an allow rule, which applies only when every recipient is: allowing
+lets the whole message through, to all of its recipients.
+
+Example rules file::
+
+    {
+        "default_action": "tag",
+        "rules": [
+            {
+                "name": "block-cards-to-gmail",
+                "action": "block",
+                "pattern_types": ["credit_card"],
+                "min_confidence": 0.8,
+                "min_count": 1,
+                "recipient_domains": ["gmail.com"],
+                "priority": 10
+            }
+        ]
+    }
+"""
+import json
+import logging
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from email.utils import getaddresses, parseaddr
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ...models import DetectionResult, ParsedMessage
+
+logger = logging.getLogger(__name__)
+
+# Higher severity wins between rules of equal priority
+ACTION_SEVERITY = {
+    'allow': 0,
+    'tag': 1,
+    'sanitize': 2,
+    'quarantine': 3,
+    'block': 4,
+}
+
+
+@dataclass
+class PolicyRule:
+    """A single policy rule. Empty conditions match anything."""
+    name: str
+    action: str
+    pattern_types: List[str] = field(default_factory=list)
+    min_confidence: float = 0.0
+    min_count: int = 1
+    sender_domains: List[str] = field(default_factory=list)
+    recipient_domains: List[str] = field(default_factory=list)
+    attachment_types: List[str] = field(default_factory=list)
+    priority: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PolicyRule':
+        """Build a rule from its config representation, validating fields."""
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown rule field(s): {', '.join(sorted(unknown))}")
+
+        rule = cls(**data)
+        for name in ('pattern_types', 'sender_domains', 'recipient_domains', 'attachment_types'):
+            values = getattr(rule, name)
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"Rule '{rule.name}' field {name} must be a list of strings")
+        if rule.action not in ACTION_SEVERITY:
+            raise ValueError(f"Rule '{rule.name}' has invalid action '{rule.action}'")
+        if rule.min_count < 0:
+            raise ValueError(f"Rule '{rule.name}' has negative min_count")
+
+        rule.pattern_types = [p.lower() for p in rule.pattern_types]
+        rule.sender_domains = [_normalize_domain(d) for d in rule.sender_domains]
+        rule.recipient_domains = [_normalize_domain(d) for d in rule.recipient_domains]
+        rule.attachment_types = [_normalize_attachment_type(t) for t in rule.attachment_types]
+        return rule
+
+
+@dataclass
+class PolicyContext:
+    """Message facts a policy decision is based on."""
+    detections: List[DetectionResult]
+    sender_domain: str = ''
+    recipient_domains: List[str] = field(default_factory=list)
+    attachment_types: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_message(cls, detections: List[DetectionResult], message: EmailMessage,
+                     parsed: Optional[ParsedMessage] = None,
+                     envelope_recipients: Optional[List[str]] = None) -> 'PolicyContext':
+        """
+        Build a context from the message headers and attachment parts.
+
+        Args:
+            detections: Detection results
+            message: Email message
+            parsed: Parsed parts of message, if the caller already has them
+            envelope_recipients: RCPT TO addresses the message is delivered to; used
+                instead of the To/Cc/Bcc headers, which the sender can set to anything
+        """
+        if envelope_recipients is not None:
+            recipients = list(envelope_recipients)
+        else:
+            recipients = []
+            for header in ('To', 'Cc', 'Bcc'):
+                recipients.extend(message.get_all(header, []))
+
+        parsed = parsed or ParsedMessage.parse(message)
+
+        return cls.from_addresses(detections, message.get('From', ''), recipients, parsed.attachment_types)
+
+    @classmethod
+    def from_addresses(cls, detections: List[DetectionResult], sender: str,
+                       recipients: Iterable[str], attachment_types: Iterable[str] = ()) -> 'PolicyContext':
+        """
+        Build a context from address header values, e.g. of a stored email log.
+
+        Args:
+            detections: Detection results
+            sender: From header value
+            recipients: Recipient addresses or To/Cc/Bcc header values
+            attachment_types: Attachment content types and filename extensions
+        """
+        recipient_domains = sorted({
+            _address_domain(addr) for _, addr in getaddresses(list(recipients)) if addr
+        })
+        return cls(
+            detections=detections,
+            sender_domain=_address_domain(parseaddr(sender)[1]),
+            recipient_domains=recipient_domains,
+            attachment_types=set(attachment_types)
+        )
+
+
+class DomainTrie:
+    """Trie over reversed domain labels; a domain matches itself and its subdomains."""
+
+    _VALUES = None  # Key under which a node stores its values (labels are strings)
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, domain: str, value) -> None:
+        """Associate value with domain and all of its subdomains."""
+        node = self._root
+        for label in reversed(domain.split('.')):
+            node = node.setdefault(label, {})
+        node.setdefault(self._VALUES, set()).add(value)
+
+    def match(self, domain: str) -> Set:
+        """Return values registered for the domain or any parent domain."""
+        matches = set()
+        node = self._root
+        for label in reversed(domain.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            matches.update(node.get(self._VALUES, ()))
+        return matches
+
+
+class CompiledPolicy:
+    """Rules compiled into indexed dispatch tables."""
+
+    def __init__(self, rules: Iterable[PolicyRule], default_action: str = 'tag'):
+        """
+        Compile rules.
+
+        Args:
+            rules: Policy rules
+            default_action: Action when detections exist but no rule matches
+        """
+        if default_action not in ACTION_SEVERITY:
+            raise ValueError(f"Invalid default action '{default_action}'")
+        self.default_action = default_action
+
+        # Rule index doubles as precedence rank: lower index wins
+        self.rules = sorted(
+            rules,
+            key=lambda r: (-r.priority, -ACTION_SEVERITY[r.action])
+        )
+
+        self._by_pattern: Dict[str, List[int]] = {}
+        self._unconditional: List[int] = []  # Rules without conditions: candidates for every message
+        self._by_attachment: Dict[str, Set[int]] = {}
+        self._sender_trie = DomainTrie()
+        self._recipient_trie = DomainTrie()
+
+        for index, rule in enumerate(self.rules):
+            if rule.pattern_types and rule.min_count > 0:
+                for pattern_type in rule.pattern_types:
+                    self._by_pattern.setdefault(pattern_type, []).append(index)
+            elif not (rule.sender_domains or rule.recipient_domains or rule.attachment_types):
+                self._unconditional.append(index)
+
+            for domain in rule.sender_domains:
+                self._sender_trie.add(domain, index)
+            for domain in rule.recipient_domains:
+                self._recipient_trie.add(domain, index)
+            for attachment_type in rule.attachment_types:
+                self._by_attachment.setdefault(attachment_type, set()).add(index)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def decide(self, context: PolicyContext) -> Optional[PolicyRule]:
+        """
+        Find the winning rule for a message.
+
+        Args:
+            context: Message facts
+
+        Returns:
+            Highest-precedence matching rule, or None if no rule matches
+        """
+        if not self.rules:
+            return None
+
+        # Sorted confidences per pattern type so thresholds are a bisect away
+        confidences: Dict[str, List[float]] = {}
+        for detection in context.detections:
+            confidences.setdefault(detection.pattern_type, []).append(detection.confidence)
+        for values in confidences.values():
+            values.sort()
+
+        sender_matches = self._sender_trie.match(context.sender_domain)
+        # Recipient domains each rule covers, for allow rules that must cover all of them
+        recipient_hits: Dict[int, int] = {}
+        for domain in context.recipient_domains:
+            for index in self._recipient_trie.match(domain):
+                recipient_hits[index] = recipient_hits.get(index, 0) + 1
+        recipient_matches = set(recipient_hits)
+        attachment_matches = set()
+        for attachment_type in context.attachment_types:
+            attachment_matches |= self._by_attachment.get(attachment_type, set())
+
+        # A rule can only apply if one of its conditions is met, so each is
+        # reached through the index of one condition and checked against all
+        candidates = set(self._unconditional)
+        for pattern_type in confidences:
+            candidates.update(self._by_pattern.get(pattern_type, ()))
+        candidates |= sender_matches | recipient_matches | attachment_matches
+        if not candidates:
+            return None
+
+        for index in sorted(candidates):
+            rule = self.rules[index]
+            if rule.sender_domains and index not in sender_matches:
+                continue
+            if rule.recipient_domains and index not in recipient_matches:
+                continue
+            if (rule.recipient_domains and rule.action == 'allow'
+                    and recipient_hits[index] < len(context.recipient_domains)):
+                continue
+            if rule.attachment_types and index not in attachment_matches:
+                continue
+            if self._count_matches(rule, confidences) >= rule.min_count:
+                return rule
+
+        return None
+
+    def action_for(self, context: PolicyContext) -> Tuple[str, Optional[PolicyRule]]:
+        """
+        Resolve the action for a message: the winning rule's action, else the
+        default action if anything was detected, else allow.
+
+        Args:
+            context: Message facts
+
+        Returns:
+            Tuple of (action, matching rule or None)
+        """
+        rule = self.decide(context)
+        if rule:
+            return rule.action, rule
+        if context.detections:
+            return self.default_action, None
+        return 'allow', None
+
+    @staticmethod
+    def _count_matches(rule: PolicyRule, confidences: Dict[str, List[float]]) -> int:
+        """Count detections of the rule's pattern types above its threshold."""
+        pattern_types = rule.pattern_types or confidences.keys()
+        count = 0
+        for pattern_type in pattern_types:
+            values = confidences.get(pattern_type)
+            if values:
+                count += len(values) - bisect_left(values, rule.min_confidence)
+        return count
+
+
+def load_policy(path: Path, default_action: str = 'tag') -> CompiledPolicy:
+    """
+    Load and compile a policy rules file.
+
+    Args:
+        path: Path to JSON rules file (a list of rules or an object with "rules")
+        default_action: Default action unless the file sets "default_action"
+
+    Returns:
+        CompiledPolicy
+    """
+    with open(path, 'r') as f:
+        config = json.load(f)
+
+    if isinstance(config, list):
+        config = {'rules': config}
+
+    rules = []
+    for i, rule_data in enumerate(config.get('rules', [])):
+        rule_data = dict(rule_data)
+        rule_data.setdefault('name', f'rule-{i + 1}')
+        rules.append(PolicyRule.from_dict(rule_data))
+
+    return CompiledPolicy(rules, config.get('default_action', default_action))
+
+
+def _normalize_domain(domain: str) -> str:
+    """Lowercase a domain and strip wildcard/leading dots."""
+    return domain.lower().lstrip('*').strip('.')
+
+
+def _normalize_attachment_type(attachment_type: str) -> str:
+    """Normalize an extension (".PDF" -> "pdf") or MIME type."""
+    return attachment_type.lower().lstrip('.')
+
+
+def _address_domain(address: str) -> str:
+    """Extract the lowercase domain part of an email address."""
+    return address.rsplit('@', 1)[1].lower() if '@' in address else ''
@@ -0,0 +1,121 @@
+"""Single-pass redaction of sensitive data across all parts of a message."""
+import html
+import logging
+from dataclasses import dataclass
+from email.message import Message
+from typing import Dict, List
+
+from ...models import DetectionResult, MessageOverlay, ParsedMessage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SanitizeSummary:
+    """What a sanitization pass changed."""
+    redacted: int = 0  # Detections replaced in place
+    removed_attachments: int = 0  # Binary attachments dropped because they can't be redacted
+    unlocated: int = 0  # Detections without a known source part
+
+
+class MessageSanitizer:
+    """
+    Redacts detections in the MIME part they were found in.
+
+    Each affected part is rebuilt once with a join-based builder and layered
+    onto a MessageOverlay; untouched parts are shared with the original.
+    HTML alternatives of a text/plain part aren't scanned (see
+    MessagePart.alternative_to), so when that part is redacted they are
+    replaced by its redacted text.
+    """
+
+    def __init__(self, placeholder: str = "[REDACTED {type}]"):
+        """
+        Initialize sanitizer.
+
+        Args:
+            placeholder: Replacement text, formatted with the upper-cased pattern type
+        """
+        self.placeholder = placeholder
+
+    def sanitize(self, parsed: ParsedMessage, detections: List[DetectionResult],
+                 overlay: MessageOverlay) -> SanitizeSummary:
+        """
+        Redact detections into the overlay.
+
+        Args:
+            parsed: Parsed original message (detections' part_index indexes its parts)
+            detections: Detections with part_index and part-relative positions
+            overlay: Overlay receiving the rewritten parts
+
+        Returns:
+            SanitizeSummary
+        """
+        summary = SanitizeSummary()
+
+        by_part: Dict[int, List[DetectionResult]] = {}
+        for detection in detections:
+            if detection.part_index is None:
+                summary.unlocated += 1
+            else:
+                by_part.setdefault(detection.part_index, []).append(detection)
+
+        redacted_texts: Dict[int, str] = {}
+        for index, part_detections in by_part.items():
+            message_part = parsed[index]
+            if message_part.redactable:
+                redacted = redacted_texts[index] = self.redact(message_part.text, part_detections)
+                overlay.replace_part(message_part.part, self._rebuild_part(message_part.part, redacted))
+                summary.redacted += len(part_detections)
+            else:
+                overlay.replace_part(message_part.part,
+                                     self._removal_notice(message_part.part, part_detections))
+                summary.removed_attachments += 1
+
+        for message_part in parsed.parts:
+            if message_part.alternative_to in redacted_texts:
+                text = f"<pre>{html.escape(redacted_texts[message_part.alternative_to])}</pre>"
+                overlay.replace_part(message_part.part, self._rebuild_part(message_part.part, text))
+
+        return summary
+
+    def redact(self, text: str, detections: List[DetectionResult]) -> str:
+        """Replace detection spans in one left-to-right pass (overlapping spans are merged)."""
+        pieces = []
+        cursor = 0
+        for detection in sorted(detections, key=lambda d: d.position[0]):
+            start, end = detection.position
+            if end <= cursor:
+                continue  # Fully covered by the previous span
+            start = max(start, cursor)
+            pieces.append(text[cursor:start])
+            pieces.append(self.placeholder.format(type=detection.pattern_type.upper()))
+            cursor = end
+        pieces.append(text[cursor:])
+        return ''.join(pieces)
+
+    @staticmethod
+    def _rebuild_part(part: Message, text: str) -> Message:
+        """Build a copy of a part's headers with a new UTF-8 text payload."""
+        rebuilt = type(part)(policy=part.policy)
+        for name, value in part.raw_items():
+            if name.lower() != 'content-transfer-encoding':
+                rebuilt[name] = value
+        rebuilt.set_payload(text, charset='utf-8')
+        return rebuilt
+
+    @staticmethod
+    def _removal_notice(part: Message, detections: List[DetectionResult]) -> Message:
+        """Build a text attachment that stands in for a removed binary attachment."""
+        filename = part.get_filename() or 'attachment'
+        types = ', '.join(sorted({d.pattern_type for d in detections}))
+
+        notice = type(part)(policy=part.policy)
+        notice['Content-Type'] = 'text/plain'
+        notice.add_header('Content-Disposition', 'attachment', filename=f"{filename}.removed.txt")
+        notice.set_payload(
+            f"The attachment '{filename}' was removed because it contained "
+            f"{len(detections)} sensitive data pattern(s) ({types}).\n",
+            charset='utf-8'
+        )
+        return notice
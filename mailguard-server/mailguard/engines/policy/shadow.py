@@ -0,0 +1,177 @@
+"""Shadow policies: candidate rule sets decided for every message but never enforced."""
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from ...monitoring.metrics import SHADOW_DECISIONS
+from .rules import ACTION_SEVERITY, CompiledPolicy, PolicyContext, load_policy
+
+logger = logging.getLogger(__name__)
+
+# Actions the comparison reports counts for
+ENFORCING_ACTIONS = ('block', 'quarantine', 'sanitize')
+
+
+class ShadowPolicies:
+    """
+    Decides each message with one or more candidate policies and counts the results.
+
+    Every shadow policy is a rules file (same format as POLICY_RULES_FILE),
+    named after the file and hot reloaded on change. A shadow decision is a
+    lookup in the compiled rules: nothing is rewritten, quarantined or
+    forwarded differently. Per policy, only counters are kept (actions, and
+    how each compares with the active decision), plus a small ring of recent
+    messages where the two disagreed.
+    """
+
+    def __init__(self, rules_files: Iterable[Path], default_policy: str = 'tag',
+                 reload_interval: float = 5.0, recent_size: int = 100):
+        """
+        Initialize shadow policies.
+
+        Args:
+            rules_files: Rules file per shadow policy
+            default_policy: Default action unless a file sets "default_action"
+            reload_interval: Minimum seconds between rules file change checks
+            recent_size: Recent disagreements kept per policy
+        """
+        self.default_policy = default_policy
+        self.reload_interval = reload_interval
+        self.recent_size = recent_size
+        self._lock = threading.Lock()
+        self._next_reload_check = 0.0
+        self._policies: Dict[str, dict] = {}
+
+        for path in rules_files:
+            path = Path(path)
+            name = path.stem
+            if name in self._policies:
+                raise ValueError(f"Duplicate shadow policy name '{name}' ({path})")
+            self._policies[name] = {
+                'path': path,
+                'policy': None,
+                'mtime': None,
+                'stats': self._new_stats()
+            }
+            self._reload(name)
+
+    def __bool__(self) -> bool:
+        return bool(self._policies)
+
+    def _new_stats(self) -> dict:
+        return {
+            'since': time.time(),
+            'messages': 0,
+            'actions': Counter(),
+            'active_actions': Counter(),
+            'rules': Counter(),
+            'vs_active': Counter(),
+            'transitions': Counter(),
+            'recent': deque(maxlen=self.recent_size)
+        }
+
+    def _reload(self, name: str) -> bool:
+        """Load and compile a shadow policy's rules file, keeping the previous rules on error."""
+        entry = self._policies[name]
+        try:
+            mtime = os.stat(entry['path']).st_mtime_ns
+            policy = load_policy(entry['path'], self.default_policy)
+        except Exception as e:
+            logger.error(f"Error loading shadow policy '{name}' from {entry['path']}: {e}")
+            return False
+        entry['policy'] = policy
+        entry['mtime'] = mtime
+        logger.info(f"Loaded shadow policy '{name}' ({len(policy)} rule(s))")
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self.reload_interval
+        for name, entry in self._policies.items():
+            try:
+                mtime = os.stat(entry['path']).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != entry['mtime']:
+                self._reload(name)
+
+    def record(self, context: PolicyContext, active_action: str, message_id: str = '',
+               floor: Optional[str] = None) -> None:
+        """
+        Decide a message with every shadow policy and count the results.
+
+        Args:
+            context: Message facts the active decision was made from
+            active_action: Action actually taken
+            message_id: Message-ID, kept with disagreements
+            floor: Minimum action applied to the active decision (degraded messages)
+        """
+        self._maybe_reload()
+        for name, entry in self._policies.items():
+            policy: CompiledPolicy = entry['policy']
+            if policy is None:
+                continue
+
+            action, rule = policy.action_for(context)
+            if floor and ACTION_SEVERITY[floor] > ACTION_SEVERITY[action]:
+                action = floor
+
+            difference = ACTION_SEVERITY[action] - ACTION_SEVERITY.get(active_action, 0)
+            comparison = 'same' if difference == 0 else 'stricter' if difference > 0 else 'looser'
+
+            SHADOW_DECISIONS.inc(policy=name, action=action)
+            with self._lock:
+                stats = entry['stats']
+                stats['messages'] += 1
+                stats['actions'][action] += 1
+                stats['active_actions'][active_action] += 1
+                stats['vs_active'][comparison] += 1
+                if rule:
+                    stats['rules'][rule.name] += 1
+                if comparison != 'same':
+                    stats['transitions'][f"{active_action} -> {action}"] += 1
+                    stats['recent'].append({
+                        'time': time.time(),
+                        'message_id': message_id,
+                        'active_action': active_action,
+                        'shadow_action': action,
+                        'rule': rule.name if rule else None
+                    })
+
+    def comparison(self) -> List[dict]:
+        """
+        Per shadow policy: what it would have done since its counters were last
+        reset ('would_have'), next to what the active policy did ('active').
+        """
+        result = []
+        with self._lock:
+            for name, entry in self._policies.items():
+                stats = entry['stats']
+                result.append({
+                    'name': name,
+                    'file': str(entry['path']),
+                    'loaded': entry['policy'] is not None,
+                    'rules': len(entry['policy']) if entry['policy'] is not None else 0,
+                    'since': stats['since'],
+                    'messages': stats['messages'],
+                    'would_have': {action: stats['actions'][action] for action in ENFORCING_ACTIONS},
+                    'active': {action: stats['active_actions'][action] for action in ENFORCING_ACTIONS},
+                    'actions': dict(stats['actions']),
+                    'vs_active': {key: stats['vs_active'][key] for key in ('same', 'stricter', 'looser')},
+                    'transitions': dict(stats['transitions']),
+                    'rule_matches': dict(stats['rules'].most_common()),
+                    'recent_disagreements': list(reversed(stats['recent']))
+                })
+        return result
+
+    def reset(self) -> None:
+        """Start every shadow policy's counters over."""
+        with self._lock:
+            for entry in self._policies.values():
+                entry['stats'] = self._new_stats()
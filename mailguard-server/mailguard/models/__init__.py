@@ -5,6 +5,9 @@ from .recipient import EmailRecipient
 from .attachment import EmailAttachment
 from .detection_result import DetectionResult
 from .policy_decision import PolicyDecision
+from .message_overlay import MessageOverlay
+from .parsed_message import MessagePart, ParsedMessage
+from .time_budget import TimeBudget
 
 __all__ = [
     'db', 
@@ -12,6 +15,10 @@ __all__ = [
     'EmailRecipient', 
     'EmailAttachment',
     'DetectionResult',
-    'PolicyDecision'
+    'PolicyDecision',
+    'MessageOverlay',
+    'MessagePart',
+    'ParsedMessage',
+    'TimeBudget'
 ]
 
@@ -1,5 +1,5 @@
 """Detection result data class."""
-from typing import Tuple
+from typing import Optional, Tuple
 from dataclasses import dataclass
 
 @dataclass
@@ -8,5 +8,6 @@ class DetectionResult:
     pattern_type: str
     matched_text: str
     confidence: float
-    position: Tuple[int, int]  # (start, end)
+    position: Tuple[int, int]  # (start, end), relative to the source part's text when part_index is set
+    part_index: Optional[int] = None  # Index of the source MIME part in message.walk() order
 
@@ -31,6 +31,8 @@ class EmailLog(db.Model):
     
     # Performance metrics
     processing_time_ms = Column(Float)
+    degraded = Column(Boolean, default=False)  # Processing cut short by the time budget
+    degradations = Column(JSON)  # What was skipped or downgraded, e.g. ["regex_only"]
     
     # Relationships
     recipients = relationship('EmailRecipient', back_populates='email_log', cascade='all, delete-orphan')
@@ -68,7 +70,9 @@ class EmailLog(db.Model):
                 'attachments': attachments_list,
                 'status': self.status,
                 'error_message': self.error_message,
-                'processing_time_ms': self.processing_time_ms
+                'processing_time_ms': self.processing_time_ms,
+                'degraded': bool(self.degraded),
+                'degradations': self.degradations or []
             }
         except Exception as e:
             import logging
@@ -85,3 +89,12 @@ class EmailLog(db.Model):
                 'error': str(e)
             }
 
+    def to_summary_dict(self):
+        """Convert model to a compact dictionary for high-rate notifications."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'flagged': self.flagged,
+            'policy_applied': self.policy_applied
+        }
+
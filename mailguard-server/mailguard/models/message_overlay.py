@@ -0,0 +1,219 @@
+"""Copy-on-write overlay of an outgoing email message."""
+import uuid
+from email.generator import BytesGenerator
+from email.message import Message
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+
+class MessageOverlay:
+    """
+    Outgoing message layered over the original without copying it.
+
+    Header edits and replaced MIME parts are recorded on the overlay; every
+    other part (including attachment payloads) is shared with the original.
+    Serialization writes the result straight to an output stream.
+    """
+
+    def __init__(self, original: Message):
+        """
+        Initialize overlay.
+
+        Args:
+            original: Original message (never modified)
+        """
+        self.original = original
+        self._header_ops: List[Tuple[str, str, object]] = []  # (op, name, stored value)
+        self._replacements = {}  # id(original part) -> (original part, replacement part)
+
+    # Header access -----------------------------------------------------
+
+    def set_header(self, name: str, value: str) -> None:
+        """Set a header, replacing any existing occurrences (in place for the first)."""
+        self._header_ops.append(('set', name, self._store(name, value)))
+
+    def add_header(self, name: str, value: str) -> None:
+        """Append a header, keeping existing occurrences."""
+        self._header_ops.append(('add', name, self._store(name, value)))
+
+    def __setitem__(self, name: str, value: str) -> None:
+        self.set_header(name, value)
+
+    def __delitem__(self, name: str) -> None:
+        self._header_ops.append(('del', name, None))
+
+    def __contains__(self, name: str) -> bool:
+        lname = name.lower()
+        return any(h.lower() == lname for h, _ in self.raw_items())
+
+    def __getitem__(self, name: str):
+        return self.get(name)
+
+    def get(self, name: str, failobj=None):
+        """Get the first value of a header, like Message.get."""
+        lname = name.lower()
+        for h, v in self.raw_items():
+            if h.lower() == lname:
+                return self.root.policy.header_fetch_parse(h, v)
+        return failobj
+
+    def get_all(self, name: str, failobj=None):
+        """Get all values of a header, like Message.get_all."""
+        lname = name.lower()
+        values = [
+            self.root.policy.header_fetch_parse(h, v)
+            for h, v in self.raw_items() if h.lower() == lname
+        ]
+        return values or failobj
+
+    def raw_items(self) -> List[Tuple[str, object]]:
+        """Return the effective top-level headers with overlay edits applied."""
+        items = list(self.root.raw_items())
+        for op, name, value in self._header_ops:
+            lname = name.lower()
+            if op == 'add':
+                items.append(value)
+                continue
+
+            positions = [i for i, (h, _) in enumerate(items) if h.lower() == lname]
+            if op == 'set' and positions:
+                items[positions[0]] = value
+                positions = positions[1:]
+            elif op == 'set':
+                items.append(value)
+            for i in reversed(positions):
+                del items[i]
+        return items
+
+    def _store(self, name: str, value: str):
+        """Convert a header value to the form the message policy stores."""
+        return self.original.policy.header_store_parse(name, value)
+
+    # Parts -------------------------------------------------------------
+
+    @property
+    def root(self) -> Message:
+        """Effective top-level message (the original unless it was replaced)."""
+        return self.resolve(self.original)
+
+    def replace_part(self, part: Message, replacement: Message) -> None:
+        """Replace a part (or the original message itself) in the output."""
+        self._replacements[id(part)] = (part, replacement)
+
+    def resolve(self, part: Message) -> Message:
+        """Return the replacement for a part, or the part itself."""
+        entry = self._replacements.get(id(part))
+        return entry[1] if entry else part
+
+    def is_multipart(self) -> bool:
+        return self.root.is_multipart()
+
+    def walk(self):
+        """Walk the effective MIME tree."""
+        yield from self._walk(self.root)
+
+    def _walk(self, part: Message):
+        part = self.resolve(part)
+        yield part
+        if part.is_multipart():
+            for subpart in part.get_payload():
+                yield from self._walk(subpart)
+
+    # Serialization -----------------------------------------------------
+
+    def write_to(self, fp, linesep: Optional[str] = None) -> None:
+        """
+        Serialize the overlaid message directly to a binary stream.
+
+        Args:
+            fp: Binary file-like object with a write method
+            linesep: Line separator (defaults to the message policy's)
+        """
+        _OverlayWriter(fp, self, linesep).write_message()
+
+    def as_bytes(self, linesep: Optional[str] = None) -> bytes:
+        """Serialize the overlaid message to bytes."""
+        fp = BytesIO()
+        self.write_to(fp, linesep=linesep)
+        return fp.getvalue()
+
+    def as_string(self) -> str:
+        """Serialize the overlaid message to a string."""
+        return self.as_bytes().decode('ascii', errors='surrogateescape')
+
+
+class _OverlayWriter:
+    """
+    Writes an overlay part by part using only the public email API.
+
+    Multipart containers are written boundary by boundary so parts stream
+    straight to the output; each leaf part is written by a stock
+    BytesGenerator, which buffers only that part.
+    """
+
+    def __init__(self, fp, overlay: MessageOverlay, linesep: Optional[str]):
+        self._fp = fp
+        self._overlay = overlay
+        self._linesep = linesep or overlay.original.policy.linesep
+
+    def write_message(self) -> None:
+        self._write_part(self._overlay.original, self._overlay.raw_items())
+
+    def _write_part(self, part: Message, headers: Optional[List[Tuple[str, object]]] = None) -> None:
+        """Write a part with its own headers, or the given ones (the overlay's, for the root)."""
+        part = self._overlay.resolve(part)
+        items = list(part.raw_items()) if headers is None else headers
+        payload = part.get_payload()
+        maintype = part.get_content_maintype()
+
+        if maintype == 'multipart' and isinstance(payload, list):
+            boundary = part.get_boundary()
+            if not boundary:
+                header_message = self._with_headers(part, items)
+                boundary = f"===============MG{uuid.uuid4().hex}=="
+                header_message.set_boundary(boundary)
+                items = header_message.raw_items()
+            self._write_headers(part, items)
+            if part.preamble is not None:
+                self._write_text(part.preamble + '\n')
+            self._write_text(f"--{boundary}\n")
+            for i, subpart in enumerate(payload):
+                if i:
+                    self._write_text(f"\n--{boundary}\n")
+                self._write_part(subpart)
+            self._write_text(f"\n--{boundary}--\n")
+            if part.epilogue is not None:
+                self._write_text(part.epilogue)
+        elif maintype == 'message' and isinstance(payload, list) and len(payload) == 1:
+            # message/rfc822 and similar: headers, then the enclosed message
+            self._write_headers(part, items)
+            self._write_part(payload[0])
+        else:
+            if headers is not None:
+                part = self._with_headers(part, headers)
+            BytesGenerator(self._fp, mangle_from_=False, maxheaderlen=None, policy=part.policy).flatten(
+                part, unixfrom=False, linesep=self._linesep)
+
+    def _write_headers(self, part: Message, items: List[Tuple[str, object]]) -> None:
+        policy = part.policy.clone(linesep=self._linesep)
+        for h, v in items:
+            self._fp.write(policy.fold_binary(h, v))
+        self._fp.write(self._linesep.encode('ascii'))
+
+    def _write_text(self, text: str) -> None:
+        """Write text with its line endings converted to the output's."""
+        lines = text.splitlines(keepends=True)
+        data = ''.join(line.rstrip('\r\n') + self._linesep if line.endswith(('\r', '\n')) else line
+                       for line in lines)
+        self._fp.write(data.encode('ascii', errors='surrogateescape'))
+
+    @staticmethod
+    def _with_headers(part: Message, items: List[Tuple[str, object]]) -> Message:
+        """New message with the given headers sharing the part's payload (the part is untouched)."""
+        message = type(part)(policy=part.policy)
+        for h, v in items:
+            message.set_raw(h, v)
+        message.set_payload(part.get_payload())
+        message.preamble = part.preamble
+        message.epilogue = part.epilogue
+        return message
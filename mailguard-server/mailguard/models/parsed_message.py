@@ -0,0 +1,164 @@
+"""Single-pass typed view of a message's MIME parts."""
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import List, Optional, Set
+
+from ..monitoring import record_cache
+
+# Attachment types whose decoded payload is the text we scan, so offsets can be redacted in place
+REDACTABLE_SUBTYPES = {'json', 'xml', 'csv', 'x-csv', 'javascript', 'x-yaml', 'yaml'}
+REDACTABLE_EXTENSIONS = {'txt', 'csv', 'tsv', 'json', 'xml', 'html', 'htm', 'md', 'log', 'yaml', 'yml'}
+
+# Part kinds
+BODY = 'body'  # Inline text/plain
+HTML = 'html'  # Inline text/html
+ATTACHMENT = 'attachment'
+OTHER = 'other'  # Multipart containers, inline images, etc.
+
+
+def is_redactable(part: Message) -> bool:
+    """Check whether a part's decoded payload is plain text that can be redacted in place."""
+    if part.get_content_maintype() == 'text' or part.get_content_subtype() in REDACTABLE_SUBTYPES:
+        return True
+    filename = part.get_filename()
+    return bool(filename and '.' in filename
+                and filename.rsplit('.', 1)[1].lower() in REDACTABLE_EXTENSIONS)
+
+
+def decode_text_part(part: Message) -> str:
+    """
+    Decode a text part's payload.
+
+    Detection offsets are relative to this text, so scanning and redaction
+    must both decode through here.
+    """
+    payload = part.get_payload(decode=True) or b''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+
+@dataclass
+class MessagePart:
+    """One MIME part, classified once, with a lazily decoded text view."""
+    index: int  # Position in message.walk() order
+    kind: str  # BODY, HTML, ATTACHMENT or OTHER
+    part: Message
+    content_type: str
+    filename: Optional[str] = None
+    redactable: bool = False
+    extracted_text: Optional[str] = None  # Text extracted from a binary attachment (e.g. by Tika)
+    alternative_to: Optional[int] = None  # HTML part: index of its text/plain multipart/alternative sibling
+    _decoded: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def text(self) -> str:
+        """Decoded payload text (redactable parts only), decoded at most once."""
+        if not self.redactable:
+            return ''
+        hit = self._decoded is not None
+        record_cache('decoded_text', hit)
+        if not hit:
+            self._decoded = decode_text_part(self.part)
+        return self._decoded
+
+    @property
+    def scan_text(self) -> str:
+        """Text to run detection over; positions in detections are relative to it."""
+        if self.kind == OTHER or self.alternative_to is not None:
+            return ''  # An HTML alternative says what its text/plain sibling says
+        if self.redactable:
+            return self.text
+        return self.extracted_text or ''
+
+    @property
+    def extension(self) -> str:
+        """Lowercase filename extension, or '' if there is none."""
+        if self.filename and '.' in self.filename:
+            return self.filename.rsplit('.', 1)[1].lower()
+        return ''
+
+
+@dataclass
+class ParsedMessage:
+    """A message's parts in walk order, produced by a single walk of the MIME tree."""
+    message: Message
+    parts: List[MessagePart] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, message: Message) -> 'ParsedMessage':
+        """Walk the message once and classify every part."""
+        parts = []
+        for index, part in enumerate(message.walk()):
+            content_type = part.get_content_type()
+            filename = part.get_filename()
+
+            if part.get_content_disposition() == 'attachment':
+                kind = ATTACHMENT
+            elif content_type == 'text/plain':
+                kind = BODY
+            elif content_type == 'text/html':
+                kind = HTML
+            else:
+                kind = OTHER
+
+            parts.append(MessagePart(
+                index=index,
+                kind=kind,
+                part=part,
+                content_type=content_type,
+                filename=filename,
+                redactable=kind != OTHER and is_redactable(part)
+            ))
+        _link_alternatives(parts)
+        return cls(message=message, parts=parts)
+
+    def __getitem__(self, index: int) -> MessagePart:
+        return self.parts[index]
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    @property
+    def bodies(self) -> List[MessagePart]:
+        """Inline text/plain parts."""
+        return [p for p in self.parts if p.kind == BODY]
+
+    @property
+    def attachments(self) -> List[MessagePart]:
+        """Attachment parts."""
+        return [p for p in self.parts if p.kind == ATTACHMENT]
+
+    @property
+    def body_text(self) -> str:
+        """Plain text body (all inline text/plain parts, or the whole payload of a single-part message)."""
+        if self.parts and not self.message.is_multipart():
+            return self.parts[0].text
+        return ''.join(p.text for p in self.bodies)
+
+    @property
+    def attachment_types(self) -> Set[str]:
+        """Content types and filename extensions of all attachments."""
+        types = set()
+        for attachment in self.attachments:
+            types.add(attachment.content_type)
+            if attachment.extension:
+                types.add(attachment.extension)
+        return types
+
+
+def _link_alternatives(parts: List[MessagePart]) -> None:
+    """Point each HTML part at the text/plain part of the same multipart/alternative."""
+    by_id = {id(p.part): p for p in parts}
+    for container in parts:
+        if container.content_type != 'multipart/alternative':
+            continue
+        children = [by_id.get(id(child)) for child in container.part.get_payload()]
+        plain = next((c for c in children if c and c.kind == BODY), None)
+        if plain is None:
+            continue
+        for child in children:
+            if child and child.kind == HTML:
+                child.alternative_to = plain.index
@@ -3,6 +3,8 @@ from typing import List, Dict, Optional
 from dataclasses import dataclass
 from email.message import EmailMessage
 
+from .message_overlay import MessageOverlay
+
 @dataclass
 class PolicyDecision:
     """Decision made by policy engine."""
@@ -10,6 +12,7 @@ class PolicyDecision:
     reason: str
     detections: List[Dict]
     original_message: Optional[EmailMessage] = None
-    modified_message: Optional[EmailMessage] = None
+    modified_message: Optional[MessageOverlay] = None
     quarantine_path: Optional[str] = None
+    rule: Optional[str] = None  # Name of the policy rule that matched, if any
 
@@ -0,0 +1,46 @@
+"""Per-message processing time budget."""
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class TimeBudget:
+    """
+    Deadline for processing one message, shared by every stage that handles it.
+
+    Stages check the remaining time before expensive work, cap their own
+    timeouts to it, and record what they skipped or downgraded via degrade().
+    A budget of 0 seconds never expires.
+    """
+    seconds: float
+    started: float = field(default_factory=time.monotonic)
+    degradations: List[str] = field(default_factory=list)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.seconds <= 0
+
+    def remaining(self) -> float:
+        """Seconds left (infinite for an unlimited budget)."""
+        if self.unlimited:
+            return float('inf')
+        return max(0.0, self.started + self.seconds - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for a blocking call: cap, shortened to the remaining time."""
+        return min(cap, self.remaining())
+
+    def degrade(self, what: str) -> None:
+        """Record a degradation (e.g. 'regex_only' or 'attachment_skipped:report.pdf')."""
+        if what not in self.degradations:
+            self.degradations.append(what)
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.degradations)
+
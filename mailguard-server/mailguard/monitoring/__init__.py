@@ -0,0 +1,20 @@
+"""Runtime monitoring: metrics, tracing and profiling."""
+from .metrics import MetricsRegistry, registry, record_cache
+from .tracing import Tracer, tracer, span, traced, current_span
+from .profiler import Profiler, profiler, memory_snapshot, rss_bytes, stop_memory_tracing
+
+__all__ = [
+    'MetricsRegistry',
+    'registry',
+    'record_cache',
+    'Tracer',
+    'tracer',
+    'span',
+    'traced',
+    'current_span',
+    'Profiler',
+    'profiler',
+    'memory_snapshot',
+    'rss_bytes',
+    'stop_memory_tracing'
+]
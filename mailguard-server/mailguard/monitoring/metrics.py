@@ -0,0 +1,290 @@
+"""Lock-light metrics registry with Prometheus text exposition."""
+import logging
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _ShardOwner:
+    """Stand-in whose collection signals that the thread owning a shard has exited."""
+    __slots__ = ('__weakref__',)
+
+
+class _Metric:
+    """
+    Base for sharded metrics.
+
+    Every thread records into its own shard (a plain dict reached through
+    threading.local), so the hot path takes no lock; the lock is only taken
+    once per thread to register its shard. Scrapes copy and merge shards.
+    When a thread exits, its shard is merged into a retired shard, so the
+    number of shards stays bounded by the number of live threads.
+    """
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._retired: dict = {}  # Totals of threads that have exited
+        self._shards: List[dict] = [self._retired]
+        # Reentrant: a shard may be retired on a thread that holds the lock
+        self._lock = threading.RLock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # The owner lives only in this thread's local, so it is collected when the thread exits
+            owner = self._local.owner = _ShardOwner()
+            weakref.finalize(owner, self._retire, shard)
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard: dict) -> None:
+        """Merge an exited thread's shard into the retired totals."""
+        with self._lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            for key, value in shard.items():
+                self._retired[key] = self._merge_value(self._retired.get(key), value)
+
+    @staticmethod
+    def _merge_value(total, value):
+        """Combine two shards' values for the same labels (total may be None)."""
+        raise NotImplementedError
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _snapshots(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so a shard can be copied while its thread writes
+        return [shard.copy() for shard in shards]
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    kind = 'counter'
+
+    @staticmethod
+    def _merge_value(total, value):
+        return value if total is None else total + value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        shard = self._shard()
+        key = self._label_values(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        """Totals per label values, merged across threads."""
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def _render_samples(self) -> List[str]:
+        return [f'{self.name}{self._format_labels(key)} {_number(value)}'
+                for key, value in sorted(self.values().items())]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    @staticmethod
+    def _merge_value(total, value):
+        # A new list, so a scrape copying the retired shard never sees one half-updated
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def observe(self, value: float, **labels) -> None:
+        shard = self._shard()
+        key = self._label_values(labels)
+        # [per-bucket counts..., +Inf count, sum, count]
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self) -> Dict[LabelValues, list]:
+        """Merged [bucket counts..., +Inf count, sum, count] per label values."""
+        merged: Dict[LabelValues, list] = {}
+        for shard in self._snapshots():
+            for key, state in shard.items():
+                state = list(state)
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = state
+                else:
+                    for i, value in enumerate(state):
+                        total[i] += value
+        return merged
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for key, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                labels = self._format_labels(key, 'le="' + le + '"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {_number(state[-2])}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {state[-1]}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Point-in-time value read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str,
+                 callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+
+    def _render_samples(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.warning(f"Error reading gauge {self.name}: {e}")
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f'{self.name}{self._format_labels(key)} {_number(v)}' for key, v in sorted(value.items())]
+
+
+class MetricsRegistry:
+    """Named metrics, created on first use and rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], _Metric]) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str,
+              callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+              labelnames: Sequence[str] = ()) -> Gauge:
+        """Register (or replace) a callback gauge."""
+        gauge = Gauge(name, help_text, callback, labelnames)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+# Process-wide registry and the pipeline's metrics
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'mailguard_stage_duration_seconds', 'Time spent in each message processing stage', ('stage',))
+EXTRACTION_SECONDS = registry.histogram(
+    'mailguard_extraction_duration_seconds', 'Attachment text extraction time per extractor', ('extractor',))
+DETECTION_SECONDS = registry.histogram(
+    'mailguard_detection_duration_seconds', 'Detection time per detector and message part', ('detector',))
+NLP_BATCH_SIZE = registry.histogram(
+    'mailguard_nlp_batch_size', 'Texts analyzed together per Presidio batch', buckets=(1, 2, 4, 8, 16, 32, 64))
+MESSAGES = registry.counter(
+    'mailguard_messages_total', 'Messages processed, by policy action', ('action',))
+PROCESSING_ERRORS = registry.counter(
+    'mailguard_processing_errors_total', 'Messages that failed processing')
+DETECTIONS = registry.counter(
+    'mailguard_detections_total', 'Sensitive data detections, by pattern type', ('pattern_type',))
+SHADOW_DECISIONS = registry.counter(
+    'mailguard_shadow_decisions_total', 'Shadow policy decisions (not enforced), by policy and action',
+    ('policy', 'action'))
+CACHE_REQUESTS = registry.counter(
+    'mailguard_cache_requests_total', 'Cache lookups, by cache and result (hit or miss)', ('cache', 'result'))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup."""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _cache_hit_ratios() -> Dict[LabelValues, float]:
+    lookups: Dict[str, List[float]] = {}
+    for (cache, result), count in CACHE_REQUESTS.values().items():
+        hits_total = lookups.setdefault(cache, [0.0, 0.0])
+        hits_total[1] += count
+        if result == 'hit':
+            hits_total[0] += count
+    return {(cache,): hits / total for cache, (hits, total) in lookups.items() if total}
+
+
+registry.gauge('mailguard_cache_hit_ratio', 'Cache hit ratio since start, by cache',
+               _cache_hit_ratios, ('cache',))
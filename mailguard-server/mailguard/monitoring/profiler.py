@@ -0,0 +1,285 @@
+"""On-demand CPU profiling and memory snapshots for the running proxy."""
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE = 'sample'
+CPROFILE = 'cprofile'
+MODES = (SAMPLE, CPROFILE)
+
+MAX_PROFILE_SECONDS = 300
+MAX_STACK_DEPTH = 128
+
+
+class Profiler:
+    """
+    Runs one profiling session at a time for a fixed duration.
+
+    Two modes:
+      sample: a background thread snapshots the stacks of the selected
+        threads (sys._current_frames) every `interval` seconds and counts
+        them as collapsed stacks, ready for flamegraph.pl or speedscope.
+        Overhead is per sample, not per call, so it is safe under load.
+      cprofile: every message processed while the session runs is profiled
+        with cProfile (see profiled()) and the stats are merged; slower, but
+        exact call counts. Results are returned as a pstats dump.
+
+    The last finished session's result is kept until the next one starts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[dict] = None
+        self._result: Optional[dict] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self._stats: Optional[pstats.Stats] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._session is not None
+
+    def start(self, mode: str = SAMPLE, seconds: float = 30, interval: float = 0.005,
+              thread_prefix: str = '') -> dict:
+        """
+        Start a profiling session.
+
+        Args:
+            mode: 'sample' or 'cprofile'
+            seconds: Session length (capped at MAX_PROFILE_SECONDS)
+            interval: Seconds between stack samples (sample mode)
+            thread_prefix: Only sample threads whose name starts with this (sample mode)
+
+        Returns:
+            Session status
+
+        Raises:
+            ValueError: On an unknown mode or bad duration
+            RuntimeError: If a session is already running
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', expected one of {', '.join(MODES)}")
+        if seconds <= 0 or interval <= 0:
+            raise ValueError('seconds and interval must be positive')
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError('A profiling session is already running')
+            self._stop.clear()
+            self._stacks = Counter()
+            self._stats = None
+            self._result = None
+            self._session = {
+                'mode': mode,
+                'seconds': seconds,
+                'interval': interval,
+                'thread_prefix': thread_prefix,
+                'started': time.time(),
+                'samples': 0,
+                'profiled_calls': 0
+            }
+        target = self._sample if mode == SAMPLE else self._wait
+        self._thread = threading.Thread(target=target, name='mailguard-profiler', daemon=True)
+        self._thread.start()
+        logger.warning(f"Profiling started ({mode}, {seconds:g}s)")
+        return self.status()
+
+    def stop(self) -> dict:
+        """Stop the running session early and wait for its result."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        return self.status()
+
+    def status(self) -> dict:
+        with self._lock:
+            if self._session is not None:
+                return dict(self._session, running=True,
+                            elapsed=round(time.time() - self._session['started'], 1))
+            if self._result is not None:
+                return dict(self._result['session'], running=False)
+            return {'running': False}
+
+    def collapsed(self) -> Optional[str]:
+        """Last sample session as collapsed stacks ('frame;frame;frame count' lines)."""
+        with self._lock:
+            if self._result is None or self._result['session']['mode'] != SAMPLE:
+                return None
+            stacks = self._result['stacks']
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def pstats_dump(self) -> Optional[bytes]:
+        """Last cProfile session in the pstats file format (load with pstats.Stats(path))."""
+        with self._lock:
+            stats = self._result and self._result.get('stats')
+        if stats is None:
+            return None
+        return marshal.dumps(stats.stats)
+
+    def pstats_text(self, sort: str = 'cumulative', limit: int = 50) -> Optional[str]:
+        """Last cProfile session as a printed pstats table."""
+        with self._lock:
+            stats = self._result and self._result.get('stats')
+        if stats is None:
+            return None
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    @contextmanager
+    def profiled(self):
+        """Profile the with block with cProfile if a cprofile session is running."""
+        session = self._session
+        if session is None or session['mode'] != CPROFILE:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._merge(profile)
+
+    def _merge(self, profile: cProfile.Profile) -> None:
+        stats = pstats.Stats(profile)
+        with self._lock:
+            if self._session is None:
+                # Finished while this call ran
+                return
+            self._session['profiled_calls'] += 1
+            if self._stats is None:
+                self._stats = stats
+            else:
+                self._stats.add(stats)
+
+    def _wait(self) -> None:
+        self._stop.wait(self._session['seconds'])
+        self._finish()
+
+    def _sample(self) -> None:
+        session = self._session
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + session['seconds']
+        prefix = session['thread_prefix']
+
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, str(thread_id))
+                if thread_id == own_id or not name.startswith(prefix):
+                    continue
+                self._stacks[_collapse(frame)] += 1
+            session['samples'] += 1
+            self._stop.wait(session['interval'])
+        self._finish()
+
+    def _finish(self) -> None:
+        with self._lock:
+            session, self._session = self._session, None
+            session['duration'] = round(time.time() - session['started'], 1)
+            self._result = {'session': session, 'stacks': self._stacks, 'stats': self._stats}
+        logger.warning(f"Profiling finished ({session['mode']}, {session['duration']}s, "
+                       f"{session['samples']} samples, {session['profiled_calls']} profiled calls)")
+
+
+def _collapse(frame) -> str:
+    """Collapsed stack for a frame, outermost first."""
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+def memory_snapshot(limit: int = 25, group_by: str = 'lineno', frames: int = 1) -> dict:
+    """
+    Top allocations traced by tracemalloc, and growth since the previous snapshot.
+
+    The first call starts tracemalloc (with `frames` frames per traceback)
+    and only reports that tracing has begun; tracing slows allocation down,
+    so stop it with stop_memory_tracing() when done.
+
+    Args:
+        limit: Number of top entries to return
+        group_by: 'lineno', 'filename' or 'traceback'
+        frames: Traceback depth used when starting tracemalloc
+
+    Returns:
+        Snapshot summary
+    """
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _last_snapshot = None
+        logger.warning(f"tracemalloc started ({frames} frames)")
+        return {'tracing': True, 'started': True, 'top': [], 'growth': []}
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    result = {
+        'tracing': True,
+        'started': False,
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'top': [_stat_dict(stat) for stat in snapshot.statistics(group_by)[:limit]],
+        'growth': []
+    }
+    if _last_snapshot is not None:
+        growth = [stat for stat in snapshot.compare_to(_last_snapshot, group_by) if stat.size_diff > 0]
+        result['growth'] = [_stat_dict(stat) for stat in growth[:limit]]
+    _last_snapshot = snapshot
+    return result
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where it can't be read (non-Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def stop_memory_tracing() -> None:
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+
+
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def _stat_dict(stat) -> Dict[str, object]:
+    entry = {
+        'location': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        'size_bytes': stat.size,
+        'count': stat.count
+    }
+    if hasattr(stat, 'size_diff'):
+        entry['size_diff_bytes'] = stat.size_diff
+        entry['count_diff'] = stat.count_diff
+    return entry
+
+
+profiler = Profiler()
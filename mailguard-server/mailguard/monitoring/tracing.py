@@ -0,0 +1,289 @@
+"""Lightweight per-message tracing with a slow-trace ring and OTLP JSON export."""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS_PER_TRACE = 1000
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('mailguard_span', default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, key: str, value: Any) -> None:
+        """Set a span attribute."""
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span as failed."""
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_offset_ms': round((self.start_ns - self.trace.root.start_ns) / 1e6, 3),
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Stand-in span used when no trace is active."""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans recorded for one message."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        self.root = self._add_span(name, None, attributes)
+
+    def _add_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Optional[Span]:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return None
+        span = Span(self, name, parent_id, attributes)
+        self.spans.append(span)
+        return span
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def summary(self) -> dict:
+        """Trace overview without its spans."""
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'start': self.root.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.root.attributes,
+            'error': self.root.error,
+            'span_count': len(self.spans),
+            'dropped_spans': self.dropped_spans
+        }
+
+    def to_dict(self) -> dict:
+        data = self.summary()
+        data['spans'] = [span.to_dict() for span in self.spans]
+        return data
+
+    def to_otlp(self, service_name: str = 'mailguard') -> dict:
+        """Trace as an OTLP/JSON ExportTraceServiceRequest."""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [_otlp_attribute('service.name', service_name)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'mailguard'},
+                    'spans': [span.to_otlp() for span in self.spans]
+                }]
+            }]
+        }
+
+
+class Tracer:
+    """
+    Records message traces and keeps the slow ones.
+
+    Traces whose root span takes at least slow_threshold_ms are kept in a
+    bounded ring (oldest dropped first) and, if export_path is set, appended
+    to it as one OTLP/JSON request per line.
+    """
+
+    def __init__(self, slow_threshold_ms: float = 5000, ring_size: int = 100,
+                 export_path: Optional[str] = None, enabled: bool = True):
+        """
+        Initialize tracer.
+
+        Args:
+            slow_threshold_ms: Minimum trace duration to keep
+            ring_size: Maximum slow traces kept in memory
+            export_path: Optional JSON lines file slow traces are appended to
+            enabled: Record traces at all
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self.export_path = export_path
+        self.enabled = enabled
+        self._slow = deque(maxlen=ring_size)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """
+        Start a trace, or a child span if a trace is already active.
+
+        Yields:
+            The root (or child) span
+        """
+        if _current_span.get() is not None or not self.enabled:
+            with span(name, **attributes) as child:
+                yield child
+            return
+
+        trace = Trace(name, attributes)
+        token = _current_span.set(trace.root)
+        try:
+            yield trace.root
+        except BaseException as e:
+            trace.root.record_error(e)
+            raise
+        finally:
+            trace.root.end_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(trace)
+
+    def _finish(self, trace: Trace) -> None:
+        if trace.duration_ms < self.slow_threshold_ms:
+            return
+
+        logger.warning(f"Slow {trace.root.name} ({trace.duration_ms:.0f}ms, trace {trace.trace_id}): "
+                       f"{_slowest_spans(trace)}")
+        with self._lock:
+            self._slow.append(trace)
+            if self.export_path:
+                try:
+                    with open(self.export_path, 'a') as f:
+                        f.write(json.dumps(trace.to_otlp()) + '\n')
+                except OSError as e:
+                    logger.error(f"Error exporting trace to {self.export_path}: {e}")
+
+    def slow_traces(self) -> List[Trace]:
+        """Kept slow traces, newest first."""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def get_slow_trace(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._slow:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record a child span of the active span (a no-op outside a trace).
+
+    Yields:
+        The span, whose attributes can be set with span.set()
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+
+    child = parent.trace._add_span(name, parent.span_id, attributes)
+    if child is None:
+        yield _NOOP_SPAN
+        return
+
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """Decorator recording each call of the function as a span."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """The active span (a no-op span outside a trace), for setting attributes."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def _slowest_spans(trace: Trace, limit: int = 3) -> str:
+    spans = sorted(trace.spans[1:], key=lambda s: s.duration_ms, reverse=True)[:limit]
+    return ', '.join(f"{s.name} {s.duration_ms:.0f}ms" for s in spans) or 'no child spans'
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+tracer = Tracer(
+    slow_threshold_ms=Config.SLOW_TRACE_THRESHOLD_MS,
+    ring_size=Config.SLOW_TRACE_RING_SIZE,
+    export_path=Config.TRACE_EXPORT_FILE or None,
+    enabled=Config.TRACING_ENABLED
+)
@@ -1,5 +1,6 @@
 """SMTP proxy for intercepting emails."""
+from .admission import AdmissionController
 from .smtp_proxy import SMTPProxy
 
-__all__ = ['SMTPProxy']
+__all__ = ['AdmissionController', 'SMTPProxy']
 
@@ -0,0 +1,205 @@
+"""Admission control and load shedding for the SMTP proxy."""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Admission states, from least to most loaded
+NORMAL = 'normal'  # Accept everything, full detection
+DEGRADED = 'degraded'  # Fewer sessions, cheaper (regex-only) detection
+SHEDDING = 'shedding'  # Even fewer sessions, new transactions are tempfailed
+
+BUSY_STATUS = '421 4.3.2 Too many connections, try again later'
+OVERLOADED_STATUS = '451 4.3.2 System overloaded, try again later'
+
+
+class AdmissionController:
+    """
+    Tracks proxy load and decides whether to admit sessions and messages.
+
+    Load is measured by in-flight messages (accepted but not yet processed),
+    an EWMA of queue wait (DATA received -> worker start) and EWMAs of each
+    processing stage's latency. The state only steps back down after it has
+    held for hold_seconds and load has fallen below recovery_ratio of the
+    limits, so it doesn't flap around a threshold.
+    """
+
+    def __init__(self, max_sessions: int = 100, max_in_flight: int = 50,
+                 max_queue_wait: float = 5.0, target_latency: float = 10.0,
+                 ewma_alpha: float = 0.2, recovery_ratio: float = 0.5,
+                 hold_seconds: float = 10.0):
+        """
+        Initialize admission controller.
+
+        Args:
+            max_sessions: Concurrent SMTP sessions allowed under normal load
+            max_in_flight: Accepted messages waiting or processing before shedding
+            max_queue_wait: Queue wait (seconds) before shedding
+            target_latency: Processing latency (seconds, sum of stages) before degrading
+            ewma_alpha: Weight of the newest sample in the moving averages
+            recovery_ratio: Fraction of the limits load must drop below to recover
+            hold_seconds: Minimum time in a state before stepping back down
+        """
+        self.max_sessions = max_sessions
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.target_latency = target_latency
+        self.ewma_alpha = ewma_alpha
+        self.recovery_ratio = recovery_ratio
+        self.hold_seconds = hold_seconds
+
+        self._lock = threading.Lock()
+        self.state = NORMAL
+        self._state_since = time.monotonic()
+        self.sessions = 0
+        self.in_flight = 0
+        self.queued = 0
+        self._queue_wait = 0.0
+        self._stage_latency: Dict[str, float] = {}
+        self.rejected = {'sessions': 0, 'senders': 0, 'messages': 0}
+
+    @property
+    def session_limit(self) -> int:
+        """Concurrent session limit for the current state."""
+        if self.state == SHEDDING:
+            return max(1, self.max_sessions // 4)
+        if self.state == DEGRADED:
+            return max(1, self.max_sessions // 2)
+        return self.max_sessions
+
+    @property
+    def use_fallback_tier(self) -> bool:
+        """Whether detection should use the cheap tier."""
+        return self.state != NORMAL
+
+    def open_session(self) -> bool:
+        """Admit a new SMTP session; False if it should be refused with BUSY_STATUS."""
+        with self._lock:
+            if self.sessions >= self.session_limit:
+                self.rejected['sessions'] += 1
+                return False
+            self.sessions += 1
+            return True
+
+    def close_session(self) -> None:
+        with self._lock:
+            self.sessions = max(0, self.sessions - 1)
+
+    def check_sender(self) -> Optional[str]:
+        """Check a new transaction at MAIL FROM; returns a tempfail status while shedding."""
+        with self._lock:
+            self._update_state()
+            if self.state == SHEDDING:
+                self.rejected['senders'] += 1
+                return OVERLOADED_STATUS
+            return None
+
+    def admit_message(self) -> Optional[str]:
+        """
+        Admit a received message for processing.
+
+        Returns:
+            Tempfail status if the pipeline is full, None if admitted (the
+            caller must then call start_processing and finish_message)
+        """
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected['messages'] += 1
+                self._update_state()
+                return OVERLOADED_STATUS
+            self.in_flight += 1
+            self.queued += 1
+            self._update_state()
+            return None
+
+    def start_processing(self, queued_at: float) -> None:
+        """Record that an admitted message reached a worker (queued_at is time.monotonic())."""
+        wait = time.monotonic() - queued_at
+        with self._lock:
+            self.queued = max(0, self.queued - 1)
+            self._queue_wait = self._ewma(self._queue_wait, wait)
+            self._update_state()
+
+    def finish_message(self) -> None:
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._update_state()
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        """Record one processing stage's latency."""
+        with self._lock:
+            self._stage_latency[stage] = self._ewma(self._stage_latency.get(stage), seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a processing stage."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.monotonic() - start)
+
+    def snapshot(self) -> dict:
+        """Current admission state for the API."""
+        with self._lock:
+            self._update_state()
+            return {
+                'state': self.state,
+                'state_since_seconds': round(time.monotonic() - self._state_since, 1),
+                'sessions': self.sessions,
+                'session_limit': self.session_limit,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'queued': self.queued,
+                'queue_wait_ms': round(self._current_queue_wait() * 1000, 1),
+                'stage_latency_ms': {
+                    stage: round(latency * 1000, 1) for stage, latency in self._stage_latency.items()
+                },
+                'fallback_detection': self.use_fallback_tier,
+                'rejected': dict(self.rejected)
+            }
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.ewma_alpha * (sample - current)
+
+    def _current_queue_wait(self) -> float:
+        # Nothing waiting means no queueing delay, whatever the last samples were
+        return self._queue_wait if self.queued else 0.0
+
+    def _update_state(self) -> None:
+        """Re-evaluate the state (caller holds the lock)."""
+        queue_wait = self._current_queue_wait()
+        latency = sum(self._stage_latency.values())
+
+        if self.in_flight >= self.max_in_flight or queue_wait >= self.max_queue_wait:
+            target = SHEDDING
+        elif latency >= self.target_latency or queue_wait >= self.max_queue_wait / 2:
+            target = DEGRADED
+        else:
+            target = NORMAL
+
+        order = (NORMAL, DEGRADED, SHEDDING)
+        if order.index(target) > order.index(self.state):
+            self._set_state(target)
+            return
+        if target == self.state or time.monotonic() - self._state_since < self.hold_seconds:
+            return
+
+        # Step down one level at a time, once load is well below the limits
+        ratio = self.recovery_ratio
+        if self.state == SHEDDING:
+            if self.in_flight <= self.max_in_flight * ratio and queue_wait <= self.max_queue_wait * ratio:
+                self._set_state(DEGRADED)
+        elif latency <= self.target_latency * ratio and queue_wait <= self.max_queue_wait * ratio / 2:
+            self._set_state(NORMAL)
+
+    def _set_state(self, state: str) -> None:
+        logger.warning(f"Admission state {self.state} -> {state} "
+                       f"(in flight: {self.in_flight}, sessions: {self.sessions})")
+        self.state = state
+        self._state_since = time.monotonic()
@@ -1,10 +1,14 @@
 """SMTP proxy server."""
 import logging
-from aiosmtpd.controller import Controller
 
 from ..config import Config
 from ..engines import DetectionEngine, ContentExtractor, PolicyEngine
+from ..engines.policy import EnvelopePolicy, RateLimiter
+from ..monitoring import registry
 from ..services import EmailProcessor
+from ..services.storage import ExtractedTextCache
+from .admission import AdmissionController
+from .spooling import SpoolingController
 
 logger = logging.getLogger(__name__)
 
@@ -20,16 +24,60 @@ class SMTPProxy:
             flask_app: Flask application instance (for database access)
         """
         self.detection_engine = DetectionEngine(
-            use_presidio=Config.USE_PRESIDIO
+            use_presidio=Config.USE_PRESIDIO,
+            batch_size=Config.NLP_BATCH_SIZE,
+            batch_max_wait_ms=Config.NLP_BATCH_MAX_WAIT_MS,
+            entities=Config.PRESIDIO_ENTITIES,
+            spacy_model=Config.SPACY_MODEL,
+            disabled_components=Config.SPACY_DISABLED_COMPONENTS,
+            lazy=True,
+            edm_index_file=Config.EDM_INDEX_FILE or None,
+            edm_key_file=Config.EDM_KEY_FILE or None,
+            keyword_file=Config.KEYWORD_DICTIONARY_FILE or None,
+            detect_secrets=Config.SECRETS_DETECTION,
+            fingerprint_registry_dir=Config.FINGERPRINT_REGISTRY_DIR or None,
+            fingerprint_threshold=Config.FINGERPRINT_THRESHOLD
         )
-        self.content_extractor = ContentExtractor(Config.TIKA_SERVER_URL)
+        text_cache = None
+        if Config.TEXT_CACHE_DIR:
+            text_cache = ExtractedTextCache(Config.TEXT_CACHE_DIR, Config.TEXT_CACHE_MAX_AGE_DAYS,
+                                            Config.TEXT_CACHE_MAX_MB * 1024 * 1024)
+        self.content_extractor = ContentExtractor(Config.TIKA_SERVER_URL, text_cache=text_cache)
         self.policy_engine = PolicyEngine(
             default_policy=Config.DEFAULT_POLICY,
-            quarantine_dir=Config.QUARANTINE_DIR
+            quarantine_dir=Config.QUARANTINE_DIR,
+            rules_file=Config.POLICY_RULES_FILE or None,
+            reload_interval=Config.POLICY_RELOAD_INTERVAL,
+            degraded_action=Config.DEGRADED_ACTION,
+            shadow_rules_files=Config.SHADOW_POLICY_FILES
+        )
+        self.envelope_policy = EnvelopePolicy(
+            blocked_sender_domains=Config.BLOCKED_SENDER_DOMAINS,
+            blocked_recipient_domains=Config.BLOCKED_RECIPIENT_DOMAINS,
+            sender_quota=Config.SENDER_QUOTA_PER_HOUR,
+            max_message_size=Config.MAX_MESSAGE_SIZE_MB * 1024 * 1024,
+            rate_limiter=RateLimiter(
+                sender_per_minute=Config.RATE_LIMIT_SENDER_PER_MINUTE,
+                domain_per_minute=Config.RATE_LIMIT_DOMAIN_PER_MINUTE,
+                ip_per_minute=Config.RATE_LIMIT_IP_PER_MINUTE,
+                max_keys=Config.RATE_LIMIT_MAX_KEYS
+            )
+        )
+        self.admission = AdmissionController(
+            max_sessions=Config.MAX_SESSIONS,
+            max_in_flight=Config.MAX_IN_FLIGHT,
+            max_queue_wait=Config.MAX_QUEUE_WAIT_SECONDS,
+            target_latency=Config.TARGET_LATENCY_SECONDS
         )
         self.controller = None
+        self.handler = None
         self.app_context = app_context
         self.flask_app = flask_app
+        
+        if flask_app:
+            # Lets the admin API report admission state and shadow policy results
+            flask_app.extensions['mailguard_admission'] = self.admission
+            flask_app.extensions['mailguard_policy'] = self.policy_engine
     
     def start(self):
         """Start the SMTP proxy server."""
@@ -37,13 +85,25 @@ class SMTPProxy:
             self.detection_engine,
             self.content_extractor,
             self.policy_engine,
-            flask_app=self.flask_app
+            flask_app=self.flask_app,
+            envelope_policy=self.envelope_policy,
+            admission=self.admission,
+            workers=Config.PROCESSING_WORKERS,
+            fairness_key=Config.FAIR_QUEUE_KEY
         )
+        self.handler = handler
+        self._register_gauges()
+        # spaCy loads while the listener starts; the first messages wait for it if needed
+        self.detection_engine.load_models(background=True)
         
-        self.controller = Controller(
+        self.controller = SpoolingController(
             handler,
             hostname=Config.PROXY_HOST,
-            port=Config.PROXY_PORT
+            port=Config.PROXY_PORT,
+            data_size_limit=Config.MAX_MESSAGE_SIZE_MB * 1024 * 1024,
+            spool_threshold=Config.SPOOL_THRESHOLD_KB * 1024,
+            spool_dir=Config.SPOOL_DIR,
+            admission=self.admission
         )
         
         if not self.content_extractor.is_tika_available():
@@ -54,8 +114,36 @@ class SMTPProxy:
         logger.info(f"Forwarding to {Config.UPSTREAM_SMTP_HOST}:{Config.UPSTREAM_SMTP_PORT}")
         self.controller.start()
     
+    def _register_gauges(self):
+        """Expose proxy queue depths and load as metrics gauges."""
+        admission = self.admission
+        registry.gauge('mailguard_smtp_sessions', 'Open SMTP sessions', lambda: admission.sessions)
+        registry.gauge('mailguard_messages_in_flight', 'Messages accepted and not yet processed',
+                       lambda: admission.in_flight)
+        registry.gauge('mailguard_admission_state', 'Admission state (1 for the current state)',
+                       lambda: {(state,): float(state == admission.state)
+                                for state in ('normal', 'degraded', 'shedding')},
+                       ('state',))
+        
+        work_queue = self.handler.work_queue
+        if work_queue:
+            registry.gauge('mailguard_work_queue_depth', 'Messages waiting for a worker',
+                           lambda: sum(work_queue.backlog().values()))
+        
+        notifier = self.handler.email_notifier
+        registry.gauge('mailguard_notifications_pending', 'Summaries waiting for the next SSE batch',
+                       lambda: notifier.pending)
+        
+        rate_limiter = self.envelope_policy.rate_limiter
+        if rate_limiter:
+            registry.gauge('mailguard_rate_limit_buckets', 'Token buckets held, by scope',
+                           lambda: {(scope,): count for scope, count in rate_limiter.tracked_keys().items()},
+                           ('scope',))
+    
     def stop(self):
         """Stop the SMTP proxy server."""
         if self.controller:
             self.controller.stop()
             logger.info("SMTP proxy stopped")
+        if self.handler and self.handler.work_queue:
+            self.handler.work_queue.shutdown(wait=True)
@@ -0,0 +1,182 @@
+"""SMTP server that spools DATA to disk instead of buffering it in memory."""
+import asyncio
+import logging
+import tempfile
+from typing import Optional
+
+import aiosmtpd
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import MISSING, SMTP, syntax
+
+from .admission import BUSY_STATUS, AdmissionController
+
+logger = logging.getLogger(__name__)
+
+# SpoolingSMTP overrides aiosmtpd internals; this is the release they were written against
+SUPPORTED_AIOSMTPD_VERSION = '1.4.6'
+_REQUIRED_SMTP_INTERNALS = ('_handle_client', '_call_handler_hook', '_set_post_data_state',
+                            'check_helo_needed', 'check_auth_needed')
+
+
+def spooling_supported() -> bool:
+    """Whether the installed aiosmtpd is the release SpoolingSMTP was written against."""
+    return (aiosmtpd.__version__ == SUPPORTED_AIOSMTPD_VERSION
+            and all(hasattr(SMTP, name) for name in _REQUIRED_SMTP_INTERNALS))
+
+
+class SpoolingSMTP(SMTP):
+    """
+    aiosmtpd SMTP protocol whose DATA command writes to a spool file.
+
+    Message data is written to a SpooledTemporaryFile that moves to disk once
+    it exceeds the spool threshold. The handler receives the rewound spool as
+    ``envelope.content`` (``envelope.original_content`` is None) and must
+    implement ``handle_DATA``; the spool is closed once the handler returns.
+    """
+
+    def __init__(self, handler, *, spool_threshold: int = 1024 * 1024,
+                 spool_dir: Optional[str] = None,
+                 admission: Optional[AdmissionController] = None, **kwargs):
+        """
+        Initialize spooling SMTP protocol.
+
+        Args:
+            handler: aiosmtpd handler
+            spool_threshold: Bytes kept in memory before spooling to disk
+            spool_dir: Directory for spool files (system temp dir if None)
+            admission: Optional admission controller limiting concurrent sessions
+            **kwargs: Passed through to aiosmtpd SMTP
+        """
+        super().__init__(handler, **kwargs)
+        self.spool_threshold = spool_threshold
+        self.spool_dir = spool_dir
+        self.admission = admission
+        self._session_admitted = False
+
+    async def _handle_client(self) -> None:
+        if self.admission:
+            if not self.admission.open_session():
+                logger.warning(f"Refusing connection from {self.session.peer}: session limit reached")
+                await self.push(BUSY_STATUS)
+                self.transport.close()
+                return
+            self._session_admitted = True
+        await super()._handle_client()
+
+    def connection_lost(self, error) -> None:
+        if self._session_admitted:
+            self._session_admitted = False
+            self.admission.close_session()
+        super().connection_lost(error)
+
+    @syntax('DATA')
+    async def smtp_DATA(self, arg: str) -> None:
+        if await self.check_helo_needed():
+            return
+        if await self.check_auth_needed("DATA"):
+            return
+        if not self.envelope.rcpt_tos:
+            await self.push('503 Error: need RCPT command')
+            return
+        if arg:
+            await self.push('501 Syntax: DATA')
+            return
+
+        await self.push('354 End data with <CR><LF>.<CR><LF>')
+
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold, dir=self.spool_dir)
+        try:
+            error = await self._receive_data(spool)
+            if error:
+                await self.push(error)
+                self._set_post_data_state()
+                return
+
+            spool.seek(0)
+            self.envelope.content = spool
+            self.envelope.original_content = None
+
+            status = await self._call_handler_hook('DATA')
+            self._set_post_data_state()
+            await self.push('250 OK' if status is MISSING else status)
+        finally:
+            spool.close()
+
+    async def _receive_data(self, spool) -> Optional[str]:
+        """
+        Read DATA lines into the spool, undoing dot-stuffing.
+
+        Oversized data or lines are drained but not stored (RFC 5321 4.2.5).
+
+        Returns:
+            SMTP error status, or None on success
+        """
+        limit = self.data_size_limit
+        num_bytes = 0
+        error = None
+        line_fragments = []
+
+        while self.transport is not None:
+            try:
+                line = await self._reader.readuntil(b'\r\n')
+            except asyncio.CancelledError:
+                logger.info('Connection lost during DATA')
+                self._writer.close()
+                raise
+            except asyncio.LimitOverrunError as e:
+                error = error or '500 Line too long (see RFC5321 4.5.3.1.6)'
+                line = await self._reader.read(e.consumed)
+
+            if not line_fragments and line == b'.\r\n':
+                break
+
+            num_bytes += len(line)
+            if not error and limit and num_bytes > limit:
+                error = '552 Error: Too much mail data'
+
+            line_fragments.append(line)
+            if not line.endswith(b'\r\n'):
+                continue
+
+            if not error:
+                line = b''.join(line_fragments)
+                if len(line) > self.line_length_limit:
+                    error = '500 Line too long (see RFC5321 4.5.3.1.6)'
+                else:
+                    spool.write(line[1:] if line.startswith(b'.') else line)
+            line_fragments.clear()
+
+        return error
+
+
+class SpoolingController(Controller):
+    """
+    aiosmtpd Controller serving SpoolingSMTP.
+
+    With any other aiosmtpd release than SUPPORTED_AIOSMTPD_VERSION it serves
+    the stock SMTP protocol instead: DATA is buffered in memory and sessions
+    are not limited.
+    """
+
+    def __init__(self, handler, *, spool_threshold: int = 1024 * 1024,
+                 spool_dir: Optional[str] = None,
+                 admission: Optional[AdmissionController] = None, **kwargs):
+        super().__init__(handler, **kwargs)
+        self.spool_threshold = spool_threshold
+        self.spool_dir = spool_dir
+        self.admission = admission
+        self.spooling = spooling_supported()
+        if not self.spooling:
+            logger.warning(f"aiosmtpd {aiosmtpd.__version__} is not the supported {SUPPORTED_AIOSMTPD_VERSION}: "
+                           f"DATA will be buffered in memory and sessions are not limited")
+
+    def factory(self):
+        if not self.spooling:
+            return SMTP(self.handler, **self.SMTP_kwargs)
+        return SpoolingSMTP(
+            self.handler,
+            spool_threshold=self.spool_threshold,
+            spool_dir=self.spool_dir,
+            admission=self.admission,
+            **self.SMTP_kwargs
+        )
@@ -2,14 +2,22 @@
 import logging
 import os
 import sys
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from email.message import EmailMessage
 
+from ...config import Config
 from ...models import db, EmailLog, EmailRecipient, EmailAttachment
-from ...models import DetectionResult, PolicyDecision
+from ...models import DetectionResult, PolicyDecision, TimeBudget
+from ...monitoring import traced
 
 logger = logging.getLogger(__name__)
 
+# Stored body text is truncated to this many characters
+MAX_BODY_CHARS = 10000
+
+# Message IDs per IN (...) lookup, below SQLite's bound parameter limit
+IN_CLAUSE_CHUNK = 500
+
 
 class EmailRepository:
     """Repository for email log database operations."""
@@ -22,9 +30,11 @@ class EmailRepository:
         """
         self.flask_app = flask_app
     
+    @traced('save')
     def save(self, metadata: dict, body_text: str, detections: List[DetectionResult],
              policy_decision: PolicyDecision, attachment_data: list,
-             attachment_count: int, processing_time: float) -> Optional[EmailLog]:
+             attachment_count: int, processing_time: float,
+             budget: Optional[TimeBudget] = None) -> Optional[EmailLog]:
         """
         Save email log to database.
         
@@ -36,6 +46,7 @@ class EmailRepository:
             attachment_data: List of (filename, file_path) tuples
             attachment_count: Number of attachments
             processing_time: Processing time in milliseconds
+            budget: Processing budget whose degradations are recorded on the log
             
         Returns:
             EmailLog object if successful, None otherwise
@@ -44,15 +55,7 @@ class EmailRepository:
         try:
             ctx = self._get_flask_context()
             
-            # Determine proper status based on policy action and detections
-            if policy_decision.action == 'block':
-                status = 'blocked'
-            elif policy_decision.action == 'quarantine':
-                status = 'quarantined'
-            elif len(detections) > 0:
-                status = 'flagged'
-            else:
-                status = 'processed'
+            status = _status(policy_decision.action, len(detections))
             
             email_log = EmailLog(
                 message_id=metadata['message_id'],
@@ -61,10 +64,12 @@ class EmailRepository:
                 flagged=len(detections) > 0,
                 policy_applied=policy_decision.action,
                 detection_results=[d.__dict__ for d in detections] if detections else None,
-                body_text=body_text[:10000],  # Limit size
+                body_text=body_text[:MAX_BODY_CHARS],
                 attachment_count=attachment_count,
                 status=status,
-                processing_time_ms=processing_time
+                processing_time_ms=processing_time,
+                degraded=bool(budget and budget.degraded),
+                degradations=list(budget.degradations) if budget and budget.degraded else None
             )
             
             for recipient in metadata['recipients']:
@@ -85,8 +90,7 @@ class EmailRepository:
             db.session.commit()
             logger.info(f"Email saved to database (ID: {email_log.id})")
             
-            email_dict = email_log.to_dict()
-            email_log._email_dict = email_dict
+            _cache_notification_dict(email_log)
             
             return email_log
             
@@ -97,6 +101,107 @@ class EmailRepository:
             if ctx:
                 ctx.pop()
     
+    def save_batch(self, records: List[dict]) -> Tuple[int, int]:
+        """
+        Bulk insert email logs in a single transaction.
+        
+        Records whose message_id is already stored (or repeated within the
+        batch) are skipped, so re-running a batch is harmless.
+        
+        Args:
+            records: Dicts with message_id, sender, recipients, subject, body_text,
+                detections (list of dicts), action, attachment_count,
+                processing_time_ms and optionally error
+            
+        Returns:
+            Tuple of (inserted, skipped duplicates)
+        """
+        if not records:
+            return 0, 0
+        
+        ctx = None
+        try:
+            ctx = self._get_flask_context()
+            
+            message_ids = [record['message_id'] for record in records]
+            seen = set()
+            for start in range(0, len(message_ids), IN_CLAUSE_CHUNK):
+                chunk = message_ids[start:start + IN_CLAUSE_CHUNK]
+                rows = db.session.query(EmailLog.message_id).filter(EmailLog.message_id.in_(chunk))
+                seen.update(message_id for (message_id,) in rows)
+            
+            email_logs = []
+            for record in records:
+                if record['message_id'] in seen:
+                    continue
+                seen.add(record['message_id'])
+                
+                detections = record.get('detections') or []
+                error = record.get('error')
+                email_log = EmailLog(
+                    message_id=record['message_id'],
+                    sender=record['sender'],
+                    subject=record.get('subject'),
+                    flagged=len(detections) > 0,
+                    policy_applied=None if error else record.get('action'),
+                    detection_results=detections or None,
+                    body_text=(record.get('body_text') or '')[:MAX_BODY_CHARS],
+                    attachment_count=record.get('attachment_count', 0),
+                    status='error' if error else _status(record.get('action'), len(detections)),
+                    error_message=error,
+                    processing_time_ms=record.get('processing_time_ms')
+                )
+                for recipient in record.get('recipients', []):
+                    email_log.recipients.append(EmailRecipient(
+                        email_address=recipient,
+                        recipient_type='to'
+                    ))
+                email_logs.append(email_log)
+            
+            db.session.add_all(email_logs)
+            db.session.commit()
+            return len(email_logs), len(records) - len(email_logs)
+            
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if ctx:
+                ctx.pop()
+    
+    def update_detections(self, updates: List[dict]) -> int:
+        """
+        Replace the stored detections of existing email logs in one transaction.
+        
+        Args:
+            updates: Dicts with the log id and its new detections (list of dicts)
+            
+        Returns:
+            Number of logs updated
+        """
+        if not updates:
+            return 0
+        
+        ctx = None
+        try:
+            ctx = self._get_flask_context()
+            db.session.bulk_update_mappings(EmailLog, [
+                {
+                    'id': update['id'],
+                    'detection_results': update['detections'] or None,
+                    'flagged': bool(update['detections'])
+                }
+                for update in updates
+            ])
+            db.session.commit()
+            return len(updates)
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            if ctx:
+                ctx.pop()
+    
     def save_error(self, message: EmailMessage, error: Exception, start_time: float) -> Optional[EmailLog]:
         """
         Save error log to database.
@@ -133,6 +238,8 @@ class EmailRepository:
             
             db.session.add(email_log)
             db.session.commit()
+            
+            _cache_notification_dict(email_log)
             return email_log
             
         except Exception as db_error:
@@ -167,3 +274,21 @@ class EmailRepository:
             logger.warning(f"Could not get app context: {e}")
             return None
 
+
+def _status(action: Optional[str], detection_count: int) -> str:
+    """Log status for a policy action and number of detections."""
+    if action == 'block':
+        return 'blocked'
+    if action == 'quarantine':
+        return 'quarantined'
+    if detection_count > 0:
+        return 'flagged'
+    return 'processed'
+
+
+def _cache_notification_dict(email_log: EmailLog) -> None:
+    """Serialize a saved log once, as the notifier will send it: in full or summary form."""
+    if Config.NOTIFICATION_MODE == 'summary':
+        email_log._summary_dict = email_log.to_summary_dict()
+    else:
+        email_log._email_dict = email_log.to_dict()
@@ -1,20 +1,30 @@
 """Email processor for handling intercepted emails."""
+import asyncio
 import logging
+import os
 import time
-import zipfile
-import tarfile
-from email.message import EmailMessage
+from contextlib import contextmanager
+from email.feedparser import BytesFeedParser
+from email.message import EmailMessage, Message as Em_Message
+from typing import List, Optional
 from aiosmtpd.handlers import Message
 
 from ...config import Config
 from ...engines import DetectionEngine, ContentExtractor, PolicyEngine
-from ..storage import AttachmentStorage
+from ...engines.policy import EnvelopePolicy
+from ...models import ParsedMessage, TimeBudget
+from ...monitoring import profiler, span, tracer
+from ...monitoring.metrics import DETECTIONS, MESSAGES, PROCESSING_ERRORS, STAGE_SECONDS
+from ..storage import AttachmentStorage, iter_decoded_payload
 from ..database import EmailRepository
 from ..smtp import SMTPForwarder
 from ..notifications import EmailNotifier
+from .scheduler import FairWorkQueue
 
 logger = logging.getLogger(__name__)
 
+PARSE_CHUNK_SIZE = 64 * 1024
+
 
 class EmailProcessor(Message):
     """Processes intercepted emails through detection, policy, and logging."""
@@ -22,63 +32,221 @@ class EmailProcessor(Message):
     def __init__(self, detection_engine: DetectionEngine, 
                  content_extractor: ContentExtractor,
                  policy_engine: PolicyEngine,
-                 flask_app=None):
+                 flask_app=None,
+                 envelope_policy: EnvelopePolicy = None,
+                 admission=None,
+                 workers: int = 0,
+                 fairness_key: str = 'domain'):
+        """
+        Initialize email processor.
+        
+        Args:
+            detection_engine: Detection engine
+            content_extractor: Attachment content extractor
+            policy_engine: Policy engine
+            flask_app: Flask application instance (for database access)
+            envelope_policy: Optional MAIL FROM / RCPT TO policy
+            admission: Optional proxy AdmissionController
+            workers: Worker threads for processing (0 = process on the SMTP event loop)
+            fairness_key: What workers share capacity fairly between: 'domain'
+                (sender domain), 'sender' (sender address) or 'ip' (client IP)
+        """
         super().__init__()
         self.detection_engine = detection_engine
         self.content_extractor = content_extractor
         self.policy_engine = policy_engine
+        self.envelope_policy = envelope_policy
+        self.admission = admission
+        self.fairness_key = fairness_key
+        self.work_queue = FairWorkQueue(workers) if workers else None
         self.attachment_storage = AttachmentStorage()
         self.email_repository = EmailRepository(flask_app=flask_app)
         self.smtp_forwarder = SMTPForwarder()
         self.email_notifier = EmailNotifier()
     
-    def handle_message(self, message: EmailMessage):
-        """Process intercepted email (synchronous aiosmtpd handler)."""
-        start_time = time.time()
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        """Apply admission control and envelope policy to MAIL FROM before any data is transferred."""
+        if self.admission:
+            rejection = self.admission.check_sender()
+            if rejection:
+                logger.warning(f"Tempfailing MAIL FROM <{address}> from {session.peer}: overloaded")
+                return rejection
+        
+        if self.envelope_policy:
+            rejection = self.envelope_policy.check_sender(address, mail_options, _client_ip(session))
+            if rejection:
+                logger.warning(f"Rejected MAIL FROM <{address}> from {session.peer}: {rejection}")
+                return rejection
         
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return '250 OK'
+    
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        """Apply envelope policy to each RCPT TO."""
+        if self.envelope_policy:
+            rejection = self.envelope_policy.check_recipient(address)
+            if rejection:
+                logger.warning(f"Rejected RCPT TO <{address}> from <{envelope.mail_from}>: {rejection}")
+                return rejection
+        
+        envelope.rcpt_tos.append(address)
+        envelope.rcpt_options.extend(rcpt_options)
+        return '250 OK'
+    
+    async def handle_DATA(self, server, session, envelope):
+        """Admit the message and process it on the worker pool."""
+        if self.admission:
+            rejection = self.admission.admit_message()
+            if rejection:
+                logger.warning(f"Tempfailing message from <{envelope.mail_from}>: processing queue full")
+                return rejection
+        
+        queued_at = time.monotonic()
         try:
-            metadata = self._extract_metadata(message)
-            body_text = self._extract_body_text(message)
-            attachment_texts, attachment_data, attachment_count = self._process_attachments(message)
-            
-            all_text = body_text
-            if attachment_texts:
-                all_text += "\n\n" + "\n\n".join(attachment_texts)
-            
-            detections = self.detection_engine.detect_patterns(
-                all_text,
-                min_confidence=Config.MIN_CONFIDENCE
-            )
-            
-            self._print_detection_results(detections)
-            
-            policy_decision = self.policy_engine.evaluate(detections, message)
-            self._print_policy_decision(policy_decision)
-            
-            processing_time = (time.time() - start_time) * 1000
-            email_log = self.email_repository.save(
-                metadata, body_text, detections, policy_decision,
-                attachment_data, attachment_count, processing_time
-            )
-            
-            if email_log:
-                self.email_notifier.notify_new_email(email_log)
-            
-            message_to_send = self._get_message_to_send(policy_decision, message)
-            if message_to_send:
-                self.smtp_forwarder.forward(message_to_send)
-            
-        except Exception as e:
-            logger.error(f"Error processing email: {e}", exc_info=True)
-            error_log = self.email_repository.save_error(message, e, start_time)
-            if error_log:
-                self.email_notifier.notify_new_email(error_log)
+            if self.work_queue:
+                future = self.work_queue.submit(
+                    self._fairness_key(session, envelope), _content_size(envelope.content),
+                    self._process_envelope, session, envelope, queued_at
+                )
+                await asyncio.wrap_future(future)
+            else:
+                self._process_envelope(session, envelope, queued_at)
+        finally:
+            if self.admission:
+                self.admission.finish_message()
+        if self.envelope_policy:
+            self.envelope_policy.record_message(envelope.mail_from or '')
+        return '250 OK'
     
-    def _extract_metadata(self, message: EmailMessage) -> dict:
-        """Extract metadata from email message."""
+    def _process_envelope(self, session, envelope, queued_at: float):
+        """Parse and process a received message (runs on a worker)."""
+        if self.admission:
+            self.admission.start_processing(queued_at)
+        queue_wait_ms = round((time.monotonic() - queued_at) * 1000, 1)
+        with profiler.profiled(), tracer.trace('smtp_message', peer=str(session.peer), queue_wait_ms=queue_wait_ms):
+            with self._stage('parse'):
+                message = self.prepare_message(session, envelope)
+            self.handle_message(message, envelope.rcpt_tos)
+    
+    def _fairness_key(self, session, envelope) -> str:
+        """Key the worker pool shares capacity between for this message."""
+        if self.fairness_key == 'ip':
+            return _client_ip(session) or ''
+        sender = (envelope.mail_from or '').lower()
+        if self.fairness_key == 'sender':
+            return sender
+        return sender.rsplit('@', 1)[1] if '@' in sender else sender
+    
+    @contextmanager
+    def _stage(self, name: str):
+        """Time a processing stage for metrics and admission control."""
+        start = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_SECONDS.observe(elapsed, stage=name)
+            if self.admission:
+                self.admission.record_stage(name, elapsed)
+    
+    def prepare_message(self, session, envelope):
+        """Parse the message incrementally from the DATA spool file."""
+        content = envelope.content
+        if not hasattr(content, 'read'):
+            return super().prepare_message(session, envelope)
+        
+        parser = BytesFeedParser(_factory=self.message_class or Em_Message)
+        for chunk in iter(lambda: content.read(PARSE_CHUNK_SIZE), b''):
+            parser.feed(chunk)
+        message = parser.close()
+        
+        message['X-Peer'] = str(session.peer)
+        message['X-MailFrom'] = envelope.mail_from
+        message['X-RcptTo'] = ', '.join(envelope.rcpt_tos)
+        return message
+    
+    def handle_message(self, message: EmailMessage, envelope_recipients: Optional[List[str]] = None):
+        """
+        Process intercepted email (synchronous aiosmtpd handler).
+        
+        Args:
+            message: Received message
+            envelope_recipients: RCPT TO addresses the message is delivered to
+                (default: its To/Cc headers)
+        """
+        start_time = time.time()
+        budget = TimeBudget(Config.PROCESSING_BUDGET_SECONDS)
+        
+        with tracer.trace('handle_message') as trace_span:
+            try:
+                metadata = self._extract_metadata(message, envelope_recipients)
+                trace_span.set('message_id', metadata['message_id'])
+                with self._stage('classify'):
+                    parsed = ParsedMessage.parse(message)
+                    body_text = parsed.body_text
+                attachment_data, attachment_count = self._process_attachments(parsed, budget)
+                
+                # Under load admission control switches to the regex tier; record it like a spent budget,
+                # unless regex is the only tier anyway (Presidio not configured), so nothing is lost
+                regex_only = bool(self.admission and self.admission.use_fallback_tier)
+                if regex_only and self.detection_engine.presidio_detector:
+                    budget.degrade('regex_only')
+                with self._stage('detection'):
+                    detections = self.detection_engine.detect_in_parts(
+                        parsed.parts,
+                        min_confidence=Config.MIN_CONFIDENCE,
+                        budget=budget,
+                        regex_only=regex_only
+                    )
+                
+                self._print_detection_results(detections)
+                for detection in detections:
+                    DETECTIONS.inc(pattern_type=detection.pattern_type)
+                
+                with self._stage('policy'):
+                    policy_decision = self.policy_engine.evaluate(detections, message, parsed, budget,
+                                                                  envelope_recipients)
+                self._print_policy_decision(policy_decision)
+                trace_span.set('action', policy_decision.action)
+                MESSAGES.inc(action=policy_decision.action)
+                
+                if budget.degraded:
+                    logger.warning(f"Processing degraded (load or {budget.seconds:.0f}s budget): "
+                                   f"{', '.join(budget.degradations)}")
+                
+                processing_time = (time.time() - start_time) * 1000
+                with self._stage('db_write'):
+                    email_log = self.email_repository.save(
+                        metadata, body_text, detections, policy_decision,
+                        attachment_data, attachment_count, processing_time, budget
+                    )
+                
+                if email_log:
+                    self.email_notifier.notify_new_email(email_log)
+                
+                message_to_send = self._get_message_to_send(policy_decision, message)
+                if message_to_send:
+                    with self._stage('forward'):
+                        self.smtp_forwarder.forward(message_to_send, envelope_recipients)
+                
+            except Exception as e:
+                logger.error(f"Error processing email: {e}", exc_info=True)
+                PROCESSING_ERRORS.inc()
+                trace_span.record_error(e)
+                error_log = self.email_repository.save_error(message, e, start_time)
+                if error_log:
+                    self.email_notifier.notify_new_email(error_log)
+    
+    def _extract_metadata(self, message: EmailMessage, envelope_recipients: Optional[List[str]] = None) -> dict:
+        """Extract metadata from email message; recipients are who it is delivered to, if known."""
         message_id = message.get('Message-ID', f'<{time.time()}@proxy>')
         sender = message.get('From', 'unknown@unknown.com')
-        recipients = message.get_all('To', []) + message.get_all('Cc', []) + message.get_all('Bcc', [])
+        if envelope_recipients is not None:
+            recipients = list(envelope_recipients)
+        else:
+            recipients = message.get_all('To', []) + message.get_all('Cc', []) + message.get_all('Bcc', [])
         subject = message.get('Subject', '(no subject)')
         
         logger.info(f"Email intercepted: {subject} from {sender}")
@@ -90,50 +258,44 @@ class EmailProcessor(Message):
             'subject': subject
         }
     
-    def _process_attachments(self, message: EmailMessage) -> tuple:
-        """Process attachments and extract text content."""
-        attachment_texts = []
+    def _process_attachments(self, parsed: ParsedMessage, budget: TimeBudget = None) -> tuple:
+        """Save attachments and extract text from the ones that aren't plain text."""
         attachment_data = []
-        attachment_count = 0
-        
-        if not message.is_multipart():
-            return attachment_texts, attachment_data, attachment_count
+        attachments = parsed.attachments if parsed.message.is_multipart() else []
+        to_extract = []
         
-        for part in message.walk():
-            if part.get_content_disposition() == 'attachment':
-                attachment_count += 1
-                filename = part.get_filename()
-                if not filename:
+        with self._stage('attachment_save'):
+            for attachment in attachments:
+                if not attachment.filename:
                     continue
                 
-                payload = part.get_payload(decode=True)
-                if not payload:
-                    continue
-                
-                file_path = self.attachment_storage.save(filename, payload)
+                # Decode straight to storage instead of materializing the decoded payload
+                file_path = self.attachment_storage.save_stream(
+                    attachment.filename, iter_decoded_payload(attachment.part)
+                )
                 if file_path:
-                    attachment_data.append((filename, file_path))
-                    text = self._extract_attachment_text(file_path, filename)
-                    if text:
-                        attachment_texts.append(text)
+                    attachment_data.append((attachment.filename, file_path))
+                    # Text attachments are scanned as decoded so they can be redacted in place
+                    if not attachment.redactable:
+                        to_extract.append((attachment, file_path))
         
-        return attachment_texts, attachment_data, attachment_count
+        with self._stage('extraction'):
+            # Smallest first: if the budget runs out, the large (slow) attachments are the ones skipped
+            to_extract.sort(key=lambda item: os.path.getsize(item[1]))
+            for attachment, file_path in to_extract:
+                attachment.extracted_text = self._extract_attachment_text(file_path, attachment.filename, budget)
+        
+        return attachment_data, len(attachments)
     
-    def _extract_attachment_text(self, file_path: str, filename: str) -> str:
+    def _extract_attachment_text(self, file_path: str, filename: str, budget: TimeBudget = None) -> str:
         """Extract text content from attachment."""
         try:
-            if zipfile.is_zipfile(file_path) or tarfile.is_tarfile(file_path):
-                extracted = self.content_extractor.extract_from_archive(
-                    file_path, 
-                    max_depth=Config.MAX_ARCHIVE_DEPTH
-                )
-                return "\n\n".join(extracted.values())
-            else:
-                text = self.content_extractor.extract_text(
-                    file_path,
-                    max_size_mb=Config.MAX_ATTACHMENT_SIZE_MB
-                )
-                return text or ""
+            return self.content_extractor.extract_file(
+                file_path,
+                max_size_mb=Config.MAX_ATTACHMENT_SIZE_MB,
+                max_depth=Config.MAX_ARCHIVE_DEPTH,
+                budget=budget
+            )
         except Exception as e:
             logger.error(f"Error processing attachment {filename}: {e}")
             return ""
@@ -164,28 +326,18 @@ class EmailProcessor(Message):
             return policy_decision.modified_message
         else:
             return message
-    
-    def _extract_body_text(self, message: EmailMessage) -> str:
-        """Extract plain text body from message."""
-        body = ""
-        
-        if message.is_multipart():
-            for part in message.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        try:
-                            body += payload.decode('utf-8', errors='ignore')
-                        except:
-                            pass
-        else:
-            payload = message.get_payload(decode=True)
-            if payload:
-                try:
-                    body = payload.decode('utf-8', errors='ignore')
-                except:
-                    pass
-        
-        return body
 
+
+def _client_ip(session) -> str:
+    """Client IP address of an SMTP session."""
+    peer = session.peer
+    return peer[0] if isinstance(peer, tuple) else (peer or '')
+
+
+def _content_size(content) -> int:
+    """Size of received message data (bytes or a spool file)."""
+    if hasattr(content, 'seek'):
+        size = content.seek(0, os.SEEK_END)
+        content.seek(0)
+        return size
+    return len(content or b'')
@@ -0,0 +1,123 @@
+"""Fair work queue feeding the message processing workers."""
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ('future', 'fn', 'args', 'cost')
+
+    def __init__(self, future: Future, fn: Callable, args: tuple, cost: int):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.cost = cost
+
+
+class FairWorkQueue:
+    """
+    Worker pool that shares processing capacity fairly between keys.
+
+    Jobs are queued per key (e.g. sender domain) and workers pick them by
+    deficit round robin: each key earns `quantum` cost units per round and
+    spends a job's cost (e.g. its size in bytes) to run it. A key with a
+    deep backlog or very large messages gets its turn like any other, but
+    can't starve the rest.
+    """
+
+    def __init__(self, workers: int, quantum: int = 64 * 1024,
+                 thread_name_prefix: str = 'mailguard-worker'):
+        """
+        Initialize the work queue and start its workers.
+
+        Args:
+            workers: Number of worker threads
+            quantum: Cost units a key earns per round
+            thread_name_prefix: Worker thread name prefix
+        """
+        self.quantum = quantum
+        self._queues: 'OrderedDict[str, Deque[_Job]]' = OrderedDict()
+        self._deficits: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{thread_name_prefix}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key: str, cost: int, fn: Callable, *args) -> Future:
+        """
+        Queue fn(*args) under key.
+
+        Args:
+            key: Fairness key
+            cost: Job cost in the same units as the quantum
+            fn: Callable to run on a worker
+            *args: Arguments for fn
+
+        Returns:
+            Future for the call's result
+        """
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('Work queue is shut down')
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+                self._deficits[key] = self.quantum
+            queue.append(_Job(future, fn, args, max(1, cost)))
+            self._condition.notify()
+        return future
+
+    def backlog(self) -> Dict[str, int]:
+        """Queued jobs per key."""
+        with self._condition:
+            return {key: len(queue) for key, queue in self._queues.items()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers once queued jobs have run."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_job(self) -> _Job:
+        """Pick the next job by deficit round robin (caller holds the lock, queues not empty)."""
+        while True:
+            key, queue = next(iter(self._queues.items()))
+            job = queue[0]
+            if self._deficits[key] >= job.cost:
+                self._deficits[key] -= job.cost
+                queue.popleft()
+                if not queue:
+                    # Idle keys don't bank credit
+                    del self._queues[key]
+                    del self._deficits[key]
+                return job
+            self._deficits[key] += self.quantum
+            self._queues.move_to_end(key)
+
+    def _worker(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queues and not self._shutdown:
+                    self._condition.wait()
+                if not self._queues:
+                    return
+                job = self._next_job()
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                job.future.set_result(job.fn(*job.args))
+            except BaseException as e:
+                job.future.set_exception(e)
@@ -1,22 +1,52 @@
 """SSE notification service."""
 import logging
+import threading
+import time
 
+from ...config import Config
 from ...models import EmailLog
+from ...monitoring import record_cache
 
 logger = logging.getLogger(__name__)
 
 
 class EmailNotifier:
-    """Handles SSE notifications for new emails."""
-    
-    def __init__(self, flask_app=None):
-        pass
-    
+    """Handles SSE notifications for new emails.
+
+    In ``full`` mode every email is pushed as its own ``new_email`` event with
+    the complete record. In ``summary`` mode emails are coalesced into at most
+    one ``email_batch`` event per batch interval, carrying only the new IDs and
+    counter deltas so clients can fetch details on demand.
+    """
+
+    def __init__(self, flask_app=None, mode: str = None, batch_interval_ms: int = None):
+        """Initialize email notifier.
+
+        Args:
+            flask_app: Flask application instance (unused, kept for compatibility)
+            mode: Notification mode (full or summary), defaults to config
+            batch_interval_ms: Minimum interval between batch events in summary mode
+        """
+        self.mode = mode or Config.NOTIFICATION_MODE
+        if batch_interval_ms is None:
+            batch_interval_ms = Config.NOTIFICATION_BATCH_INTERVAL_MS
+        self.batch_interval = max(batch_interval_ms, 0) / 1000.0
+
+        self._pending = []
+        self._condition = threading.Condition()
+        self._flusher = None
+
     def notify_new_email(self, email_log: EmailLog):
         """Notify clients about a new email via SSE."""
         try:
+            if self.mode == 'summary':
+                self._queue_summary(email_log)
+                return
+
             from ...api.routes.events import add_event
-            email_data = email_log.to_dict()
+            email_data = getattr(email_log, '_email_dict', None)
+            record_cache('email_dict', email_data is not None)
+            email_data = email_data or email_log.to_dict()
             add_event({
                 'type': 'new_email',
                 'data': email_data
@@ -24,3 +54,63 @@ class EmailNotifier:
         except Exception as e:
             logger.error(f"Failed to emit SSE event: {e}", exc_info=True)
 
+    @property
+    def pending(self) -> int:
+        """Summaries waiting for the next batch event."""
+        return len(self._pending)
+
+    def _queue_summary(self, email_log: EmailLog):
+        """Queue a compact email summary for the next batch event."""
+        summary = getattr(email_log, '_summary_dict', None)
+        record_cache('email_dict', summary is not None)
+        summary = summary or email_log.to_summary_dict()
+
+        with self._condition:
+            self._pending.append(summary)
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop,
+                    name='sse-batch-flusher',
+                    daemon=True
+                )
+                self._flusher.start()
+            self._condition.notify()
+
+    def _flush_loop(self):
+        """Emit coalesced batch events, at most one per batch interval."""
+        from ...api.routes.events import add_event
+
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+
+            # Let the burst accumulate before taking the batch
+            time.sleep(self.batch_interval)
+
+            with self._condition:
+                batch, self._pending = self._pending, []
+
+            try:
+                add_event({
+                    'type': 'email_batch',
+                    'data': self._build_batch(batch)
+                })
+            except Exception as e:
+                logger.error(f"Failed to emit SSE batch event: {e}", exc_info=True)
+
+    @staticmethod
+    def _build_batch(batch: list) -> dict:
+        """Build a batch payload with new IDs and stats counter deltas."""
+        deltas = {'total': 0, 'flagged': 0, 'blocked': 0, 'quarantined': 0}
+        for summary in batch:
+            deltas['total'] += 1
+            status = summary.get('status')
+            if status in deltas:
+                deltas[status] += 1
+
+        return {
+            'ids': [summary['id'] for summary in batch],
+            'count': len(batch),
+            'deltas': deltas
+        }
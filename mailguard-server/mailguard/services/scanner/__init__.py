@@ -0,0 +1,16 @@
+"""Offline scanning: bulk scans of mbox files, Maildirs and .eml trees, and rescans of stored logs."""
+from .bulk import BulkScanner, Checkpoint, DatabaseWriter, NDJSONWriter, scan_message
+from .rescan import HistoryRescanner, rescan_log
+from .sources import detect_source_type, iter_messages
+
+__all__ = [
+    'BulkScanner',
+    'Checkpoint',
+    'DatabaseWriter',
+    'NDJSONWriter',
+    'scan_message',
+    'HistoryRescanner',
+    'rescan_log',
+    'detect_source_type',
+    'iter_messages'
+]
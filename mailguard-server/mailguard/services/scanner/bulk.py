@@ -0,0 +1,306 @@
+"""Offline bulk scanning of stored mail across a process pool."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict
+from email import message_from_bytes
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from ...config import Config
+from ...engines import ContentExtractor
+from ...models import ParsedMessage
+from ..database import EmailRepository
+from ..storage import iter_decoded_payload
+from .pool import ordered_map, worker_engines
+from .sources import iter_messages
+
+logger = logging.getLogger(__name__)
+
+
+def _scan_item(item: Tuple[str, bytes]) -> dict:
+    source, raw = item
+    return scan_message(raw, source, worker_engines())
+
+
+def scan_message(raw: bytes, source: str, engines: dict) -> dict:
+    """
+    Parse, extract, detect and decide one message.
+
+    The policy action is only decided, never applied: nothing is forwarded,
+    rewritten or quarantined.
+
+    Args:
+        raw: Raw RFC 822 message
+        source: Where the message came from (file path or mbox#index)
+        engines: Engines built by pool.init_worker
+
+    Returns:
+        Scan record (see EmailRepository.save_batch for the stored fields)
+    """
+    start_time = time.perf_counter()
+    options = engines['options']
+    record = {
+        'source': source,
+        # Stable fallback ID, so rescanning a message without one is still deduplicated
+        'message_id': f"<{hashlib.sha1(raw).hexdigest()}@scan>",
+        'sender': 'unknown@unknown.com',
+        'recipients': [],
+        'subject': '(no subject)',
+        'action': None,
+        'rule': None,
+        'detections': [],
+        'attachment_count': 0,
+        'extracted_attachments': 0,
+        'error': None
+    }
+    try:
+        message = message_from_bytes(raw)
+        record['message_id'] = str(message.get('Message-ID') or record['message_id']).strip()
+        record['sender'] = str(message.get('From') or record['sender'])
+        record['subject'] = str(message.get('Subject') or record['subject'])
+        record['recipients'] = [
+            str(r) for header in ('To', 'Cc', 'Bcc') for r in message.get_all(header, [])
+        ]
+
+        parsed = ParsedMessage.parse(message)
+        record['body_text'] = parsed.body_text
+        attachments = parsed.attachments if message.is_multipart() else []
+        record['attachment_count'] = len(attachments)
+
+        extractor = engines['extractor']
+        if extractor:
+            for attachment in attachments:
+                if attachment.filename and not attachment.redactable:
+                    attachment.extracted_text = _extract_attachment_text(extractor, attachment)
+                    record['extracted_attachments'] += 1
+
+        detections = engines['detection'].detect_in_parts(parsed.parts, min_confidence=options['min_confidence'])
+        action, rule = engines['policy'].decide(detections, message, parsed)
+
+        record['action'] = action
+        record['rule'] = rule.name if rule else None
+        record['detections'] = [asdict(d) for d in detections]
+    except Exception as e:
+        logger.error(f"Error scanning {source}: {e}")
+        record['error'] = f"{type(e).__name__}: {e}"
+
+    record['processing_time_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+    return record
+
+
+def _extract_attachment_text(extractor: ContentExtractor, attachment) -> str:
+    """Extract a binary attachment's text through a temporary file."""
+    suffix = f".{attachment.extension}" if attachment.extension else ''
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        for chunk in iter_decoded_payload(attachment.part):
+            tmp.write(chunk)
+        tmp_path = tmp.name
+    try:
+        return extractor.extract_file(tmp_path, max_size_mb=Config.MAX_ATTACHMENT_SIZE_MB,
+                                      max_depth=Config.MAX_ARCHIVE_DEPTH)
+    except Exception as e:
+        logger.error(f"Error processing attachment {attachment.filename}: {e}")
+        return ""
+    finally:
+        os.unlink(tmp_path)
+
+
+class NDJSONWriter:
+    """Writes scan records as one JSON object per line."""
+
+    def __init__(self, path: Path, offset: int = 0):
+        """
+        Open the report, truncating it to `offset` bytes (0 starts a new report).
+
+        Args:
+            path: Report file
+            offset: Byte offset recorded by the last checkpoint
+        """
+        self.path = Path(path)
+        mode = 'r+b' if offset and self.path.exists() else 'wb'
+        self._file = open(self.path, mode)
+        self._file.truncate(offset if mode == 'r+b' else 0)
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, record: dict) -> None:
+        # Body text is only kept in the database
+        line = {k: v for k, v in record.items() if k != 'body_text'}
+        self._file.write(json.dumps(line, default=str).encode() + b'\n')
+
+    def flush(self) -> dict:
+        """Flush to disk; returns the checkpoint state needed to resume."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return {'output_offset': self._file.tell()}
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class DatabaseWriter:
+    """Buffers scan records and bulk inserts them as EmailLog rows."""
+
+    def __init__(self, repository: EmailRepository):
+        self.repository = repository
+        self._pending = []
+
+    def write(self, record: dict) -> None:
+        self._pending.append(record)
+
+    def flush(self) -> dict:
+        """Insert the buffered records; returns how many were already stored."""
+        _, duplicates = self.repository.save_batch(self._pending)
+        self._pending = []
+        return {'duplicates': duplicates}
+
+    def close(self) -> None:
+        pass
+
+
+class Checkpoint:
+    """Scan progress persisted as JSON, replaced atomically on every save."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def load(self, source: str) -> Optional[dict]:
+        """
+        Saved progress of a scan of `source`.
+
+        Returns:
+            Checkpoint state, or None if there is no checkpoint
+
+        Raises:
+            ValueError: If the checkpoint belongs to a scan of another source
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get('source') != str(source):
+            raise ValueError(f"Checkpoint {self.path} is for {state.get('source')}, not {source}")
+        return state
+
+    def save(self, state: dict) -> None:
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class BulkScanner:
+    """
+    Scans a message store offline with the proxy's extraction, detection and policy.
+
+    Messages are streamed from the source and scanned on a process pool
+    (each worker builds its own engines once); results come back in source
+    order and are written in batches. After each batch the checkpoint records
+    how many source messages are done, so an interrupted scan resumes from
+    the last completed batch.
+    """
+
+    def __init__(self, writer, checkpoint: Checkpoint, workers: int = 0, batch_size: int = 500,
+                 extract: bool = True, use_presidio: bool = None, min_confidence: float = None):
+        """
+        Initialize bulk scanner.
+
+        Args:
+            writer: NDJSONWriter or DatabaseWriter
+            checkpoint: Progress checkpoint
+            workers: Worker processes (0 = one per CPU)
+            batch_size: Records written per batch (and per checkpoint)
+            extract: Extract text from binary attachments with Tika
+            use_presidio: Use Presidio (default: Config.USE_PRESIDIO)
+            min_confidence: Detection threshold (default: Config.MIN_CONFIDENCE)
+        """
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.options = {
+            'use_presidio': Config.USE_PRESIDIO if use_presidio is None else use_presidio,
+            'min_confidence': Config.MIN_CONFIDENCE if min_confidence is None else min_confidence,
+            'extract': extract,
+            'tika_server_url': Config.TIKA_SERVER_URL,
+            'text_cache_dir': Config.TEXT_CACHE_DIR,
+            'default_policy': Config.DEFAULT_POLICY,
+            'quarantine_dir': str(Config.QUARANTINE_DIR),
+            'rules_file': Config.POLICY_RULES_FILE,
+            'log_level': logging.getLogger().level
+        }
+
+    def scan(self, source: Path, resume_state: Optional[dict] = None) -> dict:
+        """
+        Scan every message in a source.
+
+        Args:
+            source: mbox file, Maildir, .eml directory or .eml file
+            resume_state: Checkpoint state of an interrupted scan of the same source
+
+        Returns:
+            Scan statistics
+        """
+        source = Path(source).resolve()
+        stats = dict(resume_state['stats']) if resume_state else _new_stats()
+        stats['actions'] = Counter(stats['actions'])
+        skip = resume_state['processed'] if resume_state else 0
+        if skip:
+            logger.info(f"Resuming {source} after {skip} message(s)")
+
+        messages = islice(iter_messages(source), skip, None)
+        processed = skip
+        start = time.monotonic()
+        scanned_before = stats['scanned']
+
+        results = ordered_map(_scan_item, messages, self.workers, self.options)
+        for count, record in enumerate(results, 1):
+            self.writer.write(record)
+            _count(stats, record)
+            processed += 1
+            if count % self.batch_size == 0:
+                self._save_checkpoint(source, processed, stats)
+                rate = (stats['scanned'] - scanned_before) / max(time.monotonic() - start, 1e-9)
+                logger.info(f"Scanned {processed} message(s), {stats['flagged']} flagged ({rate:.1f} msg/s)")
+
+        self._save_checkpoint(source, processed, stats)
+        self.writer.close()
+
+        elapsed = time.monotonic() - start
+        stats['elapsed_seconds'] = round(elapsed, 2)
+        stats['messages_per_second'] = round((stats['scanned'] - scanned_before) / elapsed, 2) if elapsed else None
+        stats['actions'] = dict(stats['actions'])
+        return stats
+
+    def _save_checkpoint(self, source: Path, processed: int, stats: dict) -> None:
+        state = self.writer.flush()
+        stats['duplicates'] += state.pop('duplicates', 0)
+        self.checkpoint.save({
+            'source': str(source),
+            'processed': processed,
+            'stats': dict(stats, actions=dict(stats['actions'])),
+            **state
+        })
+
+
+def _new_stats() -> Dict[str, object]:
+    return {'scanned': 0, 'flagged': 0, 'detections': 0, 'errors': 0, 'duplicates': 0, 'actions': {}}
+
+
+def _count(stats: dict, record: dict) -> None:
+    stats['scanned'] += 1
+    if record['error']:
+        stats['errors'] += 1
+        return
+    stats['actions'][record['action']] += 1
+    if record['detections']:
+        stats['flagged'] += 1
+        stats['detections'] += len(record['detections'])
@@ -0,0 +1,110 @@
+"""Worker process pool shared by the offline scanners."""
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from ...config import Config
+from ...engines import ContentExtractor, DetectionEngine, PolicyEngine
+from ...engines.policy.rate_limit import TokenBuckets
+from ..storage import ExtractedTextCache
+
+logger = logging.getLogger(__name__)
+
+# Items in flight per worker process; bounds memory while keeping workers busy
+IN_FLIGHT_PER_WORKER = 4
+
+# Engines of the current worker process, built once by init_worker
+_engines: Optional[dict] = None
+
+
+def init_worker(options: dict) -> None:
+    """Build the engines once per worker process."""
+    global _engines
+    logging.getLogger().setLevel(options.get('log_level', logging.WARNING))
+    if options.get('nice'):
+        os.nice(options['nice'])
+
+    text_cache = None
+    if options.get('text_cache_dir'):
+        text_cache = ExtractedTextCache(options['text_cache_dir'], Config.TEXT_CACHE_MAX_AGE_DAYS,
+                                        Config.TEXT_CACHE_MAX_MB * 1024 * 1024)
+    _engines = {
+        'detection': DetectionEngine(
+            use_presidio=options['use_presidio'],
+            entities=Config.PRESIDIO_ENTITIES,
+            spacy_model=Config.SPACY_MODEL,
+            disabled_components=Config.SPACY_DISABLED_COMPONENTS,
+            edm_index_file=Config.EDM_INDEX_FILE or None,
+            edm_key_file=Config.EDM_KEY_FILE or None,
+            keyword_file=Config.KEYWORD_DICTIONARY_FILE or None,
+            detect_secrets=Config.SECRETS_DETECTION,
+            fingerprint_registry_dir=Config.FINGERPRINT_REGISTRY_DIR or None,
+            fingerprint_threshold=Config.FINGERPRINT_THRESHOLD
+        ),
+        'extractor': ContentExtractor(options['tika_server_url'], text_cache) if options['extract'] else None,
+        'text_cache': text_cache,
+        'policy': PolicyEngine(
+            default_policy=options['default_policy'],
+            quarantine_dir=Path(options['quarantine_dir']),
+            rules_file=options['rules_file'] or None
+        ),
+        'options': options
+    }
+
+
+def worker_engines() -> dict:
+    """Engines of the current worker process."""
+    return _engines
+
+
+def ordered_map(func: Callable, items: Iterable, workers: int, options: dict,
+                max_rate: float = 0) -> Iterator:
+    """
+    Apply func to items on a process pool, yielding results in item order.
+
+    Only a few items per worker are in flight at a time, so items can be
+    streamed from a source of any size. With workers=1 everything runs in
+    this process.
+
+    Args:
+        func: Module-level function of one item (workers call it after init_worker)
+        items: Items to process
+        workers: Worker processes
+        options: Engine options passed to init_worker
+        max_rate: Maximum items started per second (0 = unlimited)
+
+    Yields:
+        func(item) for each item, in order
+    """
+    bucket = TokenBuckets(max_rate, max(1.0, max_rate)) if max_rate > 0 else None
+
+    def throttled(source: Iterable) -> Iterator:
+        for item in source:
+            if bucket:
+                now = time.monotonic()
+                missing = 1 - bucket.available('', now)
+                if missing > 0:
+                    time.sleep(missing / max_rate)
+                    now = time.monotonic()
+                bucket.consume('', now)
+            yield item
+
+    if workers == 1:
+        init_worker(options)
+        for item in throttled(items):
+            yield func(item)
+        return
+
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(options,)) as pool:
+        pending = deque()
+        limit = workers * IN_FLIGHT_PER_WORKER
+        for item in throttled(items):
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= limit:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
@@ -0,0 +1,369 @@
+"""Rescan of stored email logs with the current detectors and policy."""
+import logging
+import mimetypes
+import os
+import time
+from collections import Counter
+from dataclasses import asdict
+from datetime import datetime
+from email.message import Message
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import selectinload
+
+from ...config import Config
+from ...engines.policy import PolicyContext
+from ...models import DetectionResult, EmailLog, MessagePart, db
+from ...models.parsed_message import ATTACHMENT, BODY, REDACTABLE_EXTENSIONS
+from ..database import EmailRepository
+from ..database.repository import MAX_BODY_CHARS
+from .bulk import Checkpoint, NDJSONWriter
+from .pool import ordered_map, worker_engines
+
+logger = logging.getLogger(__name__)
+
+
+def _rescan_item(item: dict) -> dict:
+    return rescan_log(item, worker_engines())
+
+
+def rescan_log(item: dict, engines: dict) -> dict:
+    """
+    Run detection and policy over one stored email log.
+
+    Only what was stored can be rescanned: the plain text body (as truncated
+    when saved) and the saved attachments. Binary attachments use the
+    extracted text cache and are only sent to Tika on a cache miss when
+    extraction is enabled.
+    
+    A result is incomplete when part of the message can't be rescanned (body
+    truncated, attachments not stored, missing, not extracted or failing
+    extraction), or a stored detection that isn't found again isn't at its
+    position in any text rescanned either, i.e. it was found in a part that
+    wasn't stored (such as a text/html body). A stored
+    detection it doesn't find again may still be there, so an incomplete
+    result never reports removals, and the policy is decided as if those
+    detections were still found.
+
+    Args:
+        item: Stored log fields (see HistoryRescanner._iter_logs)
+        engines: Engines built by pool.init_worker
+
+    Returns:
+        Rescan result, with the detections added and removed since the log was
+        saved; 'changed' is set if either those or the action differ, and
+        'incomplete' if part of the message could not be rescanned
+    """
+    options = engines['options']
+    result = {
+        'id': item['id'],
+        'message_id': item['message_id'],
+        'old_action': item['policy_applied'],
+        'was_flagged': bool(item['detections']),
+        'new_action': None,
+        'rule': None,
+        'detections': [],
+        'added': [],
+        'removed': [],
+        'changed': False,
+        'missing_attachments': 0,
+        'uncached_attachments': 0,
+        'failed_attachments': 0,
+        'unscanned_detections': 0,
+        'body_truncated': len(item['body_text'] or '') >= MAX_BODY_CHARS,
+        # Attachments the log has no stored copy of (e.g. logs saved by scan.py --db)
+        'unstored_attachments': max(0, (item['attachment_count'] or 0) - len(item['attachments'])),
+        'incomplete': False,
+        'error': None
+    }
+    try:
+        # Parts carry the text directly; as in the proxy, attachments are also compared with registered documents
+        parts = [MessagePart(0, BODY, Message(), 'text/plain', extracted_text=item['body_text'] or '')]
+        attachment_types = set()
+        for filename, file_path in item['attachments']:
+            extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+            content_type = mimetypes.guess_type(filename)[0]
+            attachment_types.update(t for t in (extension, content_type) if t)
+
+            if not file_path or not os.path.exists(file_path):
+                result['missing_attachments'] += 1
+                continue
+            failures = []
+            text = _attachment_text(file_path, extension, content_type, engines, failures)
+            if failures:
+                result['failed_attachments'] += 1
+            elif text is None:
+                result['uncached_attachments'] += 1
+            elif text:
+                parts.append(MessagePart(len(parts), ATTACHMENT, Message(), content_type or '',
+                                         filename=filename, extracted_text=text))
+
+        detections = engines['detection'].detect_in_parts(parts, options['min_confidence'])
+        result['detections'] = [asdict(d) for d in detections]
+        result['added'], result['removed'] = _diff(item['detections'], result['detections'])
+        removed_keys = {(d['pattern_type'], d['matched_text']) for d in result['removed']}
+        texts = [part.scan_text for part in parts]
+        result['unscanned_detections'] = sum(
+            1 for d in item['detections'] or []
+            if (d['pattern_type'], d['matched_text']) in removed_keys and not _located(d, texts)
+        )
+
+        result['incomplete'] = bool(result['body_truncated'] or result['unstored_attachments']
+                                    or result['missing_attachments'] or result['uncached_attachments']
+                                    or result['failed_attachments'] or result['unscanned_detections'])
+        if result['incomplete']:
+            # Not found again in what is left of the message is not the same as gone
+            unverified = {(d['pattern_type'], d['matched_text']) for d in result['removed']}
+            detections = detections + [_stored_detection(d) for d in item['detections'] or []
+                                       if (d['pattern_type'], d['matched_text']) in unverified]
+            result['removed'] = []
+
+        context = PolicyContext.from_addresses(detections, item['sender'], item['recipients'], attachment_types)
+        action, rule = engines['policy'].decide_context(context)
+
+        result['new_action'] = action
+        result['rule'] = rule.name if rule else None
+        result['changed'] = bool(result['added'] or result['removed']) or action != item['policy_applied']
+    except Exception as e:
+        logger.error(f"Error rescanning email log {item['id']}: {e}")
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _attachment_text(file_path: str, extension: str, content_type: Optional[str],
+                     engines: dict, failures: List[str]) -> Optional[str]:
+    """
+    Text of a stored attachment, or None if it is not cached and extraction is off.
+    
+    What could not be extracted (e.g. Tika unreachable) is appended to failures;
+    the text returned then misses it.
+    """
+    if extension in REDACTABLE_EXTENSIONS or (content_type or '').startswith('text/'):
+        # Stored decoded, so this is the text the proxy scanned
+        return Path(file_path).read_bytes().decode('utf-8', errors='replace')
+    if engines['extractor']:
+        return engines['extractor'].extract_file(file_path, max_size_mb=Config.MAX_ATTACHMENT_SIZE_MB,
+                                                 max_depth=Config.MAX_ARCHIVE_DEPTH, failures=failures)
+    text_cache = engines['text_cache']
+    return text_cache.get(text_cache.key(file_path)) if text_cache else None
+
+
+def _located(data: dict, texts: List[str]) -> bool:
+    """Whether a stored detection is at its position in one of texts (whole-text matches cover it)."""
+    position = data.get('position')
+    if not position:
+        return False
+    start, end = position
+    return any(text[start:end] == data['matched_text'] or (start == 0 and end == len(text) and text)
+               for text in texts)
+
+
+def _stored_detection(data: dict) -> DetectionResult:
+    """DetectionResult from a stored detection dict."""
+    return DetectionResult(
+        pattern_type=data['pattern_type'],
+        matched_text=data['matched_text'],
+        confidence=data.get('confidence', 1.0),
+        position=tuple(data.get('position') or (0, 0))
+    )
+
+
+def _diff(old: Optional[List[dict]], new: List[dict]) -> tuple:
+    """
+    Distinct (pattern type, matched text) pairs only found now, and only found before.
+
+    Pairs are compared as sets: the same value found in more or fewer parts
+    (e.g. in the HTML alternative, which is not stored) is not a change.
+    """
+    old_keys = {(d['pattern_type'], d['matched_text']) for d in old or []}
+    new_keys = {(d['pattern_type'], d['matched_text']) for d in new}
+    added = [{'pattern_type': t, 'matched_text': m} for t, m in sorted(new_keys - old_keys)]
+    removed = [{'pattern_type': t, 'matched_text': m} for t, m in sorted(old_keys - new_keys)]
+    return added, removed
+
+
+class HistoryRescanner:
+    """
+    Rescans stored email logs after a detector or policy change.
+
+    Logs are read in id order in chunks (keyset pagination, so each query is
+    a short indexed read and never an OFFSET scan) and scanned on a process
+    pool. Logs whose detections or action would now differ are written to an
+    NDJSON diff report, and/or their new detections are stored back (never
+    for incomplete results, see rescan_log). The status and policy_applied
+    columns record what happened at the time and are left alone. The checkpoint records the last log id done after every
+    chunk.
+
+    To leave room for live traffic, workers run at a lower CPU priority
+    (nice), and max_rate caps how many logs are started per second.
+    """
+
+    def __init__(self, checkpoint: Checkpoint, report: Optional[NDJSONWriter] = None,
+                 repository: Optional[EmailRepository] = None, workers: int = 0,
+                 chunk_size: int = 500, max_rate: float = 0, nice: int = 10,
+                 extract: bool = True, since: Optional[datetime] = None,
+                 use_presidio: bool = None, min_confidence: float = None):
+        """
+        Initialize rescanner.
+
+        Args:
+            checkpoint: Progress checkpoint
+            report: Optional diff report of changed logs
+            repository: Store new detections through this repository (None = report only)
+            workers: Worker processes (0 = half the CPUs)
+            chunk_size: Logs read per query (and per checkpoint)
+            max_rate: Maximum logs started per second (0 = unlimited)
+            nice: CPU niceness added to the workers
+            extract: Send uncached binary attachments to Tika
+            since: Only rescan logs received at or after this time
+            use_presidio: Use Presidio (default: Config.USE_PRESIDIO)
+            min_confidence: Detection threshold (default: Config.MIN_CONFIDENCE)
+        """
+        self.checkpoint = checkpoint
+        self.report = report
+        self.repository = repository
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.chunk_size = chunk_size
+        self.max_rate = max_rate
+        self.since = since
+        self.options = {
+            'use_presidio': Config.USE_PRESIDIO if use_presidio is None else use_presidio,
+            'min_confidence': Config.MIN_CONFIDENCE if min_confidence is None else min_confidence,
+            'extract': extract,
+            'tika_server_url': Config.TIKA_SERVER_URL,
+            'text_cache_dir': Config.TEXT_CACHE_DIR,
+            'default_policy': Config.DEFAULT_POLICY,
+            'quarantine_dir': str(Config.QUARANTINE_DIR),
+            'rules_file': Config.POLICY_RULES_FILE,
+            'log_level': logging.getLogger().level,
+            'nice': nice
+        }
+
+    @property
+    def source(self) -> str:
+        """What is being rescanned, for matching checkpoints."""
+        return f"email_logs since {self.since.isoformat()}" if self.since else 'email_logs'
+
+    def rescan(self, resume_state: Optional[dict] = None) -> dict:
+        """
+        Rescan every stored log (must run inside a Flask app context).
+
+        Args:
+            resume_state: Checkpoint state of an interrupted rescan
+
+        Returns:
+            Rescan statistics
+        """
+        stats = {**_new_stats(), **resume_state['stats']} if resume_state else _new_stats()
+        stats['action_changes'] = Counter(stats['action_changes'])
+        last_id = resume_state['last_id'] if resume_state else 0
+        if last_id:
+            logger.info(f"Resuming rescan after email log {last_id}")
+
+        start = time.monotonic()
+        scanned_before = stats['scanned']
+        updates = []
+
+        results = ordered_map(_rescan_item, self._iter_logs(last_id), self.workers, self.options,
+                              self.max_rate)
+        for count, result in enumerate(results, 1):
+            _count(stats, result)
+            if result['changed'] and not result['error']:
+                if self.report:
+                    self.report.write({k: v for k, v in result.items() if k not in ('detections', 'changed')})
+                if self.repository and not result['incomplete'] and (result['added'] or result['removed']):
+                    updates.append({'id': result['id'], 'detections': result['detections']})
+            last_id = result['id']
+            if count % self.chunk_size == 0:
+                self._save_checkpoint(last_id, stats, updates)
+                updates = []
+                rate = (stats['scanned'] - scanned_before) / max(time.monotonic() - start, 1e-9)
+                logger.info(f"Rescanned {stats['scanned']} log(s), {stats['changed']} changed ({rate:.1f}/s)")
+
+        self._save_checkpoint(last_id, stats, updates)
+        if self.report:
+            self.report.close()
+
+        elapsed = time.monotonic() - start
+        stats['elapsed_seconds'] = round(elapsed, 2)
+        stats['logs_per_second'] = round((stats['scanned'] - scanned_before) / elapsed, 2) if elapsed else None
+        stats['action_changes'] = dict(stats['action_changes'])
+        return stats
+
+    def _iter_logs(self, after_id: int) -> Iterator[dict]:
+        """Stored logs after an id, as plain dicts, one short query per chunk."""
+        while True:
+            query = (db.session.query(EmailLog)
+                     .options(selectinload(EmailLog.recipients), selectinload(EmailLog.attachments))
+                     .filter(EmailLog.id > after_id, EmailLog.status != 'error'))
+            if self.since:
+                query = query.filter(EmailLog.timestamp >= self.since)
+            logs = query.order_by(EmailLog.id).limit(self.chunk_size).all()
+
+            items = [{
+                'id': log.id,
+                'message_id': log.message_id,
+                'sender': log.sender,
+                'recipients': [r.email_address for r in log.recipients],
+                'body_text': log.body_text,
+                'attachments': [(a.filename, a.file_path) for a in log.attachments],
+                'attachment_count': log.attachment_count,
+                'detections': log.detection_results,
+                'policy_applied': log.policy_applied
+            } for log in logs]
+            # End the read transaction before scanning, so writers are never held up by it
+            db.session.remove()
+
+            if not items:
+                return
+            yield from items
+            after_id = items[-1]['id']
+
+    def _save_checkpoint(self, last_id: int, stats: dict, updates: List[dict]) -> None:
+        state = {}
+        if self.repository:
+            self.repository.update_detections(updates)
+        if self.report:
+            state = self.report.flush()
+        self.checkpoint.save({
+            'source': self.source,
+            'last_id': last_id,
+            'stats': dict(stats, action_changes=dict(stats['action_changes'])),
+            **state
+        })
+
+
+def _new_stats() -> Dict[str, object]:
+    return {
+        'scanned': 0, 'changed': 0, 'newly_flagged': 0, 'no_longer_flagged': 0,
+        'detections_added': 0, 'detections_removed': 0, 'missing_attachments': 0,
+        'uncached_attachments': 0, 'failed_attachments': 0, 'unstored_attachments': 0,
+        'incomplete': 0, 'errors': 0,
+        'action_changes': {}
+    }
+
+
+def _count(stats: dict, result: dict) -> None:
+    stats['scanned'] += 1
+    if result['error']:
+        stats['errors'] += 1
+        return
+    stats['missing_attachments'] += result['missing_attachments']
+    stats['uncached_attachments'] += result['uncached_attachments']
+    stats['failed_attachments'] += result['failed_attachments']
+    stats['unstored_attachments'] += result['unstored_attachments']
+    stats['incomplete'] += result['incomplete']
+    if result['old_action'] != result['new_action']:
+        stats['action_changes'][f"{result['old_action']} -> {result['new_action']}"] += 1
+    if not result['changed']:
+        return
+    stats['changed'] += 1
+    stats['detections_added'] += len(result['added'])
+    stats['detections_removed'] += len(result['removed'])
+    # Stored detections an incomplete rescan doesn't find again may still be there
+    flagged = bool(result['detections']) or (result['incomplete'] and result['was_flagged'])
+    if flagged and not result['was_flagged']:
+        stats['newly_flagged'] += 1
+    elif result['was_flagged'] and not flagged:
+        stats['no_longer_flagged'] += 1
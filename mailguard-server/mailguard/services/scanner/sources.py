@@ -0,0 +1,90 @@
+"""Streaming message sources for offline scans: mbox files, Maildirs and .eml trees."""
+import os
+from pathlib import Path
+from typing import Iterator, Tuple
+
+MBOX_SEPARATOR = b'From '
+
+
+def detect_source_type(path: Path) -> str:
+    """
+    Work out what kind of message store a path is.
+
+    Returns:
+        'maildir', 'eml_dir', 'mbox' or 'eml'
+    """
+    path = Path(path)
+    if path.is_dir():
+        if (path / 'cur').is_dir() and (path / 'new').is_dir():
+            return 'maildir'
+        return 'eml_dir'
+    if not path.is_file():
+        raise FileNotFoundError(f"No such message source: {path}")
+    with open(path, 'rb') as f:
+        head = f.read(len(MBOX_SEPARATOR))
+    return 'mbox' if head == MBOX_SEPARATOR else 'eml'
+
+
+def iter_messages(path: Path) -> Iterator[Tuple[str, bytes]]:
+    """
+    Stream raw messages from a message store, one at a time.
+
+    Messages are yielded in a stable order (sorted file names, mbox order),
+    so a scan can be resumed by skipping the messages already processed.
+
+    Args:
+        path: mbox file, Maildir, directory of .eml files (searched recursively) or a single .eml
+
+    Yields:
+        Tuples of (source reference, raw message bytes)
+    """
+    path = Path(path)
+    source_type = detect_source_type(path)
+    if source_type == 'mbox':
+        yield from iter_mbox(path)
+    elif source_type == 'maildir':
+        for subdir in ('cur', 'new'):
+            for name in sorted(os.listdir(path / subdir)):
+                file_path = path / subdir / name
+                if not name.startswith('.') and file_path.is_file():
+                    yield str(file_path), file_path.read_bytes()
+    elif source_type == 'eml_dir':
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith('.eml'):
+                    file_path = Path(root) / name
+                    yield str(file_path), file_path.read_bytes()
+    else:
+        yield str(path), path.read_bytes()
+
+
+def iter_mbox(path: Path) -> Iterator[Tuple[str, bytes]]:
+    """
+    Stream messages from an mbox file without loading or indexing the whole file.
+
+    Yields:
+        Tuples of ('<path>#<index>', raw message bytes without the From_ line)
+    """
+    index = 0
+    lines = None
+    previous_blank = True
+    with open(path, 'rb') as f:
+        for line in f:
+            if previous_blank and line.startswith(MBOX_SEPARATOR):
+                if lines is not None:
+                    yield f"{path}#{index}", _mbox_message(lines)
+                    index += 1
+                lines = []
+            elif lines is not None:
+                lines.append(line)
+            previous_blank = line in (b'\n', b'\r\n')
+    if lines is not None:
+        yield f"{path}#{index}", _mbox_message(lines)
+
+
+def _mbox_message(lines: list) -> bytes:
+    """Join a message's mbox lines, dropping the separating blank line and >From quoting."""
+    if lines and lines[-1] in (b'\n', b'\r\n'):
+        lines.pop()
+    return b''.join(line[1:] if line.startswith(b'>From ') else line for line in lines)
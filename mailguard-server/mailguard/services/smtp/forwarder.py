@@ -3,8 +3,11 @@ import logging
 import smtplib
 from email.message import EmailMessage
 from email.utils import parseaddr
+from typing import List, Optional, Union
 
 from ...config import Config
+from ...models import MessageOverlay
+from ...monitoring import traced
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +18,19 @@ class SMTPForwarder:
     def __init__(self):
         pass
     
-    def forward(self, message: EmailMessage) -> bool:
+    @traced('forward')
+    def forward(self, message: Union[EmailMessage, MessageOverlay],
+                envelope_recipients: Optional[List[str]] = None) -> bool:
         """
         Forward message to upstream SMTP server.
         
+        The message is serialized straight onto the SMTP connection, so tagged
+        or sanitized overlays are never materialized as a full copy.
+        
         Args:
-            message: Email message to forward
+            message: Email message (or overlay of one) to forward
+            envelope_recipients: Addresses to deliver to, as accepted at RCPT TO
+                (default: the To/Cc headers)
             
         Returns:
             True if successful, False otherwise
@@ -30,6 +40,9 @@ class SMTPForwarder:
             return True
         
         try:
+            if not isinstance(message, MessageOverlay):
+                message = MessageOverlay(message)
+            
             if 'Bcc' in message:
                 del message['Bcc']
             
@@ -37,20 +50,23 @@ class SMTPForwarder:
             if not sender:
                 sender = "no-reply@proxy"
             
-            recipients = []
-            for header in ['To', 'Cc']:
-                addrs = message.get_all(header, [])
-                for addr in addrs:
-                    _, email_addr = parseaddr(addr)
-                    if email_addr:
-                        recipients.append(email_addr)
+            if envelope_recipients is not None:
+                recipients = [addr for addr in envelope_recipients if addr]
+            else:
+                recipients = []
+                for header in ['To', 'Cc']:
+                    addrs = message.get_all(header, [])
+                    for addr in addrs:
+                        _, email_addr = parseaddr(addr)
+                        if email_addr:
+                            recipients.append(email_addr)
             
             if not recipients:
                 logger.warning("No recipients found, skipping forward")
                 return False
             
             with smtplib.SMTP(Config.UPSTREAM_SMTP_HOST, Config.UPSTREAM_SMTP_PORT) as server:
-                server.sendmail(sender, recipients, message.as_string())
+                self._send_streaming(server, sender, recipients, message)
                 logger.info(f"Message forwarded to {len(recipients)} recipient(s)")
                 return True
                 
@@ -58,3 +74,74 @@ class SMTPForwarder:
             logger.warning(f"SMTP forward failed (this is OK for testing): {e}")
             return False
 
+    def _send_streaming(self, server: smtplib.SMTP, sender: str, recipients: List[str],
+                        message: MessageOverlay):
+        """Run the MAIL/RCPT/DATA transaction, writing the message body as it is generated."""
+        server.ehlo_or_helo_if_needed()
+
+        code, resp = server.mail(sender)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, sender)
+
+        refused = {}
+        for recipient in recipients:
+            code, resp = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, resp)
+        if len(refused) == len(recipients):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = server.docmd('DATA')
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+        stream = _DataStream(server.sock)
+        message.write_to(stream, linesep='\r\n')
+        stream.finish()
+
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        if refused:
+            logger.warning(f"Upstream refused {len(refused)} recipient(s): {', '.join(refused)}")
+
+
+class _DataStream:
+    """Buffered writer for the SMTP DATA phase that dot-stuffs lines on the fly."""
+
+    def __init__(self, sock, buffer_size: int = 64 * 1024):
+        self._sock = sock
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._at_line_start = True
+
+    def write(self, data: bytes) -> int:
+        # Lines starting with "." must be escaped (RFC 5321 section 4.5.2)
+        if b'.' in data:
+            lines = data.split(b'\n')
+            for i, line in enumerate(lines):
+                if line.startswith(b'.') and (i > 0 or self._at_line_start):
+                    lines[i] = b'.' + line
+            data = b'\n'.join(lines)
+        if data:
+            self._at_line_start = data.endswith(b'\n')
+
+        self._buffer += data
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._sock.sendall(self._buffer)
+            self._buffer.clear()
+
+    def finish(self):
+        """Terminate the DATA phase."""
+        if not self._at_line_start:
+            self._buffer += b'\r\n'
+        self._buffer += b'.\r\n'
+        self.flush()
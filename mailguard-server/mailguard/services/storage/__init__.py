@@ -1,6 +1,7 @@
 """Storage services."""
-from .attachment import AttachmentStorage
+from .attachment import AttachmentStorage, iter_decoded_payload
 from .quarantine import QuarantineStorage
+from .text_cache import ExtractedTextCache
 
-__all__ = ['AttachmentStorage', 'QuarantineStorage']
+__all__ = ['AttachmentStorage', 'QuarantineStorage', 'ExtractedTextCache', 'iter_decoded_payload']
 
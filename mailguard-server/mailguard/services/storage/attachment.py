@@ -1,13 +1,20 @@
 """Attachment storage service."""
+import binascii
 import logging
+import os
+import re
 from datetime import datetime
+from email.message import Message
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 from ...config import Config
 
 logger = logging.getLogger(__name__)
 
+DECODE_CHUNK_SIZE = 1024 * 1024  # Encoded characters decoded per step
+_NON_BASE64 = re.compile(r'[^A-Za-z0-9+/=]')
+
 
 class AttachmentStorage:
     """Handles saving email attachments to disk."""
@@ -28,15 +35,72 @@ class AttachmentStorage:
         Returns:
             File path if successful, None otherwise
         """
+        return self.save_stream(filename, [payload])
+    
+    def save_stream(self, filename: str, chunks: Iterable[bytes]) -> Optional[str]:
+        """
+        Save attachment content to disk chunk by chunk and return file path.
+        
+        Args:
+            filename: Original filename
+            chunks: Iterable of content chunks
+            
+        Returns:
+            File path if successful, None if nothing was written or on error
+        """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         safe_filename = "".join(c for c in filename if c.isalnum() or c in ('-', '_', '.'))[:200]
         attachment_file = self.storage_dir / f"{timestamp}_{safe_filename}"
         
         try:
+            size = 0
             with open(attachment_file, 'wb') as f:
-                f.write(payload)
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            if size == 0:
+                os.unlink(attachment_file)
+                return None
             return str(attachment_file)
         except Exception as e:
             logger.error(f"Error saving attachment {filename}: {e}")
+            if attachment_file.exists():
+                os.unlink(attachment_file)
             return None
 
+
+def iter_decoded_payload(part: Message, chunk_size: int = DECODE_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Decode a part's payload incrementally.
+
+    Base64 payloads are decoded a slice at a time from the encoded string held
+    by the message, so the full decoded payload never exists in memory. Other
+    encodings fall back to get_payload(decode=True).
+
+    Args:
+        part: Message part
+        chunk_size: Encoded characters to decode per step
+
+    Yields:
+        Decoded content chunks
+    """
+    payload = part.get_payload()
+    cte = str(part.get('Content-Transfer-Encoding', '')).strip().lower()
+    if cte != 'base64' or not isinstance(payload, str):
+        decoded = part.get_payload(decode=True)
+        if decoded:
+            yield decoded
+        return
+
+    pending = ''
+    try:
+        for start in range(0, len(payload), chunk_size):
+            piece = pending + _NON_BASE64.sub('', payload[start:start + chunk_size])
+            usable = len(piece) - len(piece) % 4
+            if usable:
+                yield binascii.a2b_base64(piece[:usable])
+            pending = piece[usable:]
+        if pending.rstrip('='):
+            yield binascii.a2b_base64(pending + '=' * (-len(pending) % 4))
+    except binascii.Error as e:
+        logger.warning(f"Malformed base64 payload, attachment may be truncated: {e}")
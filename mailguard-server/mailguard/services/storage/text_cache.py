@@ -0,0 +1,136 @@
+"""Cache of text extracted from attachments, keyed by attachment content."""
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from ...monitoring import record_cache
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Minimum seconds between sweeps for expired entries and the size limit
+PRUNE_INTERVAL = 3600.0
+
+
+class ExtractedTextCache:
+    """
+    Extracted attachment text stored on disk under the SHA-256 of the attachment.
+
+    Keying by content means the same file sent to many people is extracted
+    once, and stored attachments can be rescanned later without Tika.
+
+    The text is the sensitive content itself, so entries are removed once
+    older than max_age_days, and the oldest first beyond max_bytes, by a
+    sweep that runs in the background at most once per PRUNE_INTERVAL.
+    """
+
+    def __init__(self, cache_dir: Path, max_age_days: float = 30, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize cache.
+
+        Args:
+            cache_dir: Directory cached text is stored in
+            max_age_days: Age after which entries are removed (0 = no limit)
+            max_bytes: Total size beyond which the oldest entries are removed (0 = no limit)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self._next_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    @staticmethod
+    def key(file_path: str) -> str:
+        """Cache key (content hash) of a file."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached text for a key, or None on a miss."""
+        try:
+            text = self._path(key).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            text = None
+        except OSError as e:
+            logger.warning(f"Error reading cached text {key}: {e}")
+            text = None
+        record_cache('extracted_text', text is not None)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """Store text for a key (written atomically)."""
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path.write_text(text, encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Error caching extracted text {key}: {e}")
+            if tmp_path.exists():
+                os.unlink(tmp_path)
+        self._maybe_prune()
+
+    def prune(self) -> int:
+        """
+        Remove expired entries, then the oldest ones while over the size limit.
+
+        Returns:
+            Number of entries removed
+        """
+        entries = []
+        for path in self.cache_dir.glob('*/*.txt'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age and now - mtime > self.max_age
+            if not expired and not (self.max_bytes and total > self.max_bytes):
+                break
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Error removing cached text {path.name}: {e}")
+                continue
+            total -= size
+        if removed:
+            logger.info(f"Removed {removed} cached attachment text(s) from {self.cache_dir}")
+        return removed
+
+    def _maybe_prune(self) -> None:
+        if not (self.max_age or self.max_bytes):
+            return
+        now = time.monotonic()
+        if now < self._next_prune or not self._prune_lock.acquire(blocking=False):
+            return
+        self._next_prune = now + PRUNE_INTERVAL
+        threading.Thread(target=self._prune_in_background, name='text-cache-prune', daemon=True).start()
+
+    def _prune_in_background(self) -> None:
+        try:
+            self.prune()
+        except Exception as e:
+            logger.warning(f"Error pruning text cache {self.cache_dir}: {e}")
+        finally:
+            self._prune_lock.release()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
@@ -7,6 +7,7 @@ import time
 from threading import Thread
 
 from mailguard.config import Config
+from mailguard.monitoring import rss_bytes
 from mailguard.proxy import SMTPProxy
 from mailguard.api import create_app, init_db
 
@@ -34,6 +35,7 @@ def run_flask():
 
 def main():
     """Start the proxy and UI."""
+    start = time.monotonic()
     logger.info("Starting MailGuard")
     logger.info(f"Configuration: {Config.DEFAULT_POLICY} policy, Tika: {Config.TIKA_SERVER_URL}")
     
@@ -52,7 +54,9 @@ def main():
     flask_thread.start()
     
     logger.info(f"Flask UI starting on http://{Config.FLASK_HOST}:{Config.FLASK_PORT}")
-    logger.info("MailGuard is running. Press Ctrl+C to stop.")
+    rss = rss_bytes()
+    memory = f", {rss / 2 ** 20:.0f} MB RSS" if rss else ''
+    logger.info(f"MailGuard is running (started in {time.monotonic() - start:.2f}s{memory}). Press Ctrl+C to stop.")
     
     def signal_handler(sig, frame):
         logger.info("Shutting down...")
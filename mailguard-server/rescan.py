@@ -0,0 +1,95 @@
+"""Rescan stored email logs after a detector or policy change."""
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+
+from mailguard.services.scanner import Checkpoint, HistoryRescanner, NDJSONWriter
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Rescan email_logs and report or store what would now be detected."""
+    parser = argparse.ArgumentParser(
+        description='Rescan stored emails with the current detectors and policy',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Which emails from this year would the current rules treat differently?
+  python rescan.py --report changes.ndjson --since 2026-01-01
+
+  # Store the new detections, gently: 2 low-priority workers, at most 20 emails/s
+  python rescan.py --update --workers 2 --max-rate 20
+        """
+    )
+    parser.add_argument('--report', help='Write one JSON line per email whose detections or action changed')
+    parser.add_argument('--update', action='store_true', help='Store the new detections on the email logs')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Only emails received at or after this date')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes (default: half the CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=500,
+                        help='Emails read per query and per checkpoint (default: 500)')
+    parser.add_argument('--max-rate', type=float, default=0, help='Maximum emails per second (default: no limit)')
+    parser.add_argument('--nice', type=int, default=10, help='CPU niceness of the workers (default: 10)')
+    parser.add_argument('--no-extract', action='store_true',
+                        help='Only use cached attachment text, never send attachments to Tika')
+    parser.add_argument('--checkpoint', help='Progress file (default: <report>.checkpoint or rescan.checkpoint)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an earlier run')
+    parser.add_argument('--regex-only', action='store_true', help='Use regex detection instead of Presidio')
+    parser.add_argument('--min-confidence', type=float, help='Detection threshold (default: MIN_CONFIDENCE)')
+    parser.add_argument('--verbose', action='store_true', help='Log progress and errors of every worker')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    if not args.report and not args.update:
+        parser.error('nothing to do: give --report and/or --update')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+
+    from mailguard.api import create_app, init_db
+    from mailguard.services.database import EmailRepository
+
+    init_db()
+    app = create_app()
+    app.app_context().push()
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.report or 'rescan'}.checkpoint")
+    rescanner = HistoryRescanner(
+        checkpoint,
+        repository=EmailRepository(flask_app=app) if args.update else None,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        max_rate=args.max_rate,
+        nice=args.nice,
+        extract=not args.no_extract,
+        since=args.since,
+        use_presidio=False if args.regex_only else None,
+        min_confidence=args.min_confidence
+    )
+
+    try:
+        resume_state = checkpoint.load(rescanner.source) if args.resume else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.resume and resume_state is None:
+        logger.warning(f"No checkpoint at {checkpoint.path}, starting from the beginning")
+
+    if args.report:
+        offset = resume_state.get('output_offset', 0) if resume_state else 0
+        rescanner.report = NDJSONWriter(args.report, offset)
+
+    try:
+        stats = rescanner.rescan(resume_state)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun with --resume to continue from {checkpoint.path}", file=sys.stderr)
+        sys.exit(130)
+
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
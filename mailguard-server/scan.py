@@ -0,0 +1,89 @@
+"""Offline bulk scan of stored mail (mbox, Maildir or .eml trees)."""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from mailguard.services.scanner import BulkScanner, Checkpoint, DatabaseWriter, NDJSONWriter
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Scan a message store and write the results to an NDJSON report or the database."""
+    parser = argparse.ArgumentParser(
+        description='Scan an mbox file, Maildir or directory of .eml files for sensitive data',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Report to NDJSON using every CPU
+  python scan.py /var/mail/archive.mbox --output report.ndjson
+
+  # Store results as email logs, resuming an interrupted run
+  python scan.py ~/Maildir --db --resume
+        """
+    )
+    parser.add_argument('source', help='mbox file, Maildir, directory of .eml files or a single .eml')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help='Write one JSON result per message to this file')
+    target.add_argument('--db', action='store_true', help='Store results in the email_logs table')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='Messages written per batch and checkpoint (default: 500)')
+    parser.add_argument('--checkpoint', help='Progress file (default: <output>.checkpoint or scan.checkpoint)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an earlier run')
+    parser.add_argument('--no-extract', action='store_true', help='Skip Tika extraction of binary attachments')
+    parser.add_argument('--regex-only', action='store_true', help='Use regex detection instead of Presidio')
+    parser.add_argument('--min-confidence', type=float, help='Detection threshold (default: MIN_CONFIDENCE)')
+    parser.add_argument('--verbose', action='store_true', help='Log progress and errors of every worker')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.output or 'scan'}.checkpoint")
+    try:
+        resume_state = checkpoint.load(Path(args.source).resolve()) if args.resume else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.resume and resume_state is None:
+        logger.warning(f"No checkpoint at {checkpoint.path}, starting from the beginning")
+
+    if args.db:
+        from mailguard.api import create_app, init_db
+        from mailguard.services.database import EmailRepository
+
+        init_db()
+        app = create_app()
+        app.app_context().push()
+        writer = DatabaseWriter(EmailRepository(flask_app=app))
+    else:
+        offset = resume_state.get('output_offset', 0) if resume_state else 0
+        writer = NDJSONWriter(args.output, offset)
+
+    scanner = BulkScanner(
+        writer, checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        extract=not args.no_extract,
+        use_presidio=False if args.regex_only else None,
+        min_confidence=args.min_confidence
+    )
+    try:
+        stats = scanner.scan(args.source, resume_state)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun with --resume to continue from {checkpoint.path}", file=sys.stderr)
+        sys.exit(130)
+
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
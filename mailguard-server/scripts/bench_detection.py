@@ -0,0 +1,287 @@
+"""Detection micro-benchmarks with recall/precision tracking.
+
+Times RegexDetector.detect, PresidioDetector.detect and
+DetectionEngine._deduplicate_results on labeled synthetic text of several
+sizes and PII densities, and scores the detections against the planted
+values, so a detector change can be judged on speed and accuracy together.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from argparse import Namespace
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from generate_corpus import PII_TYPES, CorpusGenerator  # noqa: E402 (sibling script)
+
+# Pattern types each detector can report, for recall
+SUPPORTED_TYPES = {
+    'regex': {'credit_card', 'ssn', 'sin'},
+    'presidio': set(PII_TYPES),
+}
+# Types a detector reports with a low confidence (RegexDetector scores emails 0.6),
+# counted for recall only when --min-confidence lets them through
+LOW_CONFIDENCE_TYPES = {
+    'regex': {'email': 0.6},
+}
+DIGIT_TYPES = {'credit_card', 'ssn', 'sin', 'phone'}
+SIZE_UNITS = {'K': 1024, 'M': 1024 * 1024}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper().rstrip('B')
+    if value[-1:] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    for unit, factor in (('M', SIZE_UNITS['M']), ('K', SIZE_UNITS['K'])):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def normalize(pii_type: str, value: str) -> str:
+    if pii_type in DIGIT_TYPES:
+        return ''.join(c for c in value if c.isdigit())
+    return value.lower()
+
+
+def build_fixture(size: int, density: float, seed: int) -> tuple:
+    """Labeled text of about `size` bytes with `density` planted PII values per KB."""
+    args = Namespace(seed=seed, pii_density=density, decoy_density=density / 5 if density else 0.0,
+                     pii_types=list(PII_TYPES))
+    generator = CorpusGenerator(args)
+    labels = {'pii': [], 'decoys': []}
+    text = generator.text(size / 1024, 'body', labels)
+    return text, labels
+
+
+def score(detections: list, labels: dict, supported: set) -> dict:
+    """Recall per planted type and overall precision of the detections."""
+    planted = {(item['type'], normalize(item['type'], item['value'])) for item in labels['pii']}
+
+    found = set()
+    true_positives = 0
+    for detection in detections:
+        key = (detection.pattern_type, normalize(detection.pattern_type, detection.matched_text))
+        if key in planted:
+            true_positives += 1
+            found.add(key)
+
+    recall = {}
+    for pii_type in sorted(supported):
+        keys = [key for key in planted if key[0] == pii_type]
+        if keys:
+            recall[pii_type] = round(sum(1 for key in keys if key in found) / len(keys), 4)
+    total = [key for key in planted if key[0] in supported]
+    return {
+        'planted': len(total),
+        'detections': len(detections),
+        'recall': round(sum(1 for key in total if key in found) / len(total), 4) if total else None,
+        'recall_by_type': recall,
+        'precision': round(true_positives / len(detections), 4) if detections else None,
+    }
+
+
+def time_call(fn, repeat: int, max_seconds: float) -> tuple:
+    """Best wall time of up to `repeat` calls (fewer once max_seconds is spent), and the last result."""
+    best, spent, result = None, 0.0, None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        if spent >= max_seconds:
+            break
+    return best, result
+
+
+def measure_allocations(fn) -> dict:
+    """Peak traced memory and allocated block count for one call (run separately: tracing is slow)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+    return {'peak_kb': round(peak / 1024, 1), 'blocks': blocks}
+
+
+def load_detectors(names: list) -> dict:
+    from mailguard.engines.detection import DetectionEngine
+    from mailguard.engines.detection.detectors import PresidioDetector, RegexDetector
+
+    detectors = {}
+    if 'regex' in names:
+        detectors['regex'] = RegexDetector().detect
+    if 'presidio' in names:
+        presidio = PresidioDetector()
+        if presidio.analyzer:
+            detectors['presidio'] = presidio.detect
+        else:
+            print("! Presidio not available, skipping it")
+    if 'dedup' in names:
+        detectors['dedup'] = DetectionEngine(use_presidio=False)._deduplicate_results
+    return detectors
+
+
+def run(args) -> dict:
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    detectors = load_detectors(args.detectors)
+    regex = None
+    if 'dedup' in detectors:
+        from mailguard.engines.detection.detectors import RegexDetector
+        regex = RegexDetector().detect
+
+    results = []
+    for size in args.sizes:
+        for density in args.densities:
+            text, labels = build_fixture(size, density, args.seed)
+            megabytes = len(text.encode()) / 1024 / 1024
+            for name, detect in detectors.items():
+                if name == 'dedup':
+                    # Every detection twice, shuffled, as when overlapping detectors report the same spans
+                    detections = regex(text, args.min_confidence) * 2
+                    random.Random(args.seed).shuffle(detections)
+                    call = lambda: detect(list(detections))  # noqa: E731
+                else:
+                    call = lambda: detect(text, args.min_confidence)  # noqa: E731
+
+                seconds, output = time_call(call, args.repeat, args.max_seconds)
+                row = {
+                    'detector': name,
+                    'size': format_size(size),
+                    'bytes': len(text.encode()),
+                    'density_per_kb': density,
+                    'seconds': round(seconds, 6),
+                }
+                if name == 'dedup':
+                    # Cost depends on the number of results, not on the text size
+                    row['results'] = len(detections)
+                    row['results_per_second'] = round(len(detections) / seconds) if seconds else None
+                else:
+                    row['mb_per_second'] = round(megabytes / seconds, 3) if seconds else None
+                    supported = SUPPORTED_TYPES[name] | {
+                        pii_type for pii_type, confidence in LOW_CONFIDENCE_TYPES.get(name, {}).items()
+                        if confidence >= args.min_confidence
+                    }
+                    row.update(score(output, labels, supported))
+                if not args.no_allocations:
+                    row['allocations'] = measure_allocations(call)
+                results.append(row)
+                print_row(row)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'sizes': [format_size(size) for size in args.sizes],
+            'densities': args.densities,
+            'seed': args.seed,
+            'min_confidence': args.min_confidence,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+
+def print_row(row: dict):
+    line = f"{row['detector']:<9} {row['size']:>5} density {row['density_per_kb']:<4}"
+    if 'mb_per_second' in row:
+        line += f" {row['mb_per_second'] or 0:>9.2f} MB/s"
+    if 'recall' in row:
+        recall = '-' if row['recall'] is None else f"{row['recall']:.3f}"
+        precision = '-' if row['precision'] is None else f"{row['precision']:.3f}"
+        line += f"  recall {recall}  precision {precision}"
+    if 'results_per_second' in row:
+        line += f" {row['results']:>7} results  {row['results_per_second']} results/s"
+    if 'allocations' in row:
+        line += f"  peak {row['allocations']['peak_kb']} KB"
+    print(line)
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print changes against a baseline; False on a throughput drop beyond tolerance or any recall drop."""
+    previous = {(r['detector'], r['size'], r['density_per_kb']): r for r in baseline['results']}
+    ok = True
+    print(f"\nCompared with baseline from {baseline.get('timestamp', '?')}:")
+    for row in result['results']:
+        old = previous.get((row['detector'], row['size'], row['density_per_kb']))
+        metric = 'results_per_second' if row['detector'] == 'dedup' else 'mb_per_second'
+        if not old or not old.get(metric) or not row.get(metric):
+            continue
+        change = (row[metric] - old[metric]) / old[metric] * 100
+        problems = []
+        if change < -tolerance:
+            problems.append('SLOWER')
+        if row.get('recall') is not None and old.get('recall') is not None and row['recall'] < old['recall']:
+            problems.append(f"RECALL {old['recall']} -> {row['recall']}")
+        ok = ok and not problems
+        print(f"  {row['detector']:<9} {row['size']:>5} density {row['density_per_kb']:<4} "
+              f"{change:+.1f}% {'results/s' if metric == 'results_per_second' else 'MB/s'}  {' '.join(problems)}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark detectors for speed, allocations and recall/precision',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Regex detector and deduplication, 1 KB to 10 MB
+  python scripts/bench_detection.py
+
+  # Include Presidio, save a baseline, compare a later run
+  python scripts/bench_detection.py --detectors regex,presidio,dedup --output baseline.json
+  python scripts/bench_detection.py --detectors regex,presidio,dedup --compare baseline.json
+        """
+    )
+    parser.add_argument('--detectors', type=lambda v: [d.strip() for d in v.split(',') if d.strip()],
+                        default=['regex', 'dedup'], help='Comma-separated: regex, presidio, dedup (default: regex,dedup)')
+    parser.add_argument('--sizes', type=lambda v: [parse_size(s) for s in v.split(',')],
+                        default=[parse_size(s) for s in ('1K', '10K', '100K', '1M', '10M')],
+                        help='Comma-separated text sizes (default: 1K,10K,100K,1M,10M)')
+    parser.add_argument('--densities', type=lambda v: [float(d) for d in v.split(',')], default=[0.0, 0.5, 5.0],
+                        help='Comma-separated planted PII per KB (default: 0,0.5,5)')
+    parser.add_argument('--seed', type=int, default=1, help='Fixture seed (default: 1)')
+    parser.add_argument('--min-confidence', type=float, default=0.7, help='Detector threshold (default: 0.7)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case, best is kept (default: 5)')
+    parser.add_argument('--max-seconds', type=float, default=10,
+                        help='Stop repeating a case once this much time is spent (default: 10)')
+    parser.add_argument('--no-allocations', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--output', help='Write the results JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=10,
+                        help='Allowed throughput drop in percent before --compare fails (default: 10)')
+
+    args = parser.parse_args()
+    unknown = set(args.detectors) - {'regex', 'presidio', 'dedup'}
+    if unknown:
+        parser.error(f"unknown detectors: {', '.join(sorted(unknown))}")
+
+    result = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,413 @@
+"""End-to-end throughput benchmark for the MailGuard proxy.
+
+Starts the proxy in-process with a fake Tika server and a local sink SMTP
+server as the upstream, drives concurrent SMTP clients over a corpus and
+writes the results as JSON so runs can be compared between commits.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import smtplib
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email import message_from_bytes
+from email.message import EmailMessage
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mailbox import mbox
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+PRINTABLE_RUN = re.compile(rb'[\x20-\x7e\t\r\n]{4,}')
+MESSAGE_ID_HEADER = re.compile(rb'^Message-ID:[^\r\n]*', re.IGNORECASE | re.MULTILINE)
+
+SAMPLE_BODIES = [
+    "Hi team,\n\nThe quarterly numbers are attached. Let me know if anything looks off.\n\nThanks,\nAlex",
+    "Please charge card 4532-0151-1283-0366 for the renewal, expiry 04/27.",
+    "Employee onboarding: SIN 046-454-286, start date next Monday.",
+    "Can you confirm the SSN on file is 219-09-9999? Payroll needs it today.",
+    "Meeting notes: roadmap review moved to Thursday, contact jane.doe@example.org for the deck.",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FakeTikaHandler(BaseHTTPRequestHandler):
+    """Answers Tika's /tika endpoint with the printable text of the upload after a fixed delay."""
+    latency = 0.05
+
+    def do_GET(self):
+        self._reply(b'This is Tika Server (fake)')
+
+    def do_PUT(self):
+        body = self._read_body()
+        time.sleep(self.latency)
+        self._reply(b'\n'.join(PRINTABLE_RUN.findall(body)))
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _reply(self, body: bytes):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_tika(port: int, latency_ms: float) -> ThreadingHTTPServer:
+    handler = type('FakeTika', (FakeTikaHandler,), {'latency': latency_ms / 1000})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-tika', daemon=True).start()
+    return server
+
+
+class SinkHandler:
+    """Upstream stand-in that accepts and counts forwarded messages."""
+
+    def __init__(self):
+        self.received = 0
+        self.bytes = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        self.bytes += len(envelope.content)
+        return '250 OK'
+
+
+def builtin_corpus(count: int, seed: int) -> list:
+    """A small mixed corpus: plain and HTML bodies, some with text, PDF and zip attachments."""
+    import io
+    import zipfile
+
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        msg = EmailMessage()
+        msg['From'] = f"user{rng.randrange(50)}@sender{rng.randrange(5)}.example.com"
+        msg['To'] = f"someone{rng.randrange(100)}@external.example.net"
+        msg['Subject'] = f"Benchmark message {i}"
+        body = '\n\n'.join(rng.choice(SAMPLE_BODIES) for _ in range(rng.randint(1, 6)))
+        msg.set_content(body)
+        if rng.random() < 0.3:
+            msg.add_alternative(f"<html><body><p>{body.replace(chr(10), '<br>')}</p></body></html>", subtype='html')
+
+        kind = rng.random()
+        if kind < 0.2:
+            msg.add_attachment(f"name,id\nbob,{rng.choice(['046-454-286', '123-45-6789'])}\n".encode(),
+                               maintype='text', subtype='csv', filename='export.csv')
+        elif kind < 0.4:
+            pdf = b'%PDF-1.4\n' + body.encode() + b'\n' + os.urandom(rng.randint(1, 64) * 1024)
+            msg.add_attachment(pdf, maintype='application', subtype='pdf', filename='report.pdf')
+        elif kind < 0.5:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as archive:
+                archive.writestr('notes.txt', body)
+            msg.add_attachment(buffer.getvalue(), maintype='application', subtype='zip', filename='notes.zip')
+        corpus.append(msg.as_bytes())
+    return corpus
+
+
+def load_corpus(path: Path) -> list:
+    """Load messages from a directory of .eml files or an mbox file."""
+    if path.is_dir():
+        return [p.read_bytes() for p in sorted(path.rglob('*.eml'))]
+    return [message.as_bytes() for message in mbox(str(path))]
+
+
+def prepare(raw: bytes, unique: str) -> bytes:
+    """Give a corpus message a unique Message-ID (they are unique in the log) and CRLF line endings."""
+    message_id = f"Message-ID: <{unique}@benchmark.mailguard.test>".encode()
+    raw, replaced = MESSAGE_ID_HEADER.subn(message_id, raw, count=1)
+    if not replaced:
+        raw = message_id + b'\n' + raw
+    # smtplib only converts line endings for str messages
+    return re.sub(rb'\r?\n', b'\r\n', raw)
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        return 0.0
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def stage_totals(histogram) -> dict:
+    """(sum, count) per stage from the stage latency histogram."""
+    return {key[0]: (state[-2], state[-1]) for key, state in histogram.values().items()}
+
+
+def run_clients(port: int, messages: list, concurrency: int) -> tuple:
+    """Send every message once over `concurrency` persistent connections."""
+    latencies = []
+    failures = {}
+    lock = threading.Lock()
+    next_index = iter(range(len(messages)))
+
+    def client():
+        conn = None
+        while True:
+            with lock:
+                index = next(next_index, None)
+            if index is None:
+                break
+            raw = messages[index]
+            message = message_from_bytes(raw)
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = smtplib.SMTP('127.0.0.1', port, timeout=120)
+                conn.sendmail(message['From'], [message['To'] or 'nobody@example.net'], raw)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except smtplib.SMTPResponseException as e:
+                with lock:
+                    failures[str(e.smtp_code)] = failures.get(str(e.smtp_code), 0) + 1
+                if e.smtp_code == 421:
+                    conn = None
+            except (OSError, smtplib.SMTPException) as e:
+                with lock:
+                    failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+                conn = None
+        if conn is not None:
+            try:
+                conn.quit()
+            except (OSError, smtplib.SMTPException):
+                pass
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return latencies, failures
+
+
+def run_benchmark(args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix='mailguard-bench-'))
+    tika_port, sink_port, proxy_port = free_port(), free_port(), free_port()
+
+    # Config is read at import time, so the environment has to be set first
+    env = {
+        'DATABASE_URL': f"sqlite:///{workdir / 'bench.db'}",
+        'QUARANTINE_DIR': str(workdir / 'quarantine'),
+        'ATTACHMENTS_DIR': str(workdir / 'attachments'),
+        'TIKA_SERVER_URL': f"http://127.0.0.1:{tika_port}",
+        'UPSTREAM_SMTP_HOST': '127.0.0.1',
+        'UPSTREAM_SMTP_PORT': str(sink_port),
+        'PROXY_HOST': '127.0.0.1',
+        'PROXY_PORT': str(proxy_port),
+        'USE_PRESIDIO': 'true' if args.presidio else 'false',
+        'PROCESSING_WORKERS': str(args.workers),
+        'MAX_SESSIONS': str(max(100, args.concurrency * 2)),
+        'MAX_IN_FLIGHT': str(max(50, args.concurrency * 2)),
+    }
+    os.environ.update(env)
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    from aiosmtpd.controller import Controller
+    from mailguard.api import create_app
+    from mailguard.config import Config
+    from mailguard.models import db
+    from mailguard.monitoring.metrics import STAGE_SECONDS
+    from mailguard.proxy import SMTPProxy
+
+    if args.corpus:
+        messages = load_corpus(Path(args.corpus))
+        if not messages:
+            sys.exit(f"No messages found in {args.corpus}")
+    else:
+        messages = builtin_corpus(min(args.messages, 500), args.seed)
+    corpus = messages
+    messages = [prepare(corpus[i % len(corpus)], f"bench-{i}") for i in range(args.messages)]
+    warmup = [prepare(corpus[i % len(corpus)], f"warmup-{i}") for i in range(args.warmup)]
+
+    tika = start_fake_tika(tika_port, args.tika_latency)
+    sink_handler = SinkHandler()
+    sink = Controller(sink_handler, hostname='127.0.0.1', port=sink_port)
+    sink.start()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    proxy = SMTPProxy(flask_app=app)
+    proxy.start()
+
+    try:
+        if warmup:
+            run_clients(Config.PROXY_PORT, warmup, min(args.concurrency, len(warmup)))
+
+        stages_before = stage_totals(STAGE_SECONDS)
+        forwarded_before = sink_handler.received
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        latencies, failures = run_clients(Config.PROXY_PORT, messages, args.concurrency)
+        duration = time.perf_counter() - start
+        stages_after = stage_totals(STAGE_SECONDS)
+        forwarded = sink_handler.received - forwarded_before
+    finally:
+        proxy.stop()
+        sink.stop()
+        tika.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies.sort()
+    stages = {}
+    for stage, (total, count) in sorted(stages_after.items()):
+        total_before, count_before = stages_before.get(stage, (0.0, 0))
+        if count > count_before:
+            stages[stage] = {
+                'count': count - count_before,
+                'mean_ms': round((total - total_before) / (count - count_before) * 1000, 3)
+            }
+
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'messages': args.messages,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'tika_latency_ms': args.tika_latency,
+            'presidio': args.presidio,
+            'corpus': args.corpus or f"builtin (seed {args.seed})"
+        },
+        'duration_seconds': round(duration, 3),
+        'sent': len(latencies),
+        'failed': failures,
+        'forwarded': forwarded,
+        'messages_per_second': round(len(latencies) / duration, 2) if duration else 0.0,
+        'megabytes_per_second': round(sum(len(m) for m in messages) / duration / 1024 / 1024, 3) if duration else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0
+        },
+        'rss_mb': {
+            'start': round(rss_before, 1),
+            'end': round(rss_mb(), 1),
+            'peak': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        },
+        'stages': stages
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change against a baseline run; False if it regressed beyond tolerance (percent)."""
+    checks = [
+        ('messages/sec', result['messages_per_second'], baseline['messages_per_second'], True),
+        ('p50 ms', result['latency_ms']['p50'], baseline['latency_ms']['p50'], False),
+        ('p95 ms', result['latency_ms']['p95'], baseline['latency_ms']['p95'], False),
+        ('p99 ms', result['latency_ms']['p99'], baseline['latency_ms']['p99'], False),
+        ('peak RSS MB', result['rss_mb']['peak'], baseline['rss_mb']['peak'], False),
+    ]
+    ok = True
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for name, current, previous, higher_is_better in checks:
+        change = (current - previous) / previous * 100 if previous else 0.0
+        regressed = (change < -tolerance) if higher_is_better else (change > tolerance)
+        ok = ok and not regressed
+        print(f"  {name:<14} {previous:>10} -> {current:<10} ({change:+.1f}%){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def print_summary(result: dict):
+    print(f"\nSent {result['sent']} messages in {result['duration_seconds']}s "
+          f"({result['messages_per_second']} msg/s, {result['megabytes_per_second']} MB/s), "
+          f"forwarded {result['forwarded']}")
+    if result['failed']:
+        print(f"Failed: {result['failed']}")
+    latency = result['latency_ms']
+    print(f"Latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"RSS MB: start {result['rss_mb']['start']}  end {result['rss_mb']['end']}  peak {result['rss_mb']['peak']}")
+    print("Stages (mean ms):")
+    for stage, values in sorted(result['stages'].items(), key=lambda item: -item[1]['mean_ms']):
+        print(f"  {stage:<16} {values['mean_ms']:>10}  ({values['count']} calls)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the MailGuard proxy end to end',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # 500 messages over 16 connections with a 100ms Tika
+  python scripts/benchmark.py --messages 500 --concurrency 16 --tika-latency 100
+
+  # Save a baseline, then compare a later run against it
+  python scripts/benchmark.py --output baseline.json
+  python scripts/benchmark.py --compare baseline.json
+        """
+    )
+    parser.add_argument('--messages', type=int, default=200, help='Messages to send (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent SMTP clients (default: 8)')
+    parser.add_argument('--workers', type=int, default=4, help='Proxy processing workers (default: 4)')
+    parser.add_argument('--tika-latency', type=float, default=50, help='Fake Tika latency in ms (default: 50)')
+    parser.add_argument('--corpus', help='Directory of .eml files or an mbox file (default: built-in corpus)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the built-in corpus (default: 1)')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed messages sent first (default: 10)')
+    parser.add_argument('--presidio', action='store_true', help='Use Presidio detection (default: regex only)')
+    parser.add_argument('--output', help='Write the results JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=10,
+                        help='Allowed regression in percent before --compare fails (default: 10)')
+
+    args = parser.parse_args()
+    result = run_benchmark(args)
+    print_summary(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,492 @@
+"""Synthetic email corpus generator for load and detection benchmarks.
+
+Generates reproducible (seeded) .eml files or an mbox with planted PII and
+a labels.jsonl file recording every planted value and where it is, so the
+same corpus measures both throughput and detection recall/precision.
+"""
+import argparse
+import io
+import json
+import math
+import random
+import re
+import zipfile
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+from mailbox import mbox, mboxMessage
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+PII_TYPES = ('credit_card', 'ssn', 'sin', 'email', 'phone')
+ATTACHMENT_TYPES = ('pdf', 'docx', 'xlsx', 'csv', 'zip', 'nested_zip')
+
+WORDS = (
+    "the quarterly report budget forecast meeting agenda customer account invoice review "
+    "please attached update team project schedule deadline approval contract renewal "
+    "payment vendor shipment order request follow up confirm details thanks regards "
+    "numbers summary draft final version comments feedback policy training onboarding "
+    "release roadmap priority migration backlog estimate analysis results office travel "
+    "expense audit compliance security access support ticket issue resolved pending"
+).split()
+FIRST_NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn')
+LAST_NAMES = ('Smith', 'Nguyen', 'Garcia', 'Chen', 'Patel', 'Martin', 'Brown', 'Kim', 'Lopez', 'Wilson')
+DOMAINS = ('corp.example.com', 'partner.example.org', 'mail.example.net', 'finance.example.com')
+
+PII_TEMPLATES = {
+    'credit_card': ("Please charge card {} for the renewal.", "Card on file: {}", "CC {} exp 09/28"),
+    'ssn': ("SSN: {}", "Their social security number is {}.", "Payroll needs SSN {} today."),
+    'sin': ("SIN {}", "Employee SIN: {}", "Canadian SIN on the form is {}."),
+    'email': ("Contact {} for details.", "Send it to {} please.", "CC {} on the reply."),
+    'phone': ("Call me at {}.", "Phone: {}", "Reach the desk on {}."),
+}
+DECOY_TEMPLATES = ("Order #{} shipped.", "Reference number {}", "Tracking {}")
+
+
+def luhn_check_digit(digits: str) -> str:
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        n = int(digit)
+        if i % 2 == 0:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return str((10 - total % 10) % 10)
+
+
+def group_digits(digits: str, sizes: tuple, separator: str) -> str:
+    groups, start = [], 0
+    for size in sizes:
+        groups.append(digits[start:start + size])
+        start += size
+    return separator.join(groups)
+
+
+class PIIFactory:
+    """Valid-looking PII values, and decoys that look similar but aren't valid."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def value(self, pii_type: str) -> str:
+        return getattr(self, pii_type)()
+
+    def credit_card(self) -> str:
+        rng = self.rng
+        prefix = rng.choice(('4', '51', '52', '53', '54', '55', '6011'))
+        body = prefix + ''.join(str(rng.randrange(10)) for _ in range(15 - len(prefix)))
+        return group_digits(body + luhn_check_digit(body), (4, 4, 4, 4), rng.choice(('-', ' ', '')))
+
+    def ssn(self) -> str:
+        rng = self.rng
+        area = rng.choice([a for a in range(1, 900) if a != 666])
+        return f"{area:03d}-{rng.randrange(1, 100):02d}-{rng.randrange(1, 10000):04d}"
+
+    def sin(self) -> str:
+        rng = self.rng
+        body = rng.choice('12345679') + ''.join(str(rng.randrange(10)) for _ in range(7))
+        return group_digits(body + luhn_check_digit(body), (3, 3, 3), rng.choice(('-', ' ')))
+
+    def email(self) -> str:
+        rng = self.rng
+        return f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}@{rng.choice(DOMAINS)}"
+
+    def phone(self) -> str:
+        rng = self.rng
+        return f"({rng.randrange(200, 1000)}) {rng.randrange(200, 1000)}-{rng.randrange(10000):04d}"
+
+    def decoy(self) -> tuple:
+        """A value shaped like a card or SSN that fails validation, as (type, value)."""
+        rng = self.rng
+        if rng.random() < 0.5:
+            body = '4' + ''.join(str(rng.randrange(10)) for _ in range(14))
+            bad_check = str((int(luhn_check_digit(body)) + rng.randrange(1, 10)) % 10)
+            return 'credit_card', group_digits(body + bad_check, (4, 4, 4, 4), '-')
+        area = rng.choice(('000', '666', f"{rng.randrange(900, 1000)}"))
+        return 'ssn', f"{area}-{rng.randrange(1, 100):02d}-{rng.randrange(1, 10000):04d}"
+
+
+class CorpusGenerator:
+    """Builds messages and their ground-truth labels from a seeded RNG."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.pii = PIIFactory(self.rng)
+        self.base_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def lognormal_kb(self, median_kb: float, sigma: float) -> float:
+        return self.rng.lognormvariate(math.log(max(median_kb, 0.01)), sigma)
+
+    def poisson(self, mean: float) -> int:
+        if mean > 30:
+            # Normal approximation; exp(-mean) underflows for large means
+            return max(0, round(self.rng.gauss(mean, math.sqrt(mean))))
+        # Knuth's method
+        limit, count, product = math.exp(-mean), 0, self.rng.random()
+        while product > limit:
+            count += 1
+            product *= self.rng.random()
+        return count
+
+    def person(self) -> tuple:
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        return f"{first} {last}", f"{first.lower()}.{last.lower()}@{self.rng.choice(DOMAINS)}"
+
+    def sentence(self) -> str:
+        words = [self.rng.choice(WORDS) for _ in range(self.rng.randint(6, 16))]
+        return ' '.join(words).capitalize() + '.'
+
+    def text(self, size_kb: float, location: str, labels: dict) -> str:
+        """Filler text of about size_kb with planted PII (and decoys) recorded in labels."""
+        sentences, size = [], 0
+        while size < size_kb * 1024:
+            sentence = self.sentence()
+            sentences.append(sentence)
+            size += len(sentence) + 1
+
+        planted = self.poisson(self.args.pii_density * size_kb)
+        for _ in range(planted):
+            pii_type = self.rng.choice(self.args.pii_types)
+            value = self.pii.value(pii_type)
+            template = self.rng.choice(PII_TEMPLATES[pii_type])
+            sentences.insert(self.rng.randrange(len(sentences) + 1), template.format(value))
+            labels['pii'].append({'type': pii_type, 'value': value, 'location': location})
+
+        for _ in range(self.poisson(self.args.decoy_density * size_kb)):
+            decoy_type, value = self.pii.decoy()
+            sentences.insert(self.rng.randrange(len(sentences) + 1), self.rng.choice(DECOY_TEMPLATES).format(value))
+            labels['decoys'].append({'type': decoy_type, 'value': value, 'location': location})
+
+        lines, line = [], []
+        for sentence in sentences:
+            line.append(sentence)
+            if self.rng.random() < 0.25:
+                lines.append(' '.join(line))
+                line = []
+        if line:
+            lines.append(' '.join(line))
+        return '\n\n'.join(lines)
+
+    def reply_chain(self, body: str, depth: int, labels: dict) -> str:
+        """Append `depth` quoted earlier messages to the body."""
+        quoted = ''
+        for level in range(depth, 0, -1):
+            name, _ = self.person()
+            date = format_datetime(self.base_date + timedelta(minutes=self.rng.randrange(500000)))
+            earlier = self.text(self.lognormal_kb(self.args.body_kb / 2, self.args.body_sigma), 'body', labels)
+            if quoted:
+                earlier += '\n\n' + quoted
+            # No address in the attribution: it would be an unlabeled email for detectors to find
+            quoted = f"On {date}, {name} wrote:\n" + '\n'.join(
+                f"> {line}" if line else '>' for line in earlier.split('\n'))
+        return body + '\n\n' + quoted if quoted else body
+
+    def message(self, index: int) -> tuple:
+        args, rng = self.args, self.rng
+        labels = {'index': index, 'pii': [], 'decoys': [], 'attachments': []}
+
+        sender_name, sender = self.person()
+        recipient_name, recipient = self.person()
+        depth = rng.randint(0, args.reply_depth) if args.reply_depth else 0
+
+        msg = EmailMessage()
+        msg['From'] = f"{sender_name} <{sender}>"
+        msg['To'] = f"{recipient_name} <{recipient}>"
+        msg['Subject'] = ('Re: ' if depth else '') + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).capitalize()
+        msg['Date'] = format_datetime(self.base_date + timedelta(minutes=rng.randrange(500000)))
+        msg['Message-ID'] = f"<{args.seed}.{index}@corpus.mailguard.test>"
+        if depth:
+            references = ' '.join(f"<{args.seed}.{index}.{level}@corpus.mailguard.test>" for level in range(depth))
+            msg['In-Reply-To'] = references.split()[-1]
+            msg['References'] = references
+
+        body = self.text(self.lognormal_kb(args.body_kb, args.body_sigma), 'body', labels)
+        body = self.reply_chain(body, depth, labels)
+        msg.set_content(body)
+        if rng.random() < args.html_rate:
+            # Same text as the plain part, so its PII is labeled again for the HTML part
+            for item in [item for item in labels['pii'] if item['location'] == 'body']:
+                labels['pii'].append(dict(item, location='html'))
+            paragraphs = ''.join(f"<p>{escape(p).replace(chr(10), '<br>')}</p>" for p in body.split('\n\n'))
+            msg.add_alternative(f"<html><body>{paragraphs}</body></html>", subtype='html')
+
+        if rng.random() < args.attachment_rate:
+            for _ in range(rng.randint(1, args.max_attachments)):
+                self.add_attachment(msg, rng.choice(args.attachment_types), labels)
+
+        # Fixed boundaries, so the output is byte-for-byte reproducible
+        for n, part in enumerate(msg.walk()):
+            if part.is_multipart():
+                part.set_boundary(f"=_mg_{args.seed}_{index}_{n}")
+
+        raw = msg.as_bytes()
+        labels['message_id'] = msg['Message-ID']
+        labels['size_bytes'] = len(raw)
+        labels['reply_depth'] = depth
+        return raw, labels
+
+    def add_attachment(self, msg: EmailMessage, kind: str, labels: dict):
+        size_kb = self.lognormal_kb(self.args.attachment_kb, self.args.attachment_sigma)
+        stem = f"{self.rng.choice(WORDS)}_{self.rng.randrange(1000)}"
+
+        if kind == 'nested_zip':
+            filename = f"{stem}.zip"
+            data = self.nested_zip(filename, size_kb, self.rng.randint(2, 3), labels)
+            maintype, subtype = 'application', 'zip'
+        elif kind == 'zip':
+            filename = f"{stem}.zip"
+            data = self.zip_of_texts(filename, size_kb, labels)
+            maintype, subtype = 'application', 'zip'
+        else:
+            filename = f"{stem}.{kind}"
+            data, maintype, subtype = self.document(kind, filename, size_kb, labels)
+
+        msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+        labels['attachments'].append({'filename': filename, 'type': kind, 'size_bytes': len(data)})
+
+    def document(self, kind: str, path: str, size_kb: float, labels: dict) -> tuple:
+        text = self.text(size_kb, f"attachment:{path}", labels)
+        if kind == 'pdf':
+            return make_pdf(text), 'application', 'pdf'
+        if kind == 'docx':
+            return make_docx(text), 'application', 'vnd.openxmlformats-officedocument.wordprocessingml.document'
+        if kind == 'xlsx':
+            return make_xlsx(text), 'application', 'vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        rows = ['id,note'] + [f"{i},\"{line}\"" for i, line in enumerate(text.split('\n\n'), 1)]
+        return '\n'.join(rows).encode(), 'text', 'csv'
+
+    def zip_of_texts(self, path: str, size_kb: float, labels: dict) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in ('notes.txt', 'data.csv'):
+                kind = 'csv' if name.endswith('.csv') else 'txt'
+                member = f"{path}/{name}"
+                if kind == 'csv':
+                    data = self.document('csv', member, size_kb / 2, labels)[0]
+                else:
+                    data = self.text(size_kb / 2, f"attachment:{member}", labels).encode()
+                info = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0))
+                archive.writestr(info, data, zipfile.ZIP_DEFLATED)
+        return buffer.getvalue()
+
+    def nested_zip(self, path: str, size_kb: float, depth: int, labels: dict) -> bytes:
+        if depth <= 1:
+            return self.zip_of_texts(path, size_kb, labels)
+        inner_name = f"inner{depth - 1}.zip"
+        inner = self.nested_zip(f"{path}/{inner_name}", size_kb, depth - 1, labels)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(zipfile.ZipInfo(inner_name, date_time=(2024, 1, 1, 0, 0, 0)), inner)
+            readme = self.text(1, f"attachment:{path}/README.txt", labels).encode()
+            archive.writestr(zipfile.ZipInfo('README.txt', date_time=(2024, 1, 1, 0, 0, 0)), readme)
+        return buffer.getvalue()
+
+
+def make_pdf(text: str) -> bytes:
+    """Minimal single-page PDF with uncompressed text, so any extractor can read it."""
+    # One sentence per line, so no planted value is split across lines
+    lines = [line for paragraph in text.split('\n\n') for line in re.split(r'(?<=[.?!]) ', paragraph)]
+    escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in lines]
+    stream = 'BT /F1 9 Tf 40 800 Td 11 TL\n' + '\n'.join(f"({line}) '" for line in escaped) + '\nET'
+    stream_bytes = stream.encode('latin-1', 'replace')
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+        b'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+        b'<< /Length ' + str(len(stream_bytes)).encode() + b' >>\nstream\n' + stream_bytes + b'\nendstream',
+    ]
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def make_docx(text: str) -> bytes:
+    paragraphs = ''.join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(p)}</w:t></w:r></w:p>"
+                         for p in text.split('\n\n'))
+    return _ooxml_zip({
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'),
+        '_rels/.rels': _rels('http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument',
+                             'word/document.xml'),
+        'word/document.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{paragraphs}</w:body></w:document>"),
+    })
+
+
+def make_xlsx(text: str) -> bytes:
+    rows = ''.join(
+        f"<row r=\"{i}\"><c r=\"A{i}\"><v>{i}</v></c>"
+        f"<c r=\"B{i}\" t=\"inlineStr\"><is><t>{escape(p)}</t></is></c></row>"
+        for i, p in enumerate(text.split('\n\n'), 1)
+    )
+    return _ooxml_zip({
+        '[Content_Types].xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'),
+        '_rels/.rels': _rels('http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument',
+                             'xl/workbook.xml'),
+        'xl/workbook.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        'xl/_rels/workbook.xml.rels': _rels(
+            'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet', 'worksheets/sheet1.xml'),
+        'xl/worksheets/sheet1.xml': (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"<sheetData>{rows}</sheetData></worksheet>"),
+    })
+
+
+def _rels(relationship_type: str, target: str) -> str:
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"<Relationship Id=\"rId1\" Type=\"{relationship_type}\" Target=\"{target}\"/>"
+            '</Relationships>')
+
+
+def _ooxml_zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0)), content, zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+def generate(args) -> dict:
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    generator = CorpusGenerator(args)
+    totals = {'messages': 0, 'bytes': 0, 'pii': {}, 'decoys': 0, 'attachments': {}}
+
+    box = mbox(str(output / 'corpus.mbox')) if args.format == 'mbox' else None
+    if box is not None:
+        box.lock()
+        box.clear()
+    try:
+        with open(output / 'labels.jsonl', 'w') as labels_file:
+            for index in range(args.count):
+                raw, labels = generator.message(index)
+                if box is not None:
+                    # A fixed From_ line; mailbox would stamp the current time
+                    entry = mboxMessage(raw)
+                    entry.set_from('MAILER-DAEMON', generator.base_date.timetuple())
+                    box.add(entry)
+                    labels['file'] = f"corpus.mbox#{index}"
+                else:
+                    name = f"msg-{index:06d}.eml"
+                    (output / name).write_bytes(raw)
+                    labels['file'] = name
+                labels_file.write(json.dumps(labels) + '\n')
+
+                totals['messages'] += 1
+                totals['bytes'] += len(raw)
+                totals['decoys'] += len(labels['decoys'])
+                for item in labels['pii']:
+                    totals['pii'][item['type']] = totals['pii'].get(item['type'], 0) + 1
+                for attachment in labels['attachments']:
+                    totals['attachments'][attachment['type']] = totals['attachments'].get(attachment['type'], 0) + 1
+    finally:
+        if box is not None:
+            box.flush()
+            box.unlock()
+            box.close()
+
+    manifest = {'arguments': vars(args), 'totals': totals}
+    with open(output / 'corpus.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _choices(value: str, allowed: tuple) -> list:
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = [item for item in items if item not in allowed]
+    if unknown or not items:
+        raise argparse.ArgumentTypeError(f"expected a comma-separated list of {', '.join(allowed)}")
+    return items
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic email corpus with ground-truth PII labels',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # 1000 .eml files in ./corpus
+  python scripts/generate_corpus.py --count 1000 --output corpus
+
+  # Attachment-heavy mbox with dense PII and deep reply chains
+  python scripts/generate_corpus.py --format mbox --attachment-rate 0.8 --pii-density 2 --reply-depth 6
+
+Output: the messages, labels.jsonl (one line per message: planted PII and
+decoys with their location, attachments) and corpus.json (arguments and
+totals). The same seed and arguments always produce the same bytes.
+        """
+    )
+    parser.add_argument('--count', type=int, default=1000, help='Messages to generate (default: 1000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    parser.add_argument('--output', default='corpus', help='Output directory (default: corpus)')
+    parser.add_argument('--format', choices=('eml', 'mbox'), default='eml', help='Output format (default: eml)')
+    parser.add_argument('--body-kb', type=float, default=2, help='Median body size in KB (default: 2)')
+    parser.add_argument('--body-sigma', type=float, default=1.0,
+                        help='Log-normal sigma of the body size; larger means a longer tail (default: 1.0)')
+    parser.add_argument('--html-rate', type=float, default=0.3,
+                        help='Fraction of messages with an HTML alternative (default: 0.3)')
+    parser.add_argument('--attachment-rate', type=float, default=0.4,
+                        help='Fraction of messages with attachments (default: 0.4)')
+    parser.add_argument('--max-attachments', type=int, default=3, help='Most attachments per message (default: 3)')
+    parser.add_argument('--attachment-kb', type=float, default=20, help='Median attachment text size in KB (default: 20)')
+    parser.add_argument('--attachment-sigma', type=float, default=1.2,
+                        help='Log-normal sigma of the attachment size (default: 1.2)')
+    parser.add_argument('--attachment-types', type=lambda v: _choices(v, ATTACHMENT_TYPES),
+                        default=list(ATTACHMENT_TYPES),
+                        help=f"Comma-separated attachment types (default: {','.join(ATTACHMENT_TYPES)})")
+    parser.add_argument('--reply-depth', type=int, default=3,
+                        help='Most quoted earlier messages per reply chain (default: 3)')
+    parser.add_argument('--pii-density', type=float, default=0.5,
+                        help='Average planted PII values per KB of text (default: 0.5)')
+    parser.add_argument('--pii-types', type=lambda v: _choices(v, PII_TYPES), default=list(PII_TYPES),
+                        help=f"Comma-separated PII types to plant (default: {','.join(PII_TYPES)})")
+    parser.add_argument('--decoy-density', type=float, default=0.1,
+                        help='Average invalid look-alike numbers per KB of text, for precision (default: 0.1)')
+
+    args = parser.parse_args()
+    if args.count < 1 or args.max_attachments < 1:
+        parser.error('--count and --max-attachments must be at least 1')
+
+    manifest = generate(args)
+    totals = manifest['totals']
+    print(f"✓ Generated {totals['messages']} messages ({totals['bytes'] / 1024 / 1024:.1f} MB) in {args.output}")
+    print(f"   PII planted: {totals['pii']}")
+    print(f"   Decoys: {totals['decoys']}")
+    print(f"   Attachments: {totals['attachments']}")
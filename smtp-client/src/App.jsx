@@ -66,6 +66,26 @@ function App() {
     }
   }, [currentView, userEmail])
 
+  const loadEmailsByIds = useCallback(async (ids) => {
+    try {
+      const params = new URLSearchParams({
+        ids: ids.join(','),
+        per_page: ids.length,
+        view: 'smtp_client'
+      })
+      const apiPath = API_URL ? `${API_URL}/api/emails?${params}` : `/api/emails?${params}`
+      const response = await fetch(apiPath)
+      if (!response.ok) {
+        return
+      }
+      const data = await response.json()
+      const batchEmails = data.emails || []
+      batchEmails.forEach(handleNewEmail)
+    } catch (error) {
+      console.error('Error loading batched emails:', error)
+    }
+  }, [handleNewEmail])
+
   useEffect(() => {
     if (!userEmail) return
 
@@ -84,6 +104,9 @@ function App() {
             return
           }
           handleNewEmail(data.data)
+        } else if (data.type === 'email_batch' && data.data && data.data.ids.length > 0) {
+          // Summary mode: fetch details for the batched IDs in one request
+          loadEmailsByIds(data.data.ids)
         }
       } catch (error) {
         console.error('Error parsing SSE event:', error)
@@ -97,7 +120,7 @@ function App() {
     return () => {
       eventSource.close()
     }
-  }, [userEmail, handleNewEmail])
+  }, [userEmail, handleNewEmail, loadEmailsByIds])
 
   const loadEmails = async () => {
     setLoading(true)